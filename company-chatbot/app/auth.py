@@ -12,6 +12,7 @@ from .db import get_db
 from .models import User
 from .schemas import TokenData
 from .config import BASE_DIR
+from .tracing import span
 
 # In a real app, read from env / config
 SECRET_KEY = "CHANGE_THIS_TO_A_RANDOM_SECRET_FOR_PROD"
@@ -67,7 +68,8 @@ def get_current_user(
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with span("auth.jwt_decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str | None = payload.get("sub")
         role: str | None = payload.get("role")
         if username is None or role is None:
@@ -76,7 +78,8 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = get_user_by_username(db, username=token_data.username)
+    with span("auth.db_lookup"):
+        user = get_user_by_username(db, username=token_data.username)
     if user is None:
         raise credentials_exception
     return user
@@ -0,0 +1,133 @@
+"""
+Incremental ingestion bookkeeping shared by preprocessing and indexing.
+
+* The manifest records, per raw file, its mtime / size / sha256 and the chunk ids
+  it produced, so preprocess_docs only re-chunks new or modified files.
+* A change set lists the chunk ids to upsert / remove since the vector index was
+  last built. Preprocessing merges into the pending change set (several runs
+  can happen between index builds). `build_vector_db --incremental` applies it
+  and then marks it applied.
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import CHANGESET_PATH, INGEST_LOCK_PATH, INGEST_MANIFEST_PATH
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path: Path = INGEST_MANIFEST_PATH) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def save_manifest(manifest: Dict[str, Any], path: Path = INGEST_MANIFEST_PATH) -> None:
+    manifest = {**manifest, "version": MANIFEST_VERSION}
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+@dataclass
+class ChangeSet:
+    upserted: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    # Settings changed or no previous state: the index has to be rebuilt from scratch
+    full_rebuild: bool = False
+    files: Dict[str, List[str]] = field(default_factory=lambda: {"added": [], "modified": [], "deleted": []})
+    created_at: float = field(default_factory=time.time)
+
+    def is_empty(self) -> bool:
+        return not (self.upserted or self.removed or self.full_rebuild)
+
+    def merge(self, newer: "ChangeSet") -> "ChangeSet":
+        """
+        Combine with a later change set: the later operation on an id wins.
+        """
+        newer_up, newer_rm = set(newer.upserted), set(newer.removed)
+        upserted = [i for i in self.upserted if i not in newer_rm] + [
+            i for i in newer.upserted if i not in set(self.upserted)
+        ]
+        removed = [i for i in self.removed if i not in newer_up] + [
+            i for i in newer.removed if i not in set(self.removed)
+        ]
+        files = {k: sorted(set(self.files.get(k, [])) | set(newer.files.get(k, []))) for k in ("added", "modified", "deleted")}
+        return ChangeSet(
+            upserted=upserted,
+            removed=removed,
+            full_rebuild=self.full_rebuild or newer.full_rebuild,
+            files=files,
+            created_at=self.created_at,
+        )
+
+    def summary(self) -> str:
+        if self.full_rebuild:
+            return "full rebuild"
+        return (
+            f"{len(self.upserted)} chunks to upsert, {len(self.removed)} to remove "
+            f"({len(self.files['added'])} files added, {len(self.files['modified'])} modified, "
+            f"{len(self.files['deleted'])} deleted)"
+        )
+
+
+def load_pending_changeset(path: Path = CHANGESET_PATH) -> Optional[ChangeSet]:
+    if not path.exists():
+        return None
+    return ChangeSet(**json.loads(path.read_text(encoding="utf-8")))
+
+
+def save_pending_changeset(changes: ChangeSet, path: Path = CHANGESET_PATH) -> ChangeSet:
+    """
+    Merge `changes` into the not-yet-indexed change set and persist it.
+    """
+    pending = load_pending_changeset(path)
+    merged = pending.merge(changes) if pending is not None else changes
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(asdict(merged), indent=1, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+    return merged
+
+
+def mark_changeset_applied(path: Path = CHANGESET_PATH) -> None:
+    """
+    Keep the last applied change set next to the pending one, for debugging.
+    """
+    if path.exists():
+        path.replace(path.with_name(path.stem + ".applied" + path.suffix))
+
+
+@contextlib.contextmanager
+def ingest_lock(path: Path = INGEST_LOCK_PATH) -> Iterator[None]:
+    """
+    Serialize preprocessing / indexing runs (watch mode vs. a manual run), which
+    would otherwise interleave writes to the chunk store and change set.
+    Blocks until the other run finishes. No-op where fcntl is unavailable.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with path.open("a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
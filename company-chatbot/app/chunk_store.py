@@ -0,0 +1,182 @@
+"""
+Offset-indexed binary chunk store, the preprocessing output read by the indexer.
+
+Replaces parsing document_chunks.jsonl line by line. Repeated metadata
+(source file / path, department, allowed_roles list) is dictionary-encoded
+once, and the text and id columns are memory-mapped, so a single chunk can be
+read by position or id without touching the rest.
+
+On-disk layout (one directory, written atomically):
+
+    meta.json               format version, row count, column dictionaries
+    ids.bin / ids.off.npy   UTF-8 string column + int64 offsets
+    text.bin / text.off.npy
+    ids.order.npy           row numbers sorted by id (binary search by id)
+    <col>.codes.npy         dictionary-encoded columns (DICT_COLUMNS)
+    chunk_index.npy         int32
+    extra.bin / extra.off.npy
+                            JSON object with any other chunk fields, "" if none
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .columnar import dictionary_encode, fresh_tmp_dir, read_strings, swap_into_place, write_strings
+from .config import CHUNK_STORE_DIR
+
+FORMAT_VERSION = 1
+
+# Repeated per-chunk values; dictionary entries are JSON values, so list-valued
+# columns (allowed_roles) round-trip as lists
+DICT_COLUMNS = ["source_file", "source_path", "department", "allowed_roles"]
+
+_FIXED_FIELDS = {"id", "text", "chunk_index", *DICT_COLUMNS}
+
+
+def write_chunk_store(chunks: Sequence[Dict[str, Any]], store_dir: Path = CHUNK_STORE_DIR) -> None:
+    """
+    Write `chunks` (preprocess_docs chunk dicts) to `store_dir`, replacing any
+    previous store.
+    """
+    tmp_dir = fresh_tmp_dir(store_dir)
+
+    ids = [c["id"] for c in chunks]
+    write_strings(tmp_dir, "ids", ids)
+    write_strings(tmp_dir, "text", [c["text"] for c in chunks])
+    np.save(tmp_dir / "ids.order.npy", np.array(sorted(range(len(ids)), key=ids.__getitem__), dtype=np.int64))
+
+    dictionaries: Dict[str, List[Any]] = {}
+    for col in DICT_COLUMNS:
+        keys, codes = dictionary_encode([json.dumps(c.get(col), ensure_ascii=False) for c in chunks])
+        dictionaries[col] = [json.loads(k) for k in keys]
+        np.save(tmp_dir / f"{col}.codes.npy", codes)
+    np.save(tmp_dir / "chunk_index.npy", np.array([int(c.get("chunk_index", 0)) for c in chunks], dtype=np.int32))
+
+    extras = []
+    for c in chunks:
+        extra = {k: v for k, v in c.items() if k not in _FIXED_FIELDS}
+        extras.append(json.dumps(extra, ensure_ascii=False) if extra else "")
+    write_strings(tmp_dir, "extra", extras)
+
+    (tmp_dir / "meta.json").write_text(
+        json.dumps({"version": FORMAT_VERSION, "count": len(chunks), "dictionaries": dictionaries}),
+        encoding="utf-8",
+    )
+    swap_into_place(tmp_dir, store_dir)
+
+
+class ChunkStore:
+    """
+    Read-only, mmap-backed view of a chunk store directory.
+    """
+
+    def __init__(self, store_dir: Path = CHUNK_STORE_DIR):
+        # Resolve the version link once, so all files come from the same write
+        store_dir = store_dir.resolve()
+        self.store_dir = store_dir
+        info = json.loads((store_dir / "meta.json").read_text(encoding="utf-8"))
+        if info.get("version") != FORMAT_VERSION:
+            raise RuntimeError(f"Unsupported chunk store version in {store_dir}: {info.get('version')}")
+
+        self._count: int = info["count"]
+        self.dictionaries: Dict[str, List[Any]] = info["dictionaries"]
+        self.ids = read_strings(store_dir, "ids")
+        self.texts = read_strings(store_dir, "text")
+        self.extras = read_strings(store_dir, "extra")
+        self.order = np.asarray(np.load(store_dir / "ids.order.npy", mmap_mode="r"))
+        self.codes = {col: np.load(store_dir / f"{col}.codes.npy", mmap_mode="r") for col in DICT_COLUMNS}
+        self.chunk_index = np.load(store_dir / "chunk_index.npy", mmap_mode="r")
+
+    @staticmethod
+    def exists(store_dir: Path = CHUNK_STORE_DIR) -> bool:
+        return (store_dir / "meta.json").exists()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, i: int) -> Dict[str, Any]:
+        """
+        Chunk at row `i`, in the same shape preprocess_docs produced it.
+        """
+        return self._assemble(
+            self.ids[i],
+            self.texts[i],
+            {col: int(self.codes[col][i]) for col in DICT_COLUMNS},
+            int(self.chunk_index[i]),
+            self.extras[i],
+        )
+
+    def _assemble(self, chunk_id: str, text: str, codes: Dict[str, int], chunk_index: int, extra: str) -> Dict[str, Any]:
+        def value(col: str) -> Any:
+            v = self.dictionaries[col][codes[col]]
+            # Copy lists so callers mutating one chunk don't alter the dictionary
+            return list(v) if isinstance(v, list) else v
+
+        # Same key order as preprocess_docs, so export_jsonl matches the legacy file
+        chunk: Dict[str, Any] = {
+            "id": chunk_id,
+            "text": text,
+            "source_file": value("source_file"),
+            "source_path": value("source_path"),
+            "department": value("department"),
+            "chunk_index": chunk_index,
+            "allowed_roles": value("allowed_roles"),
+        }
+        if extra:
+            chunk.update(json.loads(extra))
+        return chunk
+
+    def position(self, chunk_id: str) -> Optional[int]:
+        """
+        Row number of `chunk_id` (binary search over the sorted id order).
+        """
+        # UTF-8 byte order equals code point order, so compare undecoded bytes
+        target = chunk_id.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ids.raw(int(self.order[mid])) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count:
+            row = int(self.order[lo])
+            if self.ids.raw(row) == target:
+                return row
+        return None
+
+    def get_by_id(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        row = self.position(chunk_id)
+        return None if row is None else self.get(row)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """
+        Sequential scan. Columns are pulled into memory once and decoded
+        row by row, which is much cheaper than get(i) per row on mmap'd arrays.
+        """
+        id_blob, id_off = self.ids.blob.tobytes(), np.asarray(self.ids.offsets).tolist()
+        text_blob, text_off = self.texts.blob.tobytes(), np.asarray(self.texts.offsets).tolist()
+        extra_blob, extra_off = self.extras.blob.tobytes(), np.asarray(self.extras.offsets).tolist()
+        codes = {col: np.asarray(self.codes[col]).tolist() for col in DICT_COLUMNS}
+        chunk_index = np.asarray(self.chunk_index).tolist()
+
+        for i in range(self._count):
+            yield self._assemble(
+                id_blob[id_off[i] : id_off[i + 1]].decode("utf-8"),
+                text_blob[text_off[i] : text_off[i + 1]].decode("utf-8"),
+                {col: codes[col][i] for col in DICT_COLUMNS},
+                chunk_index[i],
+                extra_blob[extra_off[i] : extra_off[i + 1]].decode("utf-8"),
+            )
+
+    def export_jsonl(self, path: Path) -> None:
+        """
+        Human-readable dump, identical in shape to the legacy document_chunks.jsonl.
+        """
+        with path.open("w", encoding="utf-8") as f:
+            for chunk in self:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
@@ -0,0 +1,137 @@
+"""
+Small building blocks for the on-disk columnar formats (flat vector index,
+chunk store): UTF-8 string columns as blob + offsets, dictionary encoding for
+low-cardinality columns, and atomic directory replacement (readers should
+open a directory through `target.resolve()`, once, so every file they read
+comes from the same version).
+"""
+from __future__ import annotations
+
+import glob
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+class StringColumn:
+    """
+    Random access into a UTF-8 blob + offsets pair without decoding everything.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        # Plain ndarray / memoryview views: slicing np.memmap objects directly is
+        # several times slower because every slice is wrapped in a new memmap
+        self.offsets = np.asarray(offsets)
+        self._view = memoryview(np.asarray(blob))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode("utf-8")
+
+    def raw(self, i: int) -> bytes:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._view[start:end].tobytes()
+
+
+def write_strings(directory: Path, name: str, values: Sequence[str]) -> None:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    (directory / f"{name}.bin").write_bytes(b"".join(encoded))
+    np.save(directory / f"{name}.off.npy", offsets)
+
+
+def read_strings(directory: Path, name: str) -> StringColumn:
+    blob_path = directory / f"{name}.bin"
+    if blob_path.stat().st_size:
+        blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+    else:
+        blob = np.zeros(0, dtype=np.uint8)  # np.memmap refuses empty files
+    return StringColumn(blob, np.load(directory / f"{name}.off.npy", mmap_mode="r"))
+
+
+def dictionary_encode(values: Sequence[str]) -> tuple[List[str], np.ndarray]:
+    dictionary: Dict[str, int] = {}
+    codes = np.empty(len(values), dtype=np.uint32)
+    for i, v in enumerate(values):
+        codes[i] = dictionary.setdefault(v, len(dictionary))
+    dtype = np.uint8 if len(dictionary) <= 0xFF else np.uint16 if len(dictionary) <= 0xFFFF else np.uint32
+    return list(dictionary), codes.astype(dtype)
+
+
+def fresh_tmp_dir(target: Path) -> Path:
+    """
+    Empty sibling directory to build `target` in before swap_into_place().
+    """
+    tmp_dir = target.with_name(target.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+    return tmp_dir
+
+
+def swap_into_place(tmp_dir: Path, target: Path) -> None:
+    """
+    Publish `tmp_dir` as `target` in one atomic step.
+
+    A new `target` is a plain directory (e.g. a snapshot staging copy). An
+    existing one becomes a symlink to a versioned sibling (`<name>.v<ns>`):
+    the new version is renamed to its own directory and the link is replaced
+    with os.replace, so readers see the old or the new directory, never none.
+    The previous version is kept (a reader may have just resolved the link);
+    older ones are removed, while processes that mmap'd them keep valid pages.
+    Replacing a plain directory, or where symlinks are not available (e.g.
+    Windows without the privilege), falls back to two renames, which leaves a
+    short gap; get_flat_collection keeps serving its open index through it.
+    """
+    if not target.exists() and not target.is_symlink():
+        tmp_dir.rename(target)
+        return
+    version_dir = target.with_name(f"{target.name}.v{time.time_ns()}")
+    tmp_dir.rename(version_dir)
+    link_tmp = target.with_name(target.name + ".link")
+    if link_tmp.is_symlink() or link_tmp.exists():
+        link_tmp.unlink()
+    try:
+        link_tmp.symlink_to(version_dir.name, target_is_directory=True)  # relative: the data dir may move
+    except OSError:
+        _rename_into_place(version_dir, target)
+        return
+
+    if target.is_symlink():
+        previous = target.resolve()
+    else:
+        # First replacement of a plain directory: moved aside, not atomically
+        previous = target.with_name(f"{target.name}.v0")
+        if previous.exists():
+            shutil.rmtree(previous)
+        target.rename(previous)
+    os.replace(link_tmp, target)
+
+    keep = {version_dir.name, previous.name}
+    for old in target.parent.glob(f"{glob.escape(target.name)}.v*"):
+        if old.name not in keep and old.is_dir() and not old.is_symlink():
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def _rename_into_place(src: Path, target: Path) -> None:
+    old_dir = target.with_name(target.name + ".old")
+    _remove(old_dir)
+    if target.exists() or target.is_symlink():
+        target.rename(old_dir)
+    src.rename(target)
+    _remove(old_dir)
+
+
+def _remove(path: Path) -> None:
+    if path.is_symlink():
+        path.unlink()
+    elif path.exists():
+        shutil.rmtree(path)
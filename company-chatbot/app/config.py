@@ -1,13 +1,41 @@
+import os
 from pathlib import Path
 from collections import defaultdict
 
-# Base directories
+# Base directories (data dirs can be redirected, e.g. for scale tests on a scratch corpus)
 BASE_DIR = Path(__file__).resolve().parents[1]
-DATA_RAW_DIR = BASE_DIR / "data" / "raw" 
-DATA_PROCESSED_DIR = BASE_DIR / "data" / "processed"
+DATA_RAW_DIR = Path(os.getenv("DATA_RAW_DIR", BASE_DIR / "data" / "raw"))
+DATA_PROCESSED_DIR = Path(os.getenv("DATA_PROCESSED_DIR", BASE_DIR / "data" / "processed"))
 
 DATA_PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
+# Preprocessing output: binary chunk store (read by the indexer) + JSONL export
+CHUNK_STORE_DIR = DATA_PROCESSED_DIR / "chunk_store"
+CHUNKS_JSONL_PATH = DATA_PROCESSED_DIR / "document_chunks.jsonl"
+CHUNKS_JSONL_EXPORT = os.getenv("CHUNKS_JSONL_EXPORT", "true").lower() in ("1", "true", "yes")
+# Incremental preprocessing: per-file manifest + change set pending indexing
+INGEST_MANIFEST_PATH = DATA_PROCESSED_DIR / "manifest.json"
+CHANGESET_PATH = DATA_PROCESSED_DIR / "changeset.json"
+INGEST_LOCK_PATH = DATA_PROCESSED_DIR / ".ingest.lock"
+# Near-duplicate chunks (app/dedupe.py): MinHash + LSH candidates over word shingles,
+# merged when the exact Jaccard similarity is at least DEDUP_THRESHOLD
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+DEDUP_SHINGLE_WORDS = int(os.getenv("DEDUP_SHINGLE_WORDS", "5"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "16"))  # must divide DEDUP_NUM_PERM
+# Materialized HR CSV aggregates (app/hr_stats.py), answered from instead of per-row hits
+HR_STATS_PATH = DATA_PROCESSED_DIR / "hr_stats.json"
+HR_STATS_ENABLED = os.getenv("HR_STATS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Watch mode (scripts/watch_ingest.py): "auto" uses inotify on Linux, else polling
+INGEST_WATCH_BACKEND = os.getenv("INGEST_WATCH_BACKEND", "auto").lower()
+INGEST_WATCH_POLL_S = float(os.getenv("INGEST_WATCH_POLL_S", "2"))
+# Wait for this long without new events before ingesting a burst of changes ...
+INGEST_WATCH_DEBOUNCE_S = float(os.getenv("INGEST_WATCH_DEBOUNCE_S", "2"))
+# ... but never delay a burst by more than this
+INGEST_WATCH_MAX_DELAY_S = float(os.getenv("INGEST_WATCH_MAX_DELAY_S", "30"))
+
 # Departments = folder names (case-sensitive as on disk)
 DEPARTMENTS = ["Finance", "HR", "engineering", "general", "marketing"]
 
@@ -45,8 +73,188 @@ DEPARTMENT_TO_ROLES = dict(DEPARTMENT_TO_ROLES)
 
 
 # Vector DB directory
-VECTOR_DB_DIR = BASE_DIR / "data" / "vector_db"
+VECTOR_DB_DIR = Path(os.getenv("VECTOR_DB_DIR", BASE_DIR / "data" / "vector_db"))
 VECTOR_DB_DIR.mkdir(parents=True, exist_ok=True)
 
 # Chroma collection name
 VECTOR_COLLECTION_NAME = "company_docs"
+
+# Index snapshots (scripts/build_snapshot.py, app/snapshot.py): one versioned, checksummed
+# .tar with the flat index, chunk store, RBAC index and model weights. With SNAPSHOT_PATH set
+# (a .tar or an extracted directory) the API serves from it and ignores the local index.
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "")
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", BASE_DIR / "data" / "snapshots"))
+# Where replicas extract .tar snapshots (one subdirectory per version, reused across restarts)
+SNAPSHOT_CACHE_DIR = Path(os.getenv("SNAPSHOT_CACHE_DIR", SNAPSHOT_DIR / "extracted"))
+# Checksums checked on first extraction: "full" (sha256), "size", or "none"
+SNAPSHOT_VERIFY = os.getenv("SNAPSHOT_VERIFY", "full").lower()
+
+# Vector store backend: "chroma" (PersistentClient), "flat" (mmap'd NumPy matrix) or
+# "sharded" (flat indexes partitioned across shard processes, see app/shards.py).
+# Snapshots always hold a flat index.
+VECTOR_BACKEND = "flat" if SNAPSHOT_PATH else os.getenv("VECTOR_BACKEND", "chroma").lower()
+
+# Flat index: normalized embeddings in a .npy file + columnar metadata sidecar
+FLAT_INDEX_DIR = Path(os.getenv("FLAT_INDEX_DIR", BASE_DIR / "data" / "flat_index"))
+FLAT_INDEX_DTYPE = os.getenv("FLAT_INDEX_DTYPE", "float32").lower()  # float32 | float16
+# Compressed first-stage scan: "int8" (4x smaller) or "binary" (32x, Hamming distance).
+# Candidates are rescored against float16 vectors that stay on disk (mmap).
+FLAT_INDEX_QUANTIZATION = os.getenv("FLAT_INDEX_QUANTIZATION", "none").lower()  # none | int8 | binary
+# First-stage candidates rescored per result (top_k * factor)
+FLAT_INDEX_RESCORE_FACTOR = int(os.getenv("FLAT_INDEX_RESCORE_FACTOR", "10"))
+
+# Sharded retrieval: chunks hash-partitioned by id into SHARD_COUNT flat indexes under
+# SHARD_INDEX_DIR, each served by `python -m scripts.shard_server`
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "4"))
+SHARD_INDEX_DIR = Path(os.getenv("SHARD_INDEX_DIR", BASE_DIR / "data" / "shards"))
+# Comma-separated shard addresses in shard order ("unix:/path.sock" or "tcp:host:port");
+# default: one Unix socket per shard on this node
+SHARD_ADDRESSES = [
+    a.strip()
+    for a in os.getenv(
+        "SHARD_ADDRESSES",
+        ",".join(f"unix:/tmp/company-chatbot-shard-{i}.sock" for i in range(SHARD_COUNT)),
+    ).split(",")
+    if a.strip()
+]
+# Per-shard deadline; slower or unreachable shards are left out of the (partial) result
+SHARD_TIMEOUT_S = float(os.getenv("SHARD_TIMEOUT_S", "0.5"))
+SHARD_SERVER_THREADS = int(os.getenv("SHARD_SERVER_THREADS", "2"))  # concurrent queries per shard
+
+# Embedding model + inference backend
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()  # torch | onnx | hash | sidecar
+EMBEDDING_ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "false").lower() in ("1", "true", "yes")
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))  # 0 = library default
+
+# Node-local embedding sidecar (scripts/embedding_sidecar.py), used with EMBEDDING_BACKEND=sidecar:
+# one model for all API workers, reached over a Unix socket
+EMBEDDING_SIDECAR_SOCKET = os.getenv("EMBEDDING_SIDECAR_SOCKET", "/tmp/company-chatbot-embeddings.sock")
+# Backend the sidecar serves; also loaded in-process if the sidecar is unreachable
+EMBEDDING_SIDECAR_BACKEND = os.getenv("EMBEDDING_SIDECAR_BACKEND", "torch").lower()
+EMBEDDING_SIDECAR_TIMEOUT_S = float(os.getenv("EMBEDDING_SIDECAR_TIMEOUT_S", "10"))
+EMBEDDING_SIDECAR_RETRY_S = float(os.getenv("EMBEDDING_SIDECAR_RETRY_S", "30"))  # after falling back
+# Micro-batching: texts per model call. Requests queued while the model is busy always share
+# the next call; MAX_WAIT_MS > 0 also holds the first request of an idle period back for company
+EMBEDDING_SIDECAR_MAX_BATCH = int(os.getenv("EMBEDDING_SIDECAR_MAX_BATCH", "64"))
+EMBEDDING_SIDECAR_MAX_WAIT_MS = float(os.getenv("EMBEDDING_SIDECAR_MAX_WAIT_MS", "0"))
+
+# Persistent embedding cache used by the indexer, keyed by (backend, sha256(text))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = Path(os.getenv("EMBEDDING_CACHE_PATH", DATA_PROCESSED_DIR / "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))  # LRU-evicted beyond this
+
+# Exported ONNX model + tokenizer (see scripts/export_onnx_model.py)
+ONNX_MODEL_DIR = BASE_DIR / "data" / "onnx_model"
+
+# Upper bound on queries accepted by POST /search/batch
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "64"))
+# Upper bound on top_k for /search, /search/batch, /rag and /chat
+SEARCH_MAX_TOP_K = int(os.getenv("SEARCH_MAX_TOP_K", "50"))
+# Default length of query-centred hit snippets (app/snippets.py)
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "240"))
+# Response compression (app/responses.py): gzip, or brotli when installed and accepted
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "true").lower() in ("1", "true", "yes")
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))  # 1-9; 9 is ~20% slower than 5 for <1% smaller bodies
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))  # 0-11
+
+# Optional cross-encoder rerank stage after RBAC filtering
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))  # vector hits fed to the reranker
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "8"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))  # per request
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))  # (query, chunk) scores
+
+# Result diversity: maximal marginal relevance over the RBAC-visible candidates
+MMR_ENABLED = os.getenv("MMR_ENABLED", "true").lower() in ("1", "true", "yes")
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1 = pure relevance, 0 = pure diversity
+MMR_FETCH_FACTOR = int(os.getenv("MMR_FETCH_FACTOR", "4"))  # candidates per kept hit
+
+# Conversation sessions (POST /chat, app/sessions.py): kept in each worker's memory,
+# evicted after SESSION_TTL_S idle or least recently used beyond SESSION_MAX_SESSIONS
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", "1800"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "6"))  # earlier turns repeated in the prompt
+SESSION_MAX_CONTEXT_CHUNKS = int(os.getenv("SESSION_MAX_CONTEXT_CHUNKS", "24"))  # retrieved chunks kept
+# Follow-ups reuse the session's chunks instead of searching when their top_k-th similarity to the
+# question is at least this fraction of the last search's; questions of up to
+# SESSION_FOLLOWUP_MAX_WORDS words ("and for Q3?") are searched together with the previous topic
+SESSION_REUSE_RATIO = float(os.getenv("SESSION_REUSE_RATIO", "0.9"))
+SESSION_FOLLOWUP_MAX_WORDS = int(os.getenv("SESSION_FOLLOWUP_MAX_WORDS", "6"))
+
+# Span timing for auth / retrieval / RAG stages (exported on GET /metrics)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Outbound LLM calls: deadline, retries, hedging, failover and circuit breaker
+LLM_FAILOVER_PROVIDERS = [
+    p.strip().lower() for p in os.getenv("LLM_FAILOVER_PROVIDERS", "").split(",") if p.strip()
+]  # tried in order after LLM_PROVIDER, e.g. "openai"
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "30"))  # whole generate() call, all attempts
+LLM_ATTEMPT_TIMEOUT_S = float(os.getenv("LLM_ATTEMPT_TIMEOUT_S", "15"))  # single provider call
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))  # per provider, retryable errors only
+LLM_RETRY_BASE_MS = float(os.getenv("LLM_RETRY_BASE_MS", "200"))
+LLM_RETRY_MAX_MS = float(os.getenv("LLM_RETRY_MAX_MS", "2000"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))  # hedge after this latency
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # consecutive, to open
+LLM_BREAKER_RESET_S = float(os.getenv("LLM_BREAKER_RESET_S", "30"))  # open -> half-open probe
+
+
+# Outbound LLM backpressure, per provider. LLM_* values are the defaults;
+# GROQ_* / OPENAI_* override them for one provider (e.g. GROQ_MAX_CONCURRENCY=4).
+def _llm_limits(prefix: str) -> dict:
+    def get(name: str, default: str) -> str:
+        return os.getenv(f"{prefix}_{name}", os.getenv(f"LLM_{name}", default))
+
+    return {
+        "max_concurrency": int(get("MAX_CONCURRENCY", "8")),  # calls in flight
+        "max_queue": int(get("MAX_QUEUE", "32")),  # callers waiting; beyond this -> 503
+        "queue_timeout_s": float(get("QUEUE_TIMEOUT_S", "10")),  # max wait for a slot
+        "rate_per_s": float(get("RATE_PER_S", "0")),  # token bucket, 0 = unlimited
+        "burst": float(get("RATE_BURST", "8")),
+    }
+
+
+LLM_LIMITS = {
+    "default": _llm_limits("LLM"),
+    "groq": _llm_limits("GROQ"),
+    "openai": _llm_limits("OPENAI"),
+}
+
+
+# Per-user quotas and fair queuing for /search, /search/batch, /rag, /rag/stream
+# and /chat (app/fairshare.py). Quotas are token buckets in cost units: a query
+# costs 1 (a batch one per query), a call that reaches the LLM QUOTA_LLM_COST
+# (charged up front; a RAG/chat call that finds no hits is refunded down to 1).
+FAIR_SHARE_ENABLED = os.getenv("FAIR_SHARE_ENABLED", "true").lower() in ("1", "true", "yes")
+QUOTA_ENABLED = os.getenv("QUOTA_ENABLED", "true").lower() in ("1", "true", "yes")
+QUOTA_LLM_COST = float(os.getenv("QUOTA_LLM_COST", "5"))
+QUOTA_MAX_PRINCIPALS = int(os.getenv("QUOTA_MAX_PRINCIPALS", "10000"))  # buckets kept (LRU)
+FAIR_RETRIEVAL_CONCURRENCY = int(os.getenv("FAIR_RETRIEVAL_CONCURRENCY", "4"))  # searches running at once
+FAIR_LLM_CONCURRENCY = int(os.getenv("FAIR_LLM_CONCURRENCY", str(LLM_LIMITS["default"]["max_concurrency"])))
+FAIR_MAX_QUEUE = int(os.getenv("FAIR_MAX_QUEUE", "256"))  # waiting per lane; beyond this -> 503
+FAIR_MAX_QUEUED_PER_PRINCIPAL = int(os.getenv("FAIR_MAX_QUEUED_PER_PRINCIPAL", "16"))
+FAIR_QUEUE_TIMEOUT_S = float(os.getenv("FAIR_QUEUE_TIMEOUT_S", "10"))
+
+# (rate_per_s, burst, weight) per role; QUOTA_<ROLE>_RATE_PER_S / _BURST / _WEIGHT
+# override them (e.g. QUOTA_EMPLOYEE_RATE_PER_S=1). rate 0 = no quota.
+# The weight is the role's share of a lane when several users are queued.
+_DEFAULT_ROLE_QUOTAS = {"c_level": (8.0, 120.0, 4.0), "employee": (2.0, 30.0, 1.0)}
+
+
+def _role_quota(role: str) -> dict:
+    rate, burst, weight = _DEFAULT_ROLE_QUOTAS.get(role, (4.0, 60.0, 2.0))
+    prefix = f"QUOTA_{role.upper()}"
+    return {
+        "rate_per_s": float(os.getenv(f"{prefix}_RATE_PER_S", str(rate))),
+        "burst": float(os.getenv(f"{prefix}_BURST", str(burst))),
+        "weight": max(0.01, float(os.getenv(f"{prefix}_WEIGHT", str(weight)))),
+    }
+
+
+ROLE_QUOTAS = {role: _role_quota(role) for role in ROLES}
+ROLE_QUOTAS["default"] = _role_quota("default")
@@ -0,0 +1,240 @@
+"""
+Near-duplicate chunk detection for preprocessing (scripts/preprocess_docs.py).
+
+Overlapping reports (e.g. an annual marketing report next to the quarterly
+ones) produce chunks that differ by a few words. Indexing all of them wastes
+embedding compute and index space, and their near-identical vectors crowd
+out other results.
+
+Each text becomes a set of word shingles (DEDUP_SHINGLE_WORDS consecutive
+words). MinHash signatures (DEDUP_NUM_PERM hash functions) split into
+DEDUP_BANDS LSH bands propose candidate pairs. A candidate only counts as a
+duplicate if the exact Jaccard similarity of the two shingle sets reaches
+DEDUP_THRESHOLD. Groups are the connected components of the confirmed pairs.
+
+A near-duplicate can still contain a sentence the other copies lack, so a
+group is first split by access (`access_groups`): exact copies (same words
+after lowercasing) are merged whatever their roles, near-duplicates only with
+chunks readable by the same roles. Otherwise merging would show one role the
+text of a chunk only another role may read.
+
+`merge_group` keeps one canonical chunk per (split) group. It carries the
+union of the group's `allowed_roles` and department folders (`departments`,
+read by app/rbac.py) and lists the other members under `duplicates`. The
+other members are kept in the chunk store with `duplicate_of` set. The
+indexer skips them, and the next incremental run can still reuse them.
+"""
+from __future__ import annotations
+
+import hashlib
+from itertools import chain
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import (
+    DEDUP_BANDS,
+    DEDUP_NUM_PERM,
+    DEDUP_SHINGLE_WORDS,
+    DEDUP_THRESHOLD,
+    DEPARTMENT_TO_ROLES,
+    DEPARTMENTS,
+    ROLES,
+)
+from .rbac import DEPARTMENT_FOLDERS_BY_ID, chunk_departments
+
+# Fields added by merge_group; raw_chunk() strips them again
+DEDUP_FIELDS = ("departments", "duplicates", "duplicate_of")
+
+_SHINGLE_PRIME = np.uint64(1099511628211)  # FNV-64 prime, combines word hashes into a shingle hash
+
+
+def _word_hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def shingles(texts: Sequence[str], k: int = DEDUP_SHINGLE_WORDS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Shingle hashes of all texts, concatenated, and the offset of each text's
+    run (len(texts) + 1 offsets). A text shorter than `k` words is one shingle;
+    an empty text has none. Hashes are stable across processes, so every
+    incremental run groups the corpus the same way.
+    """
+    words = [text.lower().split() for text in texts]
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    # Not the built-in hash(): str hashes are salted per process (PYTHONHASHSEED).
+    # Each distinct word is hashed once; signed ints convert faster than uint64
+    vocab = dict.fromkeys(chain.from_iterable(words))
+    for word in vocab:
+        vocab[word] = _word_hash(word)
+    h = np.fromiter(map(vocab.__getitem__, chain.from_iterable(words)), dtype=np.int64, count=int(lengths.sum())).view(np.uint64)
+
+    counts = np.where(lengths >= k, lengths - k + 1, np.minimum(lengths, 1))
+    word_starts = np.concatenate(([0], np.cumsum(lengths)))
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    out = np.empty(int(offsets[-1]), dtype=np.uint64)
+
+    with np.errstate(over="ignore"):
+        # Rolling hash of every k-word window over the concatenated words (zero-padded at the end) ...
+        padded = np.concatenate((h, np.zeros(k - 1, dtype=np.uint64)))
+        windows = np.zeros(len(h), dtype=np.uint64)
+        for j in range(k):
+            windows *= _SHINGLE_PRIME
+            windows += padded[j : j + len(h)]
+
+        # ... of which each text keeps the ones that end inside it
+        full = np.flatnonzero(lengths >= k)
+        n = counts[full]
+        within = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        out[np.repeat(offsets[full], n) + within] = windows[np.repeat(word_starts[full], n) + within]
+
+        for t in np.flatnonzero((lengths > 0) & (lengths < k)):
+            value = np.uint64(0)
+            for word in h[word_starts[t] : word_starts[t + 1]]:
+                value = value * _SHINGLE_PRIME + word
+            out[offsets[t]] = value
+    return out, offsets
+
+
+def minhash_signatures(
+    hashes: np.ndarray, offsets: np.ndarray, num_perm: int = DEDUP_NUM_PERM, seed: int = 1
+) -> np.ndarray:
+    """
+    (len(offsets) - 1, num_perm) MinHash signatures of the shingle runs from
+    shingles(), using multiply-shift hashing. Every run must be non-empty.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)  # odd multipliers
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    sig = np.empty((len(offsets) - 1, num_perm), dtype=np.uint32)
+    tmp = np.empty_like(hashes)
+    with np.errstate(over="ignore"):
+        for p in range(num_perm):
+            np.multiply(hashes, a[p], out=tmp)
+            np.add(tmp, b[p], out=tmp)
+            np.right_shift(tmp, np.uint64(32), out=tmp)
+            sig[:, p] = np.minimum.reduceat(tmp, offsets[:-1])
+    return sig
+
+
+def jaccard(x: np.ndarray, y: np.ndarray) -> float:
+    x, y = np.unique(x), np.unique(y)
+    inter = len(np.intersect1d(x, y, assume_unique=True))
+    return inter / (len(x) + len(y) - inter)
+
+
+def find_duplicate_groups(
+    texts: Sequence[str],
+    threshold: float = DEDUP_THRESHOLD,
+    num_perm: int = DEDUP_NUM_PERM,
+    bands: int = DEDUP_BANDS,
+) -> List[List[int]]:
+    """
+    Groups (sorted index lists, 2+ members) of texts whose shingle sets have
+    Jaccard similarity >= `threshold` with another member.
+    """
+    hashes, offsets = shingles(texts)
+    rows = np.flatnonzero(np.diff(offsets) > 0)  # empty texts are never duplicates
+    if len(rows) < 2:
+        return []
+    offsets = np.concatenate((offsets[rows], [offsets[-1]]))
+    sig = minhash_signatures(hashes, offsets, num_perm)
+
+    def shingle_set(i: int) -> np.ndarray:
+        return hashes[offsets[i] : offsets[i + 1]]
+
+    parent = list(range(len(rows)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    r = num_perm // bands
+    for band in range(bands):
+        keys = np.ascontiguousarray(sig[:, band * r : (band + 1) * r]).view(f"V{4 * r}").ravel()
+        _, bucket, sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        shared = np.flatnonzero(sizes[bucket] > 1)
+        # Members of a bucket are compared with its first member; pairs they
+        # miss in this band usually share another one
+        first: Dict[int, int] = {}
+        for i in shared:
+            i = int(i)
+            rep = first.setdefault(int(bucket[i]), i)
+            if rep == i:
+                continue
+            root_i, root_rep = find(i), find(rep)
+            if root_i != root_rep and jaccard(shingle_set(i), shingle_set(rep)) >= threshold:
+                parent[root_i] = root_rep
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(rows)):
+        groups.setdefault(find(i), []).append(int(rows[i]))
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def raw_chunk(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    `chunk` as the chunker produced it, without the annotations of merge_group.
+    """
+    if not any(field in chunk for field in DEDUP_FIELDS):
+        return chunk
+    raw = {k: v for k, v in chunk.items() if k not in DEDUP_FIELDS}
+    folder = DEPARTMENT_FOLDERS_BY_ID.get(chunk["department"], chunk["department"])
+    raw["allowed_roles"] = DEPARTMENT_TO_ROLES.get(folder, [])
+    return raw
+
+
+def access_groups(group: Sequence[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    The parts of a near-duplicate group that can be merged without widening
+    anyone's access to text they could not read before: exact copies of a text
+    form one unit (union of their roles), and units are merged only with units
+    readable by the same set of roles. Parts with a single chunk are dropped.
+    """
+    exact: Dict[str, List[Dict[str, Any]]] = {}
+    for chunk in group:
+        exact.setdefault(" ".join(chunk["text"].lower().split()), []).append(chunk)
+    by_roles: Dict[frozenset, List[Dict[str, Any]]] = {}
+    for copies in exact.values():
+        roles = frozenset(r for c in copies for r in c["allowed_roles"])
+        by_roles.setdefault(roles, []).extend(copies)
+    return [part for part in by_roles.values() if len(part) > 1]
+
+
+def merge_group(group: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Annotated copies of one duplicate group: the member with the smallest id is
+    canonical (stable across runs), the others point at it. The group must be
+    safe to merge (see access_groups), as the canonical text is served to the
+    union of the members' roles.
+    """
+    ordered = sorted(group, key=lambda c: c["id"])
+    canonical = dict(ordered[0])
+    roles = {r for c in group for r in c["allowed_roles"]}
+    folders = {f for c in group for f in chunk_departments(c)}
+    canonical["allowed_roles"] = [r for r in ROLES if r in roles] + sorted(roles - set(ROLES))
+    canonical["departments"] = [d for d in DEPARTMENTS if d in folders]
+    canonical["duplicates"] = [{"id": c["id"], "source_path": c["source_path"]} for c in ordered[1:]]
+    return [canonical] + [{**c, "duplicate_of": canonical["id"]} for c in ordered[1:]]
+
+
+def dedupe_chunks(chunks: List[Dict[str, Any]], candidates: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """
+    Merge near-duplicates among `chunks` (or only the positions in
+    `candidates`) in place; list positions are kept. Returns the duplicate
+    groups as lists of positions in `chunks`.
+    """
+    positions = list(range(len(chunks))) if candidates is None else list(candidates)
+    position_of = {chunks[i]["id"]: i for i in positions}
+    groups = []
+    for similar in find_duplicate_groups([chunks[i]["text"] for i in positions]):
+        for part in access_groups([chunks[positions[i]] for i in similar]):
+            group = sorted(position_of[c["id"]] for c in part)
+            merged = {c["id"]: c for c in merge_group(part)}
+            for i in group:
+                chunks[i] = merged[chunks[i]["id"]]
+            groups.append(group)
+    return groups
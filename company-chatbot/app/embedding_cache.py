@@ -0,0 +1,187 @@
+# app/embedding_cache.py
+"""
+Persistent embedding cache for the indexer, keyed by (backend name, sha256 of
+the chunk text).
+
+Most chunk texts are byte-identical from one rebuild to the next, so
+index_chunks only has to encode the chunks that actually changed. Vectors are
+stored as float32 blobs in a single SQLite file (stdlib, no extra dependency).
+The total size is capped and least-recently-used rows are evicted first.
+The backend name includes the model and the inference backend
+(e.g. ":onnx-int8"), so switching either never serves stale vectors.
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_MAX_MB, EMBEDDING_CACHE_PATH
+
+if TYPE_CHECKING:
+    from .embeddings import EmbeddingBackend
+
+# SQLite's default limit on bound parameters is 999 on older builds
+_QUERY_BATCH = 500
+# Rough per-row overhead (key, model name, b-tree) on top of the vector bytes
+_ROW_OVERHEAD_BYTES = 96
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path = EMBEDDING_CACHE_PATH, max_mb: float = EMBEDDING_CACHE_MAX_MB):
+        self.path = Path(path)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        # Must precede table creation; lets evict() hand freed pages back to the OS
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Plain rowid table: vectors are ~1.5 KB blobs, which WITHOUT ROWID stores poorly
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                id        INTEGER PRIMARY KEY,
+                model     TEXT    NOT NULL,
+                text_hash BLOB    NOT NULL,
+                dim       INTEGER NOT NULL,
+                vector    BLOB    NOT NULL,
+                last_used INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_embeddings_key ON embeddings (model, text_hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    # -----------------------------
+    # Raw access
+    # -----------------------------
+    def get_many(self, model: str, dim: int, hashes: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+        now = int(time.time())
+        unique = list(dict.fromkeys(hashes))
+        for i in range(0, len(unique), _QUERY_BATCH):
+            batch = unique[i : i + _QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND dim = ? AND text_hash IN ({placeholders})",
+                [model, dim, *batch],
+            ).fetchall()
+            for h, blob in rows:
+                found[h] = np.frombuffer(blob, dtype=np.float32)
+            # Touch hits so LRU eviction keeps what the current corpus still uses
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model, h) for h, _ in rows],
+            )
+        self._conn.commit()
+        return found
+
+    def put_many(self, model: str, hashes: Sequence[bytes], vectors: np.ndarray) -> None:
+        now = int(time.time())
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+            [(model, h, int(v.shape[0]), v.tobytes(), now) for h, v in zip(hashes, vectors)],
+        )
+        self._conn.commit()
+
+    def size_bytes(self) -> int:
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) + COUNT(*) * ? FROM embeddings", (_ROW_OVERHEAD_BYTES,)
+        ).fetchone()
+        return int(row[0])
+
+    def evict(self) -> int:
+        """
+        Delete least-recently-used rows until the cache fits in max_bytes.
+        """
+        size = self.size_bytes()
+        if size <= self.max_bytes:
+            return 0
+
+        count, avg_row = self._conn.execute(
+            "SELECT COUNT(*), AVG(LENGTH(vector)) + ? FROM embeddings", (_ROW_OVERHEAD_BYTES,)
+        ).fetchone()
+        excess_rows = min(count, int((size - self.max_bytes) / avg_row) + 1)
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE id IN (
+                SELECT id FROM embeddings ORDER BY last_used ASC LIMIT ?
+            )
+            """,
+            (excess_rows,),
+        )
+        self._conn.commit()
+        # executescript steps the pragma to completion (execute() frees one page)
+        self._conn.executescript("PRAGMA incremental_vacuum;")
+        self.evicted += excess_rows
+        return excess_rows
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # -----------------------------
+    # Indexer entry point
+    # -----------------------------
+    def encode(self, model: "EmbeddingBackend", texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        model.encode(texts) with cached rows filled in from disk; only the misses
+        are sent to the model, and their vectors are written back.
+        """
+        hashes = [text_hash(t) for t in texts]
+        cached = self.get_many(model.name, model.dim, hashes)
+
+        out = np.empty((len(texts), model.dim), dtype=np.float32)
+        missing: List[int] = []
+        for i, h in enumerate(hashes):
+            vector = cached.get(h)
+            if vector is None:
+                missing.append(i)
+            else:
+                out[i] = vector
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            encoded = model.encode([texts[i] for i in missing], batch_size=batch_size)
+            out[missing] = encoded
+            # Duplicate texts within the batch share a key; INSERT OR REPLACE handles it
+            self.put_many(model.name, [hashes[i] for i in missing], encoded)
+        return out
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Embedding cache: {self.hits}/{self.hits + self.misses} hits ({self.hit_rate:.1%}), "
+            f"{self.misses} encoded, {self.evicted} evicted, "
+            f"{self.size_bytes() / 1e6:.1f} MB at {self.path}"
+        )
+
+
+def open_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    The indexer's cache, or None when EMBEDDING_CACHE_ENABLED is off.
+    """
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    return EmbeddingCache()
@@ -0,0 +1,133 @@
+"""
+Node-local embedding sidecar: one model instance shared by every API worker.
+
+Workers (EMBEDDING_BACKEND=sidecar, see SidecarEmbeddingBackend) send texts
+over a Unix socket. Requests that arrive together, whether from different
+workers or threads, are merged into one model call (micro-batching). Inference
+runs on a single executor thread, so the model's own thread pool
+(EMBEDDING_NUM_THREADS) is the node's whole embedding thread budget.
+
+Frames are app/wire.py's length-prefixed JSON header + raw payload. Requests
+carry everything in the header ({"op": "encode", "texts": [...]},
+{"op": "info"}, {"op": "stats"}). Encode responses return {"n", "dim"} in the
+header and the vectors as raw little-endian float32 in the payload.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from .config import EMBEDDING_SIDECAR_MAX_BATCH, EMBEDDING_SIDECAR_MAX_WAIT_MS, EMBEDDING_SIDECAR_SOCKET
+from .embeddings import EmbeddingBackend
+from .wire import pack_frame, read_frame, remove_socket_file, serve_until_stopped, start_server
+
+
+class EmbeddingServer:
+    def __init__(
+        self,
+        model: EmbeddingBackend,
+        max_batch: int = EMBEDDING_SIDECAR_MAX_BATCH,
+        max_wait_ms: float = EMBEDDING_SIDECAR_MAX_WAIT_MS,
+    ):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        self._queue: asyncio.Queue[Tuple[List[str], asyncio.Future]] = asyncio.Queue()
+        # One inference thread: the model's intra-op threads do the parallel work
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "encode_s": 0.0, "connections": 0}
+        self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    async def _batcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            n_texts = len(batch[0][0])
+            deadline = loop.time() + self.max_wait_s
+            # Requests queued while the previous batch was encoding join immediately;
+            # otherwise wait up to max_wait_s for more. Clients send one request at a
+            # time per connection, so once every connection is in the batch nothing
+            # else can arrive.
+            while n_texts < self.max_batch and len(batch) < len(self._connections):
+                timeout = deadline - loop.time()
+                try:
+                    item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                batch.append(item)
+                n_texts += len(item[0])
+
+            texts = [t for item_texts, _ in batch for t in item_texts]
+            t0 = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(self._executor, self.model.encode, texts, self.max_batch)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.stats["encode_s"] += time.perf_counter() - t0
+            self.stats["batches"] += 1
+
+            start = 0
+            for item_texts, fut in batch:
+                if not fut.done():
+                    fut.set_result(vectors[start : start + len(item_texts)])
+                start += len(item_texts)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats["connections"] += 1
+        self._connections[writer] = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    header, _ = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+
+                op = header.get("op")
+                if op == "encode":
+                    texts = [str(t) for t in header.get("texts", [])]
+                    self.stats["requests"] += 1
+                    self.stats["texts"] += len(texts)
+                    fut = loop.create_future()
+                    await self._queue.put((texts, fut))
+                    try:
+                        vectors = await fut
+                    except Exception as e:
+                        writer.write(pack_frame({"ok": False, "error": f"{type(e).__name__}: {e}"}))
+                    else:
+                        payload = vectors.astype("<f4", copy=False).tobytes()
+                        writer.write(pack_frame({"ok": True, "n": len(texts), "dim": self.model.dim}, payload))
+                elif op == "info":
+                    writer.write(pack_frame({"ok": True, "name": self.model.name, "dim": self.model.dim}))
+                elif op == "stats":
+                    batches = self.stats["batches"]
+                    writer.write(pack_frame({
+                        "ok": True,
+                        **self.stats,
+                        "avg_batch": round(self.stats["texts"] / batches, 2) if batches else 0.0,
+                    }))
+                else:
+                    writer.write(pack_frame({"ok": False, "error": f"unknown op: {op!r}"}))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def serve(self, address: str = EMBEDDING_SIDECAR_SOCKET) -> None:
+        address = str(address)
+        server = await start_server(self._handle, address)
+        batcher = asyncio.create_task(self._batcher())
+        print(f"Embedding sidecar serving {self.model.name} (dim {self.model.dim}) on {address}", flush=True)
+        try:
+            await serve_until_stopped(server, self._connections)
+        finally:
+            batcher.cancel()
+            self._executor.shutdown(wait=False)
+            remove_socket_file(address)
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+from .config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_QUANTIZE,
+    EMBEDDING_NUM_THREADS,
+    EMBEDDING_SIDECAR_BACKEND,
+    EMBEDDING_SIDECAR_RETRY_S,
+    EMBEDDING_SIDECAR_SOCKET,
+    EMBEDDING_SIDECAR_TIMEOUT_S,
+    ONNX_MODEL_DIR,
+)
+from .wire import connect, pack_frame, recv_frame
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+# all-MiniLM-L6-v2 was trained with 256 word pieces; longer inputs are truncated
+MAX_SEQ_LENGTH = 256
+
+
+class EmbeddingBackend:
+    """
+    Minimal interface shared by all embedding backends.
+
+    `encode` mirrors SentenceTransformer.encode: a list of texts in, a 2D float32
+    numpy array of L2-normalized embeddings out, so callers can keep doing
+    `model.encode(texts).tolist()`.
+    """
+
+    # Identifies model + backend + precision, e.g. for caches keyed by model
+    name: str = ""
+    dim: int = 0
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> "np.ndarray":
+        raise NotImplementedError
+
+
+class TorchEmbeddingBackend(EmbeddingBackend):
+    """
+    The original PyTorch SentenceTransformer model.
+
+    `model_dir` loads saved weights (e.g. from an index snapshot) instead of
+    resolving `model_name` through the Hugging Face cache / download.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, model_dir: Optional[Path] = None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if EMBEDDING_NUM_THREADS > 0:
+            torch.set_num_threads(EMBEDDING_NUM_THREADS)
+
+        self.model = SentenceTransformer(str(model_dir) if model_dir else model_name)
+        self.name = f"{model_name}:torch"
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> "np.ndarray":
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """
+    ONNX Runtime inference on CPU, optionally with an int8 dynamically
+    quantized graph. Reproduces the SentenceTransformer pipeline for
+    all-MiniLM-L6-v2: tokenize -> transformer -> mean pooling -> L2 normalize.
+
+    Only onnxruntime, tokenizers and numpy are needed at serve time; the model
+    is exported once with `python -m scripts.export_onnx_model`.
+    """
+
+    def __init__(
+        self,
+        model_dir: Path = ONNX_MODEL_DIR,
+        quantized: bool = EMBEDDING_ONNX_QUANTIZE,
+        model_name: str = EMBEDDING_MODEL_NAME,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = model_dir / (ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        tokenizer_file = model_dir / "tokenizer.json"
+        if not model_file.exists() or not tokenizer_file.exists():
+            raise RuntimeError(
+                f"ONNX model not found in {model_dir}. "
+                "Run `python -m scripts.export_onnx_model` first."
+            )
+
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_file))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if EMBEDDING_NUM_THREADS > 0:
+            options.intra_op_num_threads = EMBEDDING_NUM_THREADS
+
+        self.session = ort.InferenceSession(
+            str(model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1]
+        self.name = f"{model_name}:onnx{'-int8' if quantized else ''}"
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> "np.ndarray":
+        import numpy as np
+
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        out = []
+        for i in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[i : i + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real (non-padding) tokens
+            mask = attention_mask[..., None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            counts = np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled = summed / counts
+
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            out.append(pooled / np.clip(norms, 1e-12, None))
+
+        return np.concatenate(out).astype(np.float32, copy=False)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Model-free feature hashing of word tokens into a fixed-size unit vector.
+
+    Only meant for pipeline / scale testing (ingestion, indexing, search
+    mechanics at millions of chunks) where running the real model would
+    dominate or be infeasible. Retrieval quality is not representative.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> "np.ndarray":
+        import zlib
+
+        import numpy as np
+
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in text.lower().split():
+                h = zlib.crc32(token.encode("utf-8"))
+                out[i, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.clip(norms, 1e-12, None)
+
+
+class SidecarEmbeddingBackend(EmbeddingBackend):
+    """
+    Client of the node-local embedding sidecar (scripts/embedding_sidecar.py):
+    API workers share its single model instead of each loading their own.
+
+    Each thread keeps its own Unix socket connection; concurrent requests are
+    micro-batched by the sidecar. If the sidecar is unreachable, an in-process
+    EMBEDDING_SIDECAR_BACKEND model is loaded as a fallback and the sidecar is
+    retried every EMBEDDING_SIDECAR_RETRY_S. `name` is the served model's name,
+    so both paths share embedding cache entries.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = EMBEDDING_SIDECAR_SOCKET,
+        fallback_backend: str = EMBEDDING_SIDECAR_BACKEND,
+        timeout_s: float = EMBEDDING_SIDECAR_TIMEOUT_S,
+        retry_s: float = EMBEDDING_SIDECAR_RETRY_S,
+    ):
+        self.socket_path = str(socket_path)
+        self.fallback_backend = fallback_backend
+        self.timeout_s = timeout_s
+        self.retry_s = retry_s
+        self._local = threading.local()
+        self._fallback: Optional[EmbeddingBackend] = None
+        self._fallback_lock = threading.Lock()
+        self._retry_at = 0.0
+
+        try:
+            info, _ = self._request({"op": "info"})
+        except OSError as e:
+            print(f"Embedding sidecar unavailable at {self.socket_path} ({e}); using in-process model")
+            fallback = self._use_fallback()
+            self.name, self.dim = fallback.name, fallback.dim
+        else:
+            self.name, self.dim = info["name"], info["dim"]
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = self._local.sock = connect(self.socket_path, self.timeout_s)
+        return sock
+
+    def _request(self, header: dict):
+        sock = self._connection()
+        try:
+            sock.sendall(pack_frame(header))
+            response, payload = recv_frame(sock)
+        except OSError:
+            # Connection state is unknown after a partial exchange: start over next time
+            sock.close()
+            self._local.sock = None
+            raise
+        if not response.get("ok"):
+            raise RuntimeError(f"Embedding sidecar error: {response.get('error')}")
+        return response, payload
+
+    def _use_fallback(self) -> EmbeddingBackend:
+        with self._fallback_lock:
+            if self._fallback is None:
+                self._fallback = create_embedding_backend(self.fallback_backend)
+            self._retry_at = time.monotonic() + self.retry_s
+            return self._fallback
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> "np.ndarray":
+        import numpy as np
+
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        if self._fallback is None or time.monotonic() >= self._retry_at:
+            try:
+                response, payload = self._request({"op": "encode", "texts": list(texts)})
+            except OSError as e:
+                print(f"Embedding sidecar request failed ({e}); using in-process model")
+            else:
+                return np.frombuffer(payload, dtype="<f4").reshape(response["n"], response["dim"])
+        return self._use_fallback().encode(texts, batch_size=batch_size)
+
+
+def create_embedding_backend(
+    backend: str = EMBEDDING_BACKEND,
+    quantized: bool = EMBEDDING_ONNX_QUANTIZE,
+    model_dir: Optional[Path] = None,
+) -> EmbeddingBackend:
+    """
+    Build the backend selected through config (EMBEDDING_BACKEND).
+    `model_dir` overrides where torch / onnx weights are loaded from.
+    """
+    if backend == "torch":
+        return TorchEmbeddingBackend(model_dir=model_dir)
+    if backend == "onnx":
+        return OnnxEmbeddingBackend(model_dir=model_dir or ONNX_MODEL_DIR, quantized=quantized)
+    if backend == "hash":
+        return HashingEmbeddingBackend()
+    if backend == "sidecar":
+        return SidecarEmbeddingBackend()
+    raise ValueError(f"Unsupported embedding backend: {backend}")
+
+
+def export_onnx_model(
+    model_dir: Path = ONNX_MODEL_DIR,
+    model_name: str = EMBEDDING_MODEL_NAME,
+    quantize: bool = True,
+) -> None:
+    """
+    Export the HF transformer behind the SentenceTransformer to ONNX, save its
+    fast tokenizer next to it and (optionally) write an int8 dynamically
+    quantized copy. Needs torch + transformers, but only at export time.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    dummy = tokenizer(["export the embedding model"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            str(model_dir / ONNX_MODEL_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(str(model_dir))
+    print(f"Exported {model_name} to {model_dir / ONNX_MODEL_FILE}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            str(model_dir / ONNX_MODEL_FILE),
+            str(model_dir / ONNX_QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8,
+        )
+        print(f"Wrote int8 quantized model to {model_dir / ONNX_QUANTIZED_MODEL_FILE}")
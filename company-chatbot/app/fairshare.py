@@ -0,0 +1,357 @@
+"""
+Per-user quotas and weighted fair queuing for the expensive endpoints
+(/search, /search/batch, /rag, /rag/stream, /chat).
+
+Without it, one user scripting /rag in a loop fills the retrieval threadpool
+and the LLM limiter's FIFO queue, and everyone else waits behind them.
+
+* Quota: every user (principal) has a token bucket sized by role
+  (ROLE_QUOTAS). `admit` charges the request's cost when it arrives; an
+  empty bucket is a 429 with Retry-After before any work is done. Requests
+  that may call the LLM are charged QUOTA_LLM_COST up front, and the LLM part
+  is refunded (`refund_llm_cost`) when they end without an LLM call.
+* Fair queuing: retrieval and LLM calls each go through a lane
+  (FairScheduler) with a fixed number of slots. When they are all taken,
+  waiting calls are ordered by virtual finish time (start-time fair queuing):
+  a user's call is tagged max(lane virtual time, their previous tag) +
+  cost / role weight. Someone with 50 queued calls therefore gets their share
+  of slots, not all of them, and a user arriving with one call is served next
+  in line. A user may have at most FAIR_MAX_QUEUED_PER_PRINCIPAL calls
+  waiting per lane, so they cannot fill the queue for others either.
+
+The user is carried in a context variable set by `admit`, so the pipeline
+(app/rag.py, app/llm_client.py) takes lane slots without passing it around.
+State is per worker process, like the LLM limiters.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import (
+    FAIR_LLM_CONCURRENCY,
+    FAIR_MAX_QUEUE,
+    FAIR_MAX_QUEUED_PER_PRINCIPAL,
+    FAIR_QUEUE_TIMEOUT_S,
+    FAIR_RETRIEVAL_CONCURRENCY,
+    FAIR_SHARE_ENABLED,
+    QUOTA_ENABLED,
+    QUOTA_LLM_COST,
+    QUOTA_MAX_PRINCIPALS,
+    ROLE_QUOTAS,
+)
+from .metrics import REGISTRY
+from .ratelimit import OverloadedError, TokenBucket
+from .tracing import span
+
+QUEUE_SECONDS = REGISTRY.histogram(
+    "chatbot_fair_queue_seconds", "Time spent waiting for a fair-share lane slot, by lane and role.", ("lane", "role")
+)
+IN_FLIGHT = REGISTRY.gauge("chatbot_fair_in_flight", "Calls holding a fair-share lane slot.", ("lane",))
+QUEUE_DEPTH = REGISTRY.gauge("chatbot_fair_queue_depth", "Calls waiting for a fair-share lane slot.", ("lane",))
+REJECTED = REGISTRY.counter(
+    "chatbot_fair_rejected_total",
+    "Calls rejected by a fair-share lane (queue_full, principal_queue_full, queue_timeout).",
+    ("lane", "reason"),
+)
+QUOTA_REJECTED = REGISTRY.counter(
+    "chatbot_quota_rejected_total", "Requests rejected because the user's quota was used up, by role.", ("role",)
+)
+
+RETRIEVAL = "retrieval"
+LLM = "llm"
+
+
+class QuotaExceededError(OverloadedError):
+    """
+    The user's token bucket is empty; the API answers 429 with Retry-After.
+    """
+
+
+@dataclass(frozen=True)
+class Principal:
+    name: str
+    role: str
+    weight: float
+
+
+# Calls made outside a request (scripts, benchmarks) share one principal
+SYSTEM = Principal("-", "-", 1.0)
+
+_current_principal: ContextVar[Principal] = ContextVar("chatbot_principal", default=SYSTEM)
+# LLM part of the current request's charge, until it is refunded
+_llm_charge: ContextVar[Optional[Tuple[Principal, float]]] = ContextVar("chatbot_llm_charge", default=None)
+
+
+def _quota(role: str) -> Dict[str, float]:
+    return ROLE_QUOTAS.get(role, ROLE_QUOTAS["default"])
+
+
+class QuotaBook:
+    """
+    One token bucket per user (least recently seen dropped beyond max_principals).
+    """
+
+    def __init__(self, max_principals: int = QUOTA_MAX_PRINCIPALS):
+        self.max_principals = max_principals
+        self._buckets: OrderedDict[Tuple[str, str], TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, principal: Principal) -> Optional[TokenBucket]:
+        quota = _quota(principal.role)
+        if quota["rate_per_s"] <= 0:
+            return None
+        key = (principal.name, principal.role)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(quota["rate_per_s"], quota["burst"])
+                while len(self._buckets) > self.max_principals:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def charge(self, principal: Principal, cost: float) -> None:
+        bucket = self._bucket(principal)
+        if bucket is None:
+            return
+        if cost > bucket.capacity:
+            # TokenBucket.reserve caps a take at the burst, which would make a
+            # large batch cheaper than the same queries sent one by one
+            QUOTA_REJECTED.inc(principal.role)
+            raise QuotaExceededError(
+                f"Request costs {cost:g} quota units, more than the {principal.role} burst of "
+                f"{bucket.capacity:g}; split it into smaller requests",
+                retry_after_s=bucket.capacity / bucket.rate,
+            )
+        if bucket.reserve(0.0, cost) is not None:
+            return
+        QUOTA_REJECTED.inc(principal.role)
+        raise QuotaExceededError(
+            f"Request quota for '{principal.name}' used up ({principal.role}: "
+            f"{bucket.rate:g} units/s, burst {bucket.capacity:g}; this request costs {cost:g})",
+            retry_after_s=bucket.time_to_token(cost),
+        )
+
+    def refund(self, principal: Principal, cost: float) -> None:
+        bucket = self._bucket(principal)
+        if bucket is not None:
+            bucket.refund(cost)
+
+
+QUOTAS = QuotaBook()
+
+
+def admit(username: str, role: str, cost: float = 1.0, llm: bool = False) -> Principal:
+    """
+    Charge `cost` to the user's quota (QuotaExceededError if it is used up)
+    and make them the principal for the lane slots taken by this request.
+    With llm=True the charge is QUOTA_LLM_COST; what it adds over `cost` is
+    given back by refund_llm_cost() if the request does not call the LLM.
+    """
+    principal = Principal(username, role, _quota(role)["weight"])
+    llm_cost = max(QUOTA_LLM_COST - cost, 0.0) if llm else 0.0
+    if QUOTA_ENABLED:
+        QUOTAS.charge(principal, cost + llm_cost)
+    _current_principal.set(principal)
+    _llm_charge.set((principal, llm_cost) if QUOTA_ENABLED and llm_cost else None)
+    return principal
+
+
+def refund_llm_cost() -> None:
+    """
+    The current request will not call the LLM after all (e.g. no hits):
+    refund the LLM part of what `admit` charged. Only the first call refunds.
+    """
+    charge = _llm_charge.get()
+    if charge is not None:
+        _llm_charge.set(None)
+        QUOTAS.refund(*charge)
+
+
+def current_principal() -> Principal:
+    return _current_principal.get()
+
+
+class FairScheduler:
+    """
+    At most `max_concurrency` calls in flight; the rest wait and are admitted
+    in order of their virtual finish tag. Lives on the event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int = FAIR_MAX_QUEUE,
+        max_queued_per_principal: int = FAIR_MAX_QUEUED_PER_PRINCIPAL,
+        queue_timeout_s: float = FAIR_QUEUE_TIMEOUT_S,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_queued_per_principal = max(1, max_queued_per_principal)
+        self.queue_timeout_s = queue_timeout_s
+        self._in_flight = 0
+        # (finish tag, arrival, start tag, principal name, future); left futures are skipped lazily
+        self._heap: List[Tuple[float, int, float, str, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self._queued = 0
+        self._queued_by: Dict[str, int] = {}
+        self._finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        # EWMA of how long a slot is held, used for the Retry-After estimate
+        self._hold_s = 0.5
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def retry_after_s(self) -> float:
+        return (self._queued + 1) / self.max_concurrency * self._hold_s
+
+    def _update_gauges(self) -> None:
+        IN_FLIGHT.set(self.name, value=self._in_flight)
+        QUEUE_DEPTH.set(self.name, value=self._queued)
+
+    def _reject(self, reason: str) -> OverloadedError:
+        REJECTED.inc(self.name, reason)
+        return OverloadedError(
+            f"Lane '{self.name}' is saturated ({reason}); {self._in_flight} in flight, {self._queued} queued",
+            retry_after_s=self.retry_after_s(),
+        )
+
+    def _dequeued(self, principal: str) -> None:
+        self._queued -= 1
+        left = self._queued_by[principal] - 1
+        if left:
+            self._queued_by[principal] = left
+        else:
+            del self._queued_by[principal]
+
+    async def acquire(self, principal: Principal, cost: float = 1.0) -> float:
+        """
+        Wait for a slot; returns the time spent waiting. Raises OverloadedError
+        if the lane (or the user's share of its queue) is full or the wait
+        exceeds queue_timeout_s.
+        """
+        t0 = time.monotonic()
+        if self._in_flight < self.max_concurrency and not self._queued:
+            self._in_flight += 1
+        else:
+            if self._queued >= self.max_queue:
+                raise self._reject("queue_full")
+            if self._queued_by.get(principal.name, 0) >= self.max_queued_per_principal:
+                raise self._reject("principal_queue_full")
+
+            if len(self._finish) > 4 * self.max_queue:
+                # Tags at or behind virtual time no longer affect anyone's order
+                self._finish = {p: f for p, f in self._finish.items() if f > self._virtual_time}
+            start = max(self._virtual_time, self._finish.get(principal.name, 0.0))
+            finish = self._finish[principal.name] = start + cost / principal.weight
+
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._heap, (finish, next(self._arrivals), start, principal.name, waiter))
+            self._queued += 1
+            self._queued_by[principal.name] = self._queued_by.get(principal.name, 0) + 1
+            self._update_gauges()
+            try:
+                # release() hands its slot straight to the waiter with the lowest tag
+                await asyncio.wait_for(waiter, timeout=max(self.queue_timeout_s, 0.0))
+            except BaseException as exc:
+                if waiter.done() and not waiter.cancelled():
+                    self.release()
+                else:
+                    waiter.cancel()
+                    self._dequeued(principal.name)
+                self._update_gauges()
+                if isinstance(exc, TimeoutError):
+                    raise self._reject("queue_timeout") from None
+                raise
+        self._update_gauges()
+
+        waited = time.monotonic() - t0
+        QUEUE_SECONDS.observe(self.name, principal.role, value=waited)
+        return waited
+
+    def release(self, held_s: Optional[float] = None) -> None:
+        if held_s is not None:
+            self._hold_s = 0.8 * self._hold_s + 0.2 * held_s
+        while self._heap:
+            _, _, start, name, waiter = heapq.heappop(self._heap)
+            if waiter.done():  # timed out or cancelled, already dequeued
+                continue
+            self._virtual_time = max(self._virtual_time, start)
+            self._dequeued(name)
+            waiter.set_result(None)
+            self._update_gauges()
+            return
+        self._in_flight = max(0, self._in_flight - 1)
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 1.0) -> AsyncIterator[float]:
+        """
+        A slot for the current principal (see `admit`).
+        """
+        with span(f"fair.{self.name}"):
+            waited = await self.acquire(current_principal(), cost)
+        t0 = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.release(time.monotonic() - t0)
+
+
+_schedulers: Dict[str, FairScheduler] = {}
+
+
+def get_scheduler(lane: str) -> FairScheduler:
+    scheduler = _schedulers.get(lane)
+    if scheduler is None:
+        concurrency = FAIR_LLM_CONCURRENCY if lane == LLM else FAIR_RETRIEVAL_CONCURRENCY
+        scheduler = _schedulers[lane] = FairScheduler(lane, concurrency)
+    return scheduler
+
+
+def set_scheduler(lane: str, scheduler: FairScheduler) -> None:
+    _schedulers[lane] = scheduler
+
+
+def reset_schedulers() -> None:
+    _schedulers.clear()
+
+
+@asynccontextmanager
+async def fair_slot(lane: str, cost: float = 1.0) -> AsyncIterator[float]:
+    """
+    A slot in `lane` for the current principal; no-op when FAIR_SHARE_ENABLED is off.
+    """
+    if not FAIR_SHARE_ENABLED:
+        yield 0.0
+        return
+    async with get_scheduler(lane).slot(cost) as waited:
+        yield waited
+
+
+async def run_fair(lane: str, func: Callable[..., Any], *args: Any, cost: float = 1.0, **kwargs: Any) -> Any:
+    """
+    run_in_threadpool(func, ...) once the current principal has a slot in `lane`.
+    """
+    async with fair_slot(lane, cost):
+        return await run_in_threadpool(func, *args, **kwargs)
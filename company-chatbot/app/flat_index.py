@@ -0,0 +1,369 @@
+"""
+In-process flat vector index: brute-force search over a memory-mapped matrix.
+
+On-disk layout (one directory, written atomically):
+
+    columns.json            row count, dim, dtype, dictionaries, role list
+    embeddings.npy          (N, D) L2-normalized float32 / float16
+    ids.bin / ids.off.npy   UTF-8 string column + int64 offsets
+    documents.bin / documents.off.npy
+    <col>.codes.npy         dictionary-encoded metadata columns
+    chunk_index.npy         int32
+    dept_bits.npy           uint32 department bitmask per row (see app/rbac.py)
+    rbac.npy                (R, ceil(N / 8)) uint8 packed bitsets, one row per role
+
+With FLAT_INDEX_QUANTIZATION, embeddings.npy is float16 and only read for the
+rescoring of first-stage candidates; the full scan runs over a compressed copy:
+
+    quant.int8.npy          (N, D) int8, per-dimension symmetric scale
+    quant.scale.npy         (D,) float32
+    quant.bits.npy          (N, W) uint64 sign bits of (vector - center), W = ceil(D / 64)
+    quant.center.npy        (D,) float32 per-dimension mean
+
+Every array is opened with np.load(mmap_mode="r"), so several worker processes
+serving the same index share the page cache instead of holding private copies.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .columnar import dictionary_encode, fresh_tmp_dir, read_strings, swap_into_place, write_strings
+from .config import (
+    DEPARTMENTS,
+    FLAT_INDEX_DIR,
+    FLAT_INDEX_DTYPE,
+    FLAT_INDEX_QUANTIZATION,
+    FLAT_INDEX_RESCORE_FACTOR,
+    ROLE_TO_DEPARTMENTS,
+)
+from .rbac import build_role_masks, config_fingerprint
+
+FORMAT_VERSION = 1
+
+# Low-cardinality string metadata, stored as small integer codes + a dictionary
+DICT_COLUMNS = ["source_file", "source_path", "department", "allowed_roles"]
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+# Rows converted to float32 at a time when the matrix is stored as float16
+_SCORE_BLOCK_ROWS = 65536
+# int8 rows converted per block in the first-stage scan; small enough to stay in
+# CPU cache, which makes the int8 -> float32 conversion ~3x cheaper than 64k rows
+_INT8_BLOCK_ROWS = 1024
+
+# Fallback popcount table for NumPy < 2.0 (no np.bitwise_count)
+_POPCOUNT_U8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def sign_bits(vectors: np.ndarray, center: np.ndarray) -> np.ndarray:
+    """
+    Pack the signs of (vectors - center) into uint64 words for Hamming scans.
+    """
+    bits = np.packbits(vectors > center, axis=1)
+    pad = -bits.shape[1] % 8
+    if pad:
+        bits = np.pad(bits, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(bits).view(np.uint64)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    return _POPCOUNT_U8[words.view(np.uint8)]
+
+
+def _advise_random(array: np.ndarray) -> None:
+    mapping = getattr(array, "_mmap", None)
+    if mapping is not None and hasattr(mmap, "MADV_RANDOM"):
+        mapping.madvise(mmap.MADV_RANDOM)
+
+
+def write_flat_index(
+    ids: Sequence[str],
+    embeddings: np.ndarray,
+    documents: Sequence[str],
+    metadatas: Sequence[Dict[str, Any]],
+    index_dir: Path = FLAT_INDEX_DIR,
+    dtype: str = FLAT_INDEX_DTYPE,
+    quantization: str = FLAT_INDEX_QUANTIZATION,
+) -> None:
+    """
+    Write a complete index to `index_dir`, replacing any previous one.
+
+    Files are written to a sibling temp directory and published with
+    swap_into_place, so processes that already mmap'd the old index keep
+    reading valid pages.
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown flat index quantization: {quantization!r}")
+    n = len(ids)
+    tmp_dir = fresh_tmp_dir(index_dir)
+
+    vectors = normalize(embeddings)
+    if quantization != "none":
+        # Only candidates are rescored, so float16 is plenty and halves the disk footprint
+        dtype = "float16"
+    np.save(tmp_dir / "embeddings.npy", vectors.astype(dtype))
+    if quantization == "int8":
+        scale = np.clip(np.abs(vectors).max(axis=0, initial=0.0) / 127.0, 1e-12, None).astype(np.float32)
+        np.save(tmp_dir / "quant.int8.npy", np.round(vectors / scale).astype(np.int8))
+        np.save(tmp_dir / "quant.scale.npy", scale)
+    elif quantization == "binary":
+        # Centering first keeps every bit informative for embeddings that are not zero-mean
+        center = vectors.mean(axis=0) if n else np.zeros(vectors.shape[1], dtype=np.float32)
+        np.save(tmp_dir / "quant.bits.npy", sign_bits(vectors, center))
+        np.save(tmp_dir / "quant.center.npy", center.astype(np.float32))
+    write_strings(tmp_dir, "ids", ids)
+    write_strings(tmp_dir, "documents", documents)
+
+    dictionaries = {}
+    for col in DICT_COLUMNS:
+        dictionaries[col], codes = dictionary_encode([str(m.get(col, "")) for m in metadatas])
+        np.save(tmp_dir / f"{col}.codes.npy", codes)
+    np.save(tmp_dir / "chunk_index.npy", np.array([int(m.get("chunk_index", 0)) for m in metadatas], dtype=np.int32))
+
+    # RBAC bitsets: bit i of row r is set when roles[r] may see chunk i
+    roles = list(ROLE_TO_DEPARTMENTS)
+    dept_bits = np.array([int(m.get("dept_bits", 0)) for m in metadatas], dtype=np.uint32)
+    np.save(tmp_dir / "dept_bits.npy", dept_bits)
+    masks = build_role_masks(dept_bits, DEPARTMENTS, roles)
+    np.save(tmp_dir / "rbac.npy", np.packbits(np.stack([masks[r] for r in roles]), axis=1))
+
+    (tmp_dir / "columns.json").write_text(
+        json.dumps(
+            {
+                "version": FORMAT_VERSION,
+                "count": n,
+                "dim": int(embeddings.shape[1]) if n else 0,
+                "dtype": dtype,
+                "quantization": quantization,
+                "roles": roles,
+                "departments": list(DEPARTMENTS),
+                "rbac_fingerprint": config_fingerprint(),
+                "dictionaries": dictionaries,
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    swap_into_place(tmp_dir, index_dir)
+
+
+class FlatCollection:
+    """
+    Read-only collection with the subset of the Chroma Collection API that the
+    app uses (`count`, `query`), backed by the mmap'd files above.
+    """
+
+    def __init__(self, index_dir: Path = FLAT_INDEX_DIR):
+        # Resolve the version link once, so all files come from the same build
+        index_dir = index_dir.resolve()
+        self.index_dir = index_dir
+        info = json.loads((index_dir / "columns.json").read_text(encoding="utf-8"))
+        if info.get("version") != FORMAT_VERSION:
+            raise RuntimeError(f"Unsupported flat index version in {index_dir}: {info.get('version')}")
+
+        self.dim: int = info["dim"]
+        self.dictionaries: Dict[str, List[str]] = info["dictionaries"]
+        self.roles: List[str] = info["roles"]
+        self.departments: List[str] = info["departments"]
+        self._count: int = info["count"]
+        # Bitsets are only trusted if ROLE_TO_DEPARTMENTS is unchanged since the build
+        self._rbac_current = info.get("rbac_fingerprint") == config_fingerprint()
+
+        self.embeddings = np.load(index_dir / "embeddings.npy", mmap_mode="r")
+        self.ids = read_strings(index_dir, "ids")
+        self.documents = read_strings(index_dir, "documents")
+        self.codes = {col: np.load(index_dir / f"{col}.codes.npy", mmap_mode="r") for col in DICT_COLUMNS}
+        self.chunk_index = np.load(index_dir / "chunk_index.npy", mmap_mode="r")
+        self.dept_bits = np.load(index_dir / "dept_bits.npy", mmap_mode="r")
+        self._rbac_bits = np.load(index_dir / "rbac.npy", mmap_mode="r")
+        self._role_masks: Dict[str, np.ndarray] = {}
+
+        self.quantization: str = info.get("quantization", "none")
+        self.rescore_factor = FLAT_INDEX_RESCORE_FACTOR
+        if self.quantization != "none":
+            # Rescoring reads scattered rows: without this, readahead on every page
+            # fault pulls most of the float16 matrix into memory anyway
+            _advise_random(self.embeddings)
+        if self.quantization == "int8":
+            self._int8 = np.load(index_dir / "quant.int8.npy", mmap_mode="r")
+            self._int8_scale = np.load(index_dir / "quant.scale.npy")
+        elif self.quantization == "binary":
+            self._bits = np.load(index_dir / "quant.bits.npy", mmap_mode="r")
+            self._bits_center = np.load(index_dir / "quant.center.npy")
+
+    def count(self) -> int:
+        return self._count
+
+    def role_mask(self, role: str) -> np.ndarray:
+        """
+        Boolean visibility mask for `role`, unpacked once per process.
+        Unknown roles see nothing.
+        """
+        mask = self._role_masks.get(role)
+        if mask is None:
+            if self._rbac_current and role in self.roles:
+                row = self._rbac_bits[self.roles.index(role)]
+                mask = np.unpackbits(row, count=self._count).astype(bool)
+            else:
+                mask = build_role_masks(self.dept_bits, self.departments, [role])[role]
+            self._role_masks[role] = mask
+        return mask
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        meta: Dict[str, Any] = {
+            col: self.dictionaries[col][int(self.codes[col][i])] for col in DICT_COLUMNS
+        }
+        meta["chunk_index"] = int(self.chunk_index[i])
+        meta["dept_bits"] = int(self.dept_bits[i])
+        return meta
+
+    def scores(self, query_embeddings: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of every query against every row: one (m, D) x (D, N)
+        matmul, done block-wise when the matrix is stored as float16.
+        """
+        q = normalize(query_embeddings)
+        if self.embeddings.dtype == np.float32:
+            return q @ self.embeddings.T
+
+        out = np.empty((q.shape[0], self._count), dtype=np.float32)
+        for start in range(0, self._count, _SCORE_BLOCK_ROWS):
+            block = np.asarray(self.embeddings[start : start + _SCORE_BLOCK_ROWS], dtype=np.float32)
+            out[:, start : start + len(block)] = q @ block.T
+        return out
+
+    def approx_scores(self, query_embeddings: np.ndarray) -> np.ndarray:
+        """
+        First-stage scores from the quantized copy; only their order matters.
+        int8: dot product with the per-dimension scale folded into the query.
+        binary: negated Hamming distance between sign bit vectors.
+        """
+        q = normalize(query_embeddings)
+        out = np.empty((q.shape[0], self._count), dtype=np.float32)
+        if self.quantization == "int8":
+            qs = q * self._int8_scale
+            for start in range(0, self._count, _INT8_BLOCK_ROWS):
+                block = np.asarray(self._int8[start : start + _INT8_BLOCK_ROWS], dtype=np.float32)
+                out[:, start : start + len(block)] = qs @ block.T
+            return out
+
+        q_bits = sign_bits(q, self._bits_center)
+        for start in range(0, self._count, _SCORE_BLOCK_ROWS):
+            block = np.asarray(self._bits[start : start + _SCORE_BLOCK_ROWS])
+            for j in range(q.shape[0]):
+                dist = popcount(block ^ q_bits[j]).sum(axis=1, dtype=np.int32)
+                out[j, start : start + len(block)] = -dist
+        return out
+
+    def _top_k(self, q: np.ndarray, k: int, mask: Optional[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        (row numbers, cosine similarities) of the best `k` visible rows per query.
+        Quantized indexes rank top_k * rescore_factor candidates on the compressed
+        copy, then rescore them against the float16 vectors.
+        """
+        exact = self.quantization == "none"
+        sims = self.scores(q) if exact else self.approx_scores(q)
+        if mask is not None:
+            sims[:, ~mask] = -np.inf
+        available = self._count if mask is None else int(mask.sum())
+        n_candidates = k if exact else min(available, k * max(self.rescore_factor, 1))
+
+        out = []
+        for row, q_row in zip(sims, q):
+            if k <= 0:
+                out.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)))
+                continue
+            candidates = np.argpartition(-row, n_candidates - 1)[:n_candidates]
+            if exact:
+                scores = row[candidates]
+            else:
+                # Sorted rows keep the reads from the mmap'd float16 matrix sequential
+                candidates.sort()
+                scores = np.asarray(self.embeddings[candidates], dtype=np.float32) @ q_row
+            order = np.argsort(-scores, kind="stable")[:k]
+            out.append((candidates[order], scores[order]))
+        return out
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        include: Sequence[str] = ("documents", "metadatas", "distances"),
+        allowed_role: Optional[str] = None,
+    ) -> Dict[str, List[List[Any]]]:
+        """
+        Top-`n_results` rows per query, shaped like a Chroma query result.
+        Distances are cosine distances (1 - similarity), as with hnsw:space=cosine.
+
+        With `allowed_role`, rows the role may not see are masked out before
+        ranking, so every returned row is already RBAC-visible.
+        """
+        results: Dict[str, List[List[Any]]] = {"ids": []}
+        for key in include:
+            results[key] = []
+
+        if self._count == 0:
+            for key in results:
+                results[key] = [[] for _ in query_embeddings]
+            return results
+
+        q = normalize(np.asarray(query_embeddings, dtype=np.float32))
+        mask = None
+        available = self._count
+        if allowed_role is not None:
+            mask = self.role_mask(allowed_role.lower().strip())
+            available = int(mask.sum())
+
+        k = min(n_results, available)
+        for top, top_sims in self._top_k(q, k, mask):
+            results["ids"].append([self.ids[i] for i in top])
+            if "documents" in results:
+                results["documents"].append([self.documents[i] for i in top])
+            if "metadatas" in results:
+                results["metadatas"].append([self.metadata(i) for i in top])
+            if "distances" in results:
+                results["distances"].append([float(1.0 - s) for s in top_sims])
+            if "embeddings" in results:
+                results["embeddings"].append([np.asarray(self.embeddings[i], dtype=np.float32) for i in top])
+
+        return results
+
+
+# index directory -> (collection, columns.json mtime)
+_flat_collections: Dict[Path, Tuple[FlatCollection, int]] = {}
+
+
+def get_flat_collection(index_dir: Path = FLAT_INDEX_DIR) -> FlatCollection:
+    """
+    The process-wide FlatCollection for `index_dir`, reopened when the directory
+    has been swapped by a rebuild (e.g. scripts/watch_ingest.py), so new chunks
+    become searchable without restarting the API.
+    """
+    cached = _flat_collections.get(index_dir)
+    try:
+        mtime = (index_dir / "columns.json").stat().st_mtime_ns
+        if cached is None or cached[1] != mtime:
+            cached = _flat_collections[index_dir] = (FlatCollection(index_dir), mtime)
+    except (OSError, ValueError):
+        # A rebuild replacing the directory without symlinks leaves a short gap:
+        # keep serving the open collection rather than failing the request
+        if cached is not None:
+            return cached[0]
+        raise RuntimeError(
+            f"Flat index not found in {index_dir}. "
+            "Run `VECTOR_BACKEND=flat python -m scripts.build_vector_db` first."
+        ) from None
+    return cached[0]
@@ -0,0 +1,194 @@
+"""
+File change notifications for the raw data directory (used by scripts/watch_ingest.py).
+
+Two interchangeable watchers with the same `read(timeout_s)` method:
+
+* InotifyWatcher: Linux inotify through ctypes (no extra dependency). Wakes up
+  as soon as a file is closed after writing, moved or deleted.
+* PollingWatcher: compares (mtime, size) snapshots every `interval_s`. Works
+  everywhere, including network mounts where inotify sees nothing.
+
+Events only trigger an ingestion cycle. What actually changed is decided by
+the preprocessing manifest (app/changeset.py), so a lost or coalesced event
+(e.g. inotify queue overflow) never loses a change.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .config import INGEST_WATCH_BACKEND, INGEST_WATCH_POLL_S
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class FileEvent(NamedTuple):
+    path: Path
+    kind: str  # "changed" | "deleted" | "overflow"
+    seen_at: float  # time.time() when the watcher noticed it
+
+
+def _ignored(name: str) -> bool:
+    # Editor swap / backup files and partial downloads
+    return name.startswith(".") or name.endswith("~") or name.endswith(".tmp")
+
+
+class InotifyWatcher:
+    """
+    Watches `root` and its direct subdirectories (one per department).
+    """
+
+    latency_s = 0.0
+
+    def __init__(self, root: Path):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.root = root
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        self._add_watch(root)
+        for sub in root.iterdir():
+            if sub.is_dir():
+                self._add_watch(sub)
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self._dirs[wd] = directory
+
+    def read(self, timeout_s: Optional[float] = None) -> List[FileEvent]:
+        ready, _, _ = select.select([self._fd], [], [], timeout_s)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        now = time.time()
+        events: List[FileEvent] = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buf):
+            wd, mask, _cookie, name_len = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = buf[offset : offset + name_len].rstrip(b"\0").decode("utf-8", "replace")
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                events.append(FileEvent(self.root, "overflow", now))
+                continue
+            if mask & IN_IGNORED:
+                # Watched directory was removed
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name or _ignored(name):
+                continue
+
+            path = directory / name
+            if mask & IN_ISDIR:
+                # New department folder: watch it, and pick up files copied in before the watch existed
+                if mask & (IN_CREATE | IN_MOVED_TO) and directory == self.root:
+                    try:
+                        self._add_watch(path)
+                    except (FileNotFoundError, NotADirectoryError):
+                        # Renamed or removed before we got here (mkdir + mv, unzip / rsync
+                        # temp dirs); its own events follow, the cycle rescans anyway
+                        pass
+                    events.append(FileEvent(path, "changed", now))
+                continue
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                events.append(FileEvent(path, "deleted", now))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                events.append(FileEvent(path, "changed", now))
+        return events
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """
+    Portable fallback: diff (mtime, size) of every file every `interval_s`.
+    """
+
+    def __init__(self, root: Path, interval_s: float = INGEST_WATCH_POLL_S):
+        self.root = root
+        self.interval_s = interval_s
+        # A change is only visible at the next poll, so debouncing must wait at least this long
+        self.latency_s = interval_s
+        self._snapshot = self._scan()
+        self._next_poll = time.monotonic() + interval_s
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot: Dict[Path, Tuple[int, int]] = {}
+        for directory in [self.root, *(p for p in self.root.iterdir() if p.is_dir())]:
+            try:
+                entries = list(directory.iterdir())
+            except (FileNotFoundError, NotADirectoryError):
+                continue  # removed or replaced since the listing above
+            for path in entries:
+                if _ignored(path.name) or path.is_dir():
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def read(self, timeout_s: Optional[float] = None) -> List[FileEvent]:
+        wait = max(0.0, self._next_poll - time.monotonic())
+        if timeout_s is not None and timeout_s < wait:
+            time.sleep(timeout_s)
+            return []
+        time.sleep(wait)
+        self._next_poll = time.monotonic() + self.interval_s
+
+        now = time.time()
+        current = self._scan()
+        events = [FileEvent(p, "changed", now) for p, sig in current.items() if self._snapshot.get(p) != sig]
+        events += [FileEvent(p, "deleted", now) for p in self._snapshot if p not in current]
+        self._snapshot = current
+        return events
+
+    def close(self) -> None:
+        pass
+
+
+def create_watcher(root: Path, backend: str = INGEST_WATCH_BACKEND, poll_interval_s: float = INGEST_WATCH_POLL_S):
+    """
+    backend: "inotify", "poll", or "auto" (inotify when available).
+    """
+    if backend == "poll":
+        return PollingWatcher(root, poll_interval_s)
+    try:
+        return InotifyWatcher(root)
+    except (OSError, AttributeError) as e:
+        # AttributeError: libc without inotify symbols
+        if backend == "inotify":
+            raise
+        print(f"inotify unavailable ({e}), polling every {poll_interval_s:.1f}s")
+        return PollingWatcher(root, poll_interval_s)
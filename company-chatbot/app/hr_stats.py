@@ -0,0 +1,267 @@
+"""
+Precomputed HR aggregates for analytical questions.
+
+"Summarize HR performance ratings" cannot be answered from the handful of
+per-row HR mini-documents that vector search returns. Instead,
+preprocess_docs materializes aggregates of every HR CSV into HR_STATS_PATH:
+
+* headcount, and mean / min / max of rating, attendance, leave balance and leaves taken
+* the rating distribution
+* the same per department and per location, plus headcount by manager
+
+Each CSV's entry records the CSV's sha256 and is only recomputed when that
+changes. Entries are tagged with the HR folder's allowed_roles.
+
+For an aggregate question from a role that may read HR data,
+`aggregate_hits` returns one compact rendered block shaped like a search hit.
+The RAG path puts it in place of the per-row CSV hits.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import DEPARTMENT_IDS, DEPARTMENT_TO_ROLES, HR_STATS_PATH
+
+HR_STATS_VERSION = 1
+
+# CSV column -> label; columns missing from a CSV are skipped
+METRICS = {
+    "performance_rating": "performance rating",
+    "attendance_pct": "attendance %",
+    "leave_balance": "leave balance (days)",
+    "leaves_taken": "leaves taken (days)",
+}
+GROUPS = {"department": "department", "location": "location"}
+
+# An aggregate question needs both an aggregate cue and an HR metric the stats
+# cover; generic words ("by", "employees", "department") alone are not enough,
+# or policy questions like "vacation days per employee" would match
+_AGGREGATE_RE = re.compile(
+    r"\b(summar\w*|overview|distribution\w*|breakdown|average\w*|avg|mean|median|how many|number of|"
+    r"count\w*|statistic\w*|stats|totals?|overall|most|fewest|highest|lowest|"
+    r"(by|per|across|each) (department|location|office|city|manager|team)s?)\b"
+)
+_HR_METRIC_RE = re.compile(
+    r"\b((performance )?ratings?|attendance|leaves? (taken|balances?)|leave days taken|headcounts?|"
+    r"direct reports?|(how many|number of) (employees|staff|people))\b"
+)
+# Question keyword -> section rendered for it
+_SECTION_KEYWORDS = {
+    "performance_rating": ("rating", "performance"),
+    "attendance_pct": ("attendance",),
+    "leave_balance": ("leave",),
+    "leaves_taken": ("leave",),
+    "department": ("department", "team"),
+    "location": ("location", "office", "city", "cities"),
+    "manager": ("manager", "report"),
+}
+
+
+# --- Computing (ingestion) ---
+
+
+def _summary(series) -> Dict[str, float]:
+    return {
+        "mean": round(float(series.mean()), 2),
+        "min": round(float(series.min()), 2),
+        "max": round(float(series.max()), 2),
+    }
+
+
+def _group_stats(df, metrics: List[str]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"employees": int(len(df))}
+    for col in metrics:
+        out[col] = round(float(df[col].mean()), 2)
+    if "performance_rating" in metrics:
+        counts = df["performance_rating"].value_counts().sort_index()
+        out["rating_distribution"] = {str(k): int(v) for k, v in counts.items()}
+    return out
+
+
+def compute_hr_stats(csv_path: Path) -> Dict[str, Any]:
+    """
+    Aggregates of one HR CSV (see the module docstring).
+    """
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    metrics = [col for col in METRICS if col in df.columns]
+    for col in metrics:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    stats: Dict[str, Any] = {"overall": {"employees": int(len(df))}}
+    for col in metrics:
+        stats["overall"][col] = _summary(df[col])
+    if "performance_rating" in metrics:
+        stats["overall"]["rating_distribution"] = _group_stats(df, ["performance_rating"])["rating_distribution"]
+
+    for col in GROUPS:
+        if col in df.columns:
+            stats[f"by_{col}"] = {
+                str(key): _group_stats(group, metrics)
+                for key, group in sorted(df.groupby(col), key=lambda kv: -len(kv[1]))
+            }
+
+    if "manager_id" in df.columns:
+        names = dict(zip(df["employee_id"], df["full_name"])) if {"employee_id", "full_name"} <= set(df.columns) else {}
+        stats["by_manager"] = {
+            str(manager): {
+                "name": names.get(manager, ""),
+                **_group_stats(group, [m for m in metrics if m == "performance_rating"]),
+            }
+            for manager, group in sorted(df.groupby("manager_id"), key=lambda kv: -len(kv[1]))
+        }
+    return stats
+
+
+def update_hr_stats(
+    csv_files: Dict[str, Tuple[Path, str]], force: bool = False, path: Path = HR_STATS_PATH
+) -> List[str]:
+    """
+    Bring HR_STATS_PATH in line with `csv_files` ({relative path: (path, sha256)}):
+    recompute entries whose CSV changed (all of them if `force`), drop entries
+    of deleted CSVs.
+    Returns the recomputed relative paths.
+    """
+    try:
+        current = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        current = {}
+    entries: Dict[str, Any] = current.get("sources", {}) if current.get("version") == HR_STATS_VERSION else {}
+
+    recomputed = []
+    new_entries = {}
+    for rel_path, (csv_path, digest) in sorted(csv_files.items()):
+        entry = entries.get(rel_path)
+        if force or entry is None or entry["sha256"] != digest:
+            folder = rel_path.split("/", 1)[0]
+            entry = {
+                "sha256": digest,
+                "computed_at": time.time(),
+                "department": DEPARTMENT_IDS.get(folder, folder.lower()),
+                "allowed_roles": DEPARTMENT_TO_ROLES.get(folder, []),
+                "stats": compute_hr_stats(csv_path),
+            }
+            recomputed.append(rel_path)
+        new_entries[rel_path] = entry
+
+    if recomputed or set(new_entries) != set(entries) or current.get("version") != HR_STATS_VERSION:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": HR_STATS_VERSION, "sources": new_entries}, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+    return recomputed
+
+
+# --- Serving (RAG) ---
+
+# Loaded once per process; reloaded when preprocessing rewrites the file
+_hr_stats: Dict[str, Any] | None = None
+_hr_stats_mtime: int | None = None
+# Pointed into the snapshot by app/snapshot.py when serving from one
+_hr_stats_path: Path = HR_STATS_PATH
+
+
+def set_hr_stats_path(path: Path) -> None:
+    global _hr_stats_path, _hr_stats
+    _hr_stats_path = path
+    _hr_stats = None
+
+
+def get_hr_stats() -> Dict[str, Any]:
+    """
+    {relative CSV path: entry}; empty if no aggregates were computed.
+    """
+    global _hr_stats, _hr_stats_mtime
+    try:
+        mtime = _hr_stats_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _hr_stats is None or mtime != _hr_stats_mtime:
+        data = json.loads(_hr_stats_path.read_text(encoding="utf-8"))
+        _hr_stats = data.get("sources", {}) if data.get("version") == HR_STATS_VERSION else {}
+        _hr_stats_mtime = mtime
+    return _hr_stats
+
+
+def aggregate_sections(query: str) -> Optional[List[str]]:
+    """
+    Sections an analytical HR question asks about (all of them if it names
+    none), or None if `query` does not look like one.
+    """
+    q = query.lower()
+    if not (_AGGREGATE_RE.search(q) and _HR_METRIC_RE.search(q)):
+        return None
+    sections = [name for name, words in _SECTION_KEYWORDS.items() if any(w in q for w in words)]
+    return sections or list(_SECTION_KEYWORDS)
+
+
+def _fmt_group(name: str, group: Dict[str, Any], metrics: List[str]) -> str:
+    parts = [f"{group['employees']} employees"]
+    parts += [f"avg {METRICS[m]} {group[m]}" for m in metrics if m in group]
+    return f"- {name}: " + ", ".join(parts)
+
+
+def render_hr_stats(source: str, entry: Dict[str, Any], sections: List[str]) -> str:
+    """
+    Compact text block of the requested aggregates for the LLM prompt.
+    """
+    stats = entry["stats"]
+    overall = stats["overall"]
+    computed = time.strftime("%Y-%m-%d", time.gmtime(entry["computed_at"]))
+    lines = [f"Aggregates over all {overall['employees']} employees in {source} (computed {computed})."]
+
+    asked = [m for m in METRICS if m in sections and m in overall]
+    metrics = asked or [m for m in METRICS if m in overall]
+    for m in metrics:
+        s = overall[m]
+        lines.append(f"{METRICS[m].capitalize()}: mean {s['mean']}, min {s['min']}, max {s['max']}")
+    if "performance_rating" in metrics and "rating_distribution" in overall:
+        dist = ", ".join(f"{k}: {v}" for k, v in overall["rating_distribution"].items())
+        lines.append(f"Performance rating distribution (rating: employees): {dist}")
+
+    for col in GROUPS:
+        if col in sections and f"by_{col}" in stats:
+            lines.append(f"By {col}:")
+            lines += [_fmt_group(name, g, metrics) for name, g in stats[f"by_{col}"].items()]
+            if "performance_rating" in asked:
+                lines += [
+                    f"  {name} rating distribution: " + ", ".join(f"{k}: {v}" for k, v in g["rating_distribution"].items())
+                    for name, g in stats[f"by_{col}"].items()
+                    if "rating_distribution" in g
+                ]
+    if "manager" in sections and "by_manager" in stats:
+        lines.append("Headcount by manager:")
+        for manager, g in stats["by_manager"].items():
+            label = f"{manager} ({g['name']})" if g.get("name") else manager
+            rating = f", avg performance rating {g['performance_rating']}" if "performance_rating" in g else ""
+            lines.append(f"- {label}: {g['employees']} direct reports{rating}")
+    return "\n".join(lines)
+
+
+def aggregate_hits(query: str, user_role: str) -> List[Dict[str, Any]]:
+    """
+    One search-hit-shaped block per HR CSV the role may read, if `query` is
+    an aggregate question; otherwise [].
+    """
+    sections = aggregate_sections(query)
+    if sections is None:
+        return []
+    role = user_role.lower().strip()
+    hits = []
+    for source, entry in get_hr_stats().items():
+        if role not in entry["allowed_roles"]:
+            continue
+        hits.append(
+            {
+                "id": f"{source}::aggregates",
+                "text": render_hr_stats(source, entry, sections),
+                "metadata": {"department": entry["department"], "source_file": Path(source).name},
+                "score": 0.0,
+            }
+        )
+    return hits
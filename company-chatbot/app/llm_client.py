@@ -1,60 +1,166 @@
 # app/llm_client.py
 
+import asyncio
 import os
-from typing import Literal
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
-from groq import AsyncGroq
-from openai import AsyncOpenAI
+from .config import (
+    LLM_ATTEMPT_TIMEOUT_S,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET_S,
+    LLM_DEADLINE_S,
+    LLM_FAILOVER_PROVIDERS,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_MS,
+    LLM_RETRY_MAX_MS,
+)
+from .fairshare import LLM, fair_slot
+from .metrics import REGISTRY
+from .ratelimit import ConcurrencyLimiter, OverloadedError, get_limiter, reset_limiters
+from .resilience import (
+    CircuitBreaker,
+    backoff_delay,
+    get_breaker,
+    get_latency_window,
+    is_retryable,
+    reset_resilience_state,
+    retry_after_seconds,
+)
+from .tracing import span
 
+# The groq / openai SDKs are imported lazily in _provider_client so that only
+# the providers actually configured are ever loaded.
 
 LLMProvider = Literal["groq", "openai", "none"]
 
 # Default provider = "none" (safe mode)
 LLM_PROVIDER: LLMProvider = os.getenv("LLM_PROVIDER", "none")
 
+SYSTEM_PROMPT = "You are a company assistant. Only answer using provided context. Never hallucinate."
 
-class LLMClient:
+LLM_CALLS = REGISTRY.counter(
+    "chatbot_llm_calls_total",
+    "Outbound LLM call attempts by provider and outcome (ok, error, timeout, hedge, short_circuit, rejected).",
+    ("provider", "outcome"),
+)
+
+
+class LLMUnavailableError(RuntimeError):
     """
-    Unified async LLM client for Groq, OpenAI, and stub mode.
-    The goal is to keep the rest of the RAG pipeline simple.
+    No configured provider produced an answer before the deadline.
     """
 
-    def __init__(self, provider: LLMProvider | None = None):
-        self.provider: LLMProvider = provider or LLM_PROVIDER
 
-        # ---------------------------
-        # GROQ support
-        # ---------------------------
-        if self.provider == "groq":
-            api_key = os.getenv("GROQ_API_KEY")
-            if not api_key:
-                raise RuntimeError("GROQ_API_KEY not set in environment.")
+@dataclass
+class ResiliencePolicy:
+    deadline_s: float = LLM_DEADLINE_S
+    attempt_timeout_s: float = LLM_ATTEMPT_TIMEOUT_S
+    max_retries: int = LLM_MAX_RETRIES
+    retry_base_s: float = LLM_RETRY_BASE_MS / 1000
+    retry_max_s: float = LLM_RETRY_MAX_MS / 1000
+    hedge: bool = LLM_HEDGE_ENABLED
+    hedge_percentile: float = LLM_HEDGE_PERCENTILE
+    hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES
+    breaker_failures: int = LLM_BREAKER_FAILURES
+    breaker_reset_s: float = LLM_BREAKER_RESET_S
 
-            self.client = AsyncGroq(api_key=api_key)
-            self.model = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-            return
 
-        # ---------------------------
-        # OpenAI support
-        # ---------------------------
-        if self.provider == "openai":
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                raise RuntimeError("OPENAI_API_KEY not set in environment.")
+# provider -> (SDK client, model). One client per provider and process so the
+# HTTP connection pool is reused across requests instead of rebuilt per call.
+_sdk_clients: Dict[str, Tuple[Any, str]] = {}
 
-            self.client = AsyncOpenAI(api_key=api_key)
-            self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-            return
+
+def _provider_client(provider: str) -> Tuple[Any, str]:
+    cached = _sdk_clients.get(provider)
+    if cached is not None:
+        return cached
+
+    # ---------------------------
+    # GROQ support
+    # ---------------------------
+    if provider == "groq":
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise RuntimeError("GROQ_API_KEY not set in environment.")
+
+        from groq import AsyncGroq
+
+        # Retries are handled by LLMClient so deadlines and failover stay in one place
+        client = AsyncGroq(api_key=api_key, max_retries=0)
+        model = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+
+    # ---------------------------
+    # OpenAI support
+    # ---------------------------
+    elif provider == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY not set in environment.")
+
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(api_key=api_key, max_retries=0)
+        model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+    else:
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
+    _sdk_clients[provider] = (client, model)
+    return client, model
+
+
+def reset_llm_state() -> None:
+    """
+    Drop cached SDK clients, circuit breakers, latency windows and limiters.
+    """
+    _sdk_clients.clear()
+    reset_resilience_state()
+    reset_limiters()
+
+
+class LLMClient:
+    """
+    Unified async LLM client for Groq, OpenAI, and stub mode.
+    The goal is to keep the rest of the RAG pipeline simple.
+
+    generate() runs under one overall deadline. Each provider in the failover
+    chain (LLM_PROVIDER, then LLM_FAILOVER_PROVIDERS) gets jittered retries on
+    retryable errors, optionally a hedged duplicate request once the call
+    outlives the provider's recent latency percentile, and is skipped while its
+    circuit breaker is open. Every provider request first takes a slot from
+    that provider's limiter (app/ratelimit.py); hedges only run on a free slot.
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider | None = None,
+        failover: Optional[List[str]] = None,
+        policy: Optional[ResiliencePolicy] = None,
+    ):
+        self.provider: LLMProvider = provider or LLM_PROVIDER
+        self.policy = policy or ResiliencePolicy()
 
         # ---------------------------
         # Stub mode ("none")
         # ---------------------------
         if self.provider == "none":
+            self.providers: List[str] = []
             self.client = None
             self.model = None
             return
 
-        raise ValueError(f"Unsupported LLM provider: {self.provider}")
+        chain = [self.provider] + (LLM_FAILOVER_PROVIDERS if failover is None else failover)
+        self.providers = list(dict.fromkeys(p for p in chain if p != "none"))
+
+        # Fail fast on unknown providers / missing keys anywhere in the chain
+        for name in self.providers:
+            _provider_client(name)
+        self.client, self.model = _provider_client(self.provider)
 
     # ===================================================================
     # Public method to generate text
@@ -63,47 +169,163 @@ class LLMClient:
         """
         Unified async generate call.
         """
+        with span("llm.generate"):
+            # The caller's fair share of LLM slots first (app/fairshare.py), then the provider limiter
+            async with fair_slot(LLM):
+                return await self._generate(prompt)
 
+    async def _generate(self, prompt: str) -> str:
         if self.provider == "none":
             return (
                 "RAG pipeline is configured, but no LLM provider is set. "
                 "Set LLM_PROVIDER=groq or LLM_PROVIDER=openai to enable answer generation."
             )
 
-        if self.provider == "groq":
-            return await self._generate_groq(prompt)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.policy.deadline_s
+        last_error: Optional[BaseException] = None
+        overloaded: Optional[OverloadedError] = None
 
-        if self.provider == "openai":
-            return await self._generate_openai(prompt)
+        for provider in self.providers:
+            breaker = get_breaker(provider, self.policy.breaker_failures, self.policy.breaker_reset_s)
+            if not breaker.allow():
+                LLM_CALLS.inc(provider, "short_circuit")
+                continue
+            try:
+                return await self._call_with_retries(provider, breaker, prompt, deadline)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except OverloadedError as exc:
+                overloaded = exc
+            except Exception as exc:
+                last_error = exc
+                if loop.time() >= deadline:
+                    break
 
-        raise RuntimeError(f"Unknown provider: {self.provider}")
+        # Every reachable provider was saturated: tell the client when to come back
+        if overloaded is not None and last_error is None:
+            raise overloaded
 
-    # ===================================================================
-    # GROQ backend
-    # ===================================================================
-    async def _generate_groq(self, prompt: str) -> str:
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            temperature=0.1,
-            messages=[
-                {"role": "system",
-                 "content": "You are a company assistant. Only answer using provided context. Never hallucinate."},
-                {"role": "user", "content": prompt},
-            ],
-        )
-        return response.choices[0].message.content
+        raise LLMUnavailableError(
+            f"No LLM provider answered within {self.policy.deadline_s:.0f}s "
+            f"(tried: {', '.join(self.providers)})"
+        ) from last_error
+
+    async def _call_with_retries(
+        self,
+        provider: str,
+        breaker: CircuitBreaker,
+        prompt: str,
+        deadline: float,
+    ) -> str:
+        loop = asyncio.get_running_loop()
+        limiter = get_limiter(provider)
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                breaker.release()
+                raise TimeoutError(f"LLM deadline exceeded before calling {provider}")
+
+            try:
+                # Queue time counts against the deadline but not the attempt timeout
+                async with limiter.slot(timeout_s=remaining):
+                    answer = await asyncio.wait_for(
+                        self._hedged_call(provider, prompt, limiter),
+                        timeout=max(0.0, min(deadline - loop.time(), self.policy.attempt_timeout_s)),
+                    )
+            except OverloadedError:
+                # Local saturation says nothing about the provider's health
+                breaker.release()
+                LLM_CALLS.inc(provider, "rejected")
+                raise
+            except Exception as exc:
+                if not is_retryable(exc):
+                    # Bad request / auth: not the provider's health, don't trip the breaker
+                    breaker.release()
+                    LLM_CALLS.inc(provider, "error")
+                    raise
+
+                breaker.record_failure()
+                LLM_CALLS.inc(provider, "timeout" if isinstance(exc, TimeoutError) else "error")
+                if attempt >= self.policy.max_retries:
+                    raise
+
+                delay = backoff_delay(attempt, self.policy.retry_base_s, self.policy.retry_max_s)
+                server_delay = retry_after_seconds(exc)
+                if server_delay is not None:
+                    delay = max(delay, server_delay)
+                if loop.time() + delay >= deadline:
+                    raise
+                await asyncio.sleep(delay)
+
+                if not breaker.allow():
+                    raise
+                attempt += 1
+                continue
+
+            breaker.record_success()
+            LLM_CALLS.inc(provider, "ok")
+            return answer
+
+    async def _hedged_call(self, provider: str, prompt: str, limiter: ConcurrencyLimiter) -> str:
+        """
+        One logical attempt. With hedging on, a duplicate request is sent once the
+        first one has run longer than the provider's latency percentile (and the
+        limiter has a free slot); the first successful response wins and the
+        other is cancelled.
+        """
+        window = get_latency_window(provider, self.policy.hedge_min_samples)
+        hedge_after = window.percentile(self.policy.hedge_percentile) if self.policy.hedge else None
+        if hedge_after is None:
+            return await self._timed_call(provider, prompt)
+
+        tasks = [asyncio.ensure_future(self._timed_call(provider, prompt))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done and limiter.try_acquire():
+                LLM_CALLS.inc(provider, "hedge")
+                tasks.append(asyncio.ensure_future(self._hedge_request(provider, prompt, limiter)))
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _hedge_request(self, provider: str, prompt: str, limiter: ConcurrencyLimiter) -> str:
+        t0 = time.monotonic()
+        try:
+            return await self._timed_call(provider, prompt)
+        finally:
+            limiter.release(time.monotonic() - t0)
+
+    async def _timed_call(self, provider: str, prompt: str) -> str:
+        t0 = time.perf_counter()
+        answer = await self._complete(provider, prompt)
+        get_latency_window(provider, self.policy.hedge_min_samples).observe(time.perf_counter() - t0)
+        return answer
 
     # ===================================================================
-    # OpenAI backend
+    # Provider call (Groq and OpenAI share the chat-completions API)
     # ===================================================================
-    async def _generate_openai(self, prompt: str) -> str:
-        response = await self.client.chat.completions.create(
-            model=self.model,
+    async def _complete(self, provider: str, prompt: str) -> str:
+        client, model = _provider_client(provider)
+        response = await client.chat.completions.create(
+            model=model,
             temperature=0.1,
             messages=[
-                {"role": "system",
-                 "content": "You are a company assistant. Only answer using provided context. Never hallucinate."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt},
             ],
         )
-        return response.choices[0].message["content"]
+        return response.choices[0].message.content
@@ -1,8 +1,9 @@
 # app/main.py
 from dotenv import load_dotenv
 load_dotenv()
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
 from fastapi.security import OAuth2PasswordRequestForm
@@ -18,17 +19,30 @@ from .schemas import (
     UserCreate,
     UserOut,
     Token,
+    HitProjection,
     SearchRequest,
     SearchResponse,
-    SearchHit,
+    BatchSearchRequest,
+    BatchSearchResponse,
     RagRequest,
     RagResponse,
+    ChatRequest,
+    ChatResponse,
 )
 from dotenv import load_dotenv
 load_dotenv()
 
-from .search import semantic_search
-from .rag import generate_rag_answer
+from .search import semantic_search, semantic_search_batch
+from .rag import generate_chat_answer, generate_rag_answer, stream_rag_answer
+from .llm_client import LLMUnavailableError
+from .ratelimit import OverloadedError
+from .sessions import SESSIONS
+from .config import RESPONSE_COMPRESSION, SNAPSHOT_PATH, TRACING_ENABLED
+from .fairshare import RETRIEVAL, QuotaExceededError, admit, run_fair
+from .metrics import REGISTRY
+from .responses import NDJSON_MEDIA_TYPE, CompressionMiddleware, FastJSONResponse, dumps
+from .snippets import compile_query, extract_snippet
+from .tracing import TracingMiddleware
 from contextlib import asynccontextmanager
 
 from .auth import (
@@ -67,6 +81,13 @@ async def lifespan(app: FastAPI):
     finally:
         db.close()
 
+    # Replica bootstrapped from a snapshot: extract/verify once, mmap the index,
+    # load the bundled model and warm up before the first request
+    if SNAPSHOT_PATH:
+        from .snapshot import load_snapshot
+
+        load_snapshot()
+
     # Startup complete
     yield
 
@@ -86,6 +107,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip / brotli for larger bodies (search results, metrics)
+if RESPONSE_COMPRESSION:
+    app.add_middleware(CompressionMiddleware)
+
+# Span timing + Server-Timing header; not installed at all when disabled
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    """
+    LLM limiter or fair-share lane is full: shed the request fast instead of
+    queueing it. A used-up user quota is a 429 rather than a 503.
+    """
+    return JSONResponse(
+        status_code=(
+            status.HTTP_429_TOO_MANY_REQUESTS
+            if isinstance(exc, QuotaExceededError)
+            else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+        content={"detail": str(exc)},
+        headers={"Retry-After": exc.retry_after_header},
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """
+    Prometheus text exposition of this worker's metrics.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/auth/register", response_model=UserOut)
 def register_user(
     user_in: UserCreate,
@@ -137,25 +191,76 @@ def read_users_me(
     return current_user
 
 
+def project_hits(hits_raw, query: str, body: HitProjection) -> list[dict]:
+    """
+    Search hits as plain dicts with only the requested fields (the shape of
+    SearchHit), ready for FastJSONResponse.
+    """
+    fields = body.hit_fields()
+    snippets = "snippet" in fields
+    terms = compile_query(query) if snippets else None
+    hits = []
+    for h in hits_raw:
+        meta = h["metadata"]
+        values = {
+            "id": h["id"],
+            "text": h["text"],
+            "score": h["score"],
+            "department": meta.get("department", ""),
+            "source_file": meta.get("source_file", ""),
+            "rerank_score": h.get("rerank_score"),
+        }
+        if snippets:
+            values["snippet"] = extract_snippet(h["text"], terms, body.snippet_chars, body.highlight)
+        hits.append({field: values[field] for field in fields})
+    return hits
+
+
 @app.post("/search", response_model=SearchResponse)
-def search_endpoint(
+async def search_endpoint(
     body: SearchRequest,
     current_user: User = Depends(get_current_user),
 ):
-    hits_raw = semantic_search(body.query, user_role=current_user.role, top_k=body.top_k)
-
-    hits = [
-        SearchHit(
-            id=h["id"],
-            text=h["text"],
-            score=h["score"],
-            department=h["metadata"].get("department", ""),
-            source_file=h["metadata"].get("source_file", ""),
-        )
-        for h in hits_raw
-    ]
+    admit(current_user.username, current_user.role)
+    hits_raw = await run_fair(
+        RETRIEVAL,
+        semantic_search,
+        body.query,
+        user_role=current_user.role,
+        top_k=body.top_k,
+        rerank=body.rerank,
+        diversify=body.diversify,
+    )
+
+    # Returned as a response, so FastAPI does not re-validate every hit against the model
+    return FastJSONResponse({"hits": project_hits(hits_raw, body.query, body)})
+
+
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def batch_search_endpoint(
+    body: BatchSearchRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Many queries, one auth check: batched encode + one multi-vector query.
+    Costs one quota unit and one fair-share unit per query; a batch costing
+    more than the role's quota burst is rejected (429) and must be split.
+    """
+    admit(current_user.username, current_user.role, cost=len(body.queries))
+    results_raw = await run_fair(
+        RETRIEVAL,
+        semantic_search_batch,
+        body.queries,
+        user_role=current_user.role,
+        top_k=body.top_k,
+        rerank=body.rerank,
+        diversify=body.diversify,
+        cost=len(body.queries),
+    )
 
-    return SearchResponse(hits=hits)
+    return FastJSONResponse(
+        {"results": [{"hits": project_hits(hits_raw, q, body)} for q, hits_raw in zip(body.queries, results_raw)]}
+    )
 
 
 
@@ -171,9 +276,96 @@ async def rag_endpoint(
     - Calls LLM
     - Returns answer + sources
     """
-    answer, sources = await generate_rag_answer(
-        query=body.query,
-        user_role=current_user.role,
-        top_k=body.top_k,
-    )
+    admit(current_user.username, current_user.role, llm=True)
+    try:
+        answer, sources = await generate_rag_answer(
+            query=body.query,
+            user_role=current_user.role,
+            top_k=body.top_k,
+            rerank=body.rerank,
+            diversify=body.diversify,
+        )
+    except LLMUnavailableError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+        )
     return RagResponse(answer=answer, sources=sources)
+
+
+@app.post("/rag/stream")
+async def rag_stream_endpoint(
+    body: RagRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Same pipeline as /rag, as newline-delimited JSON events:
+    - {"type": "sources", "sources": [...]} right after retrieval
+    - then {"type": "answer", "answer": "..."}
+      or {"type": "error", "status": 503, "detail": "..."} if the LLM call fails
+    """
+    admit(current_user.username, current_user.role, llm=True)
+
+    async def events():
+        async for event in stream_rag_answer(
+            query=body.query,
+            user_role=current_user.role,
+            top_k=body.top_k,
+            rerank=body.rerank,
+            diversify=body.diversify,
+        ):
+            yield dumps(event) + b"\n"
+
+    return StreamingResponse(events(), media_type=NDJSON_MEDIA_TYPE)
+
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(
+    body: ChatRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    One turn of a conversation. Without session_id a new session is started;
+    pass the returned session_id with the follow-ups. Sessions are kept in
+    this worker's memory (app/sessions.py) and expire when idle.
+    """
+    session = None
+    if body.session_id is not None:
+        # An unknown session is a 404 before anything is charged to the quota
+        session = SESSIONS.get(body.session_id, current_user.username, current_user.role)
+        if session is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Unknown or expired chat session",
+            )
+    admit(current_user.username, current_user.role, llm=True)
+    if session is None:
+        session = SESSIONS.create(current_user.username, current_user.role)
+    try:
+        answer, sources, retrieval = await generate_chat_answer(
+            session,
+            body.query,
+            top_k=body.top_k,
+            rerank=body.rerank,
+            diversify=body.diversify,
+        )
+    except LLMUnavailableError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+        )
+    return ChatResponse(session_id=session.id, answer=answer, sources=sources, retrieval=retrieval)
+
+
+@app.delete("/chat/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_chat_session(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    if not SESSIONS.delete(session_id, current_user.username):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown or expired chat session",
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
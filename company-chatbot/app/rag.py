@@ -1,9 +1,33 @@
 # app/rag.py
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional
 
+from .config import HR_STATS_ENABLED
+from .fairshare import RETRIEVAL, refund_llm_cost, run_fair
+from .hr_stats import aggregate_hits
+from .metrics import REGISTRY
+from .ratelimit import OverloadedError
+from .rbac import allowed_roles_from_metadata, get_role_index
 from .search import semantic_search
-from .llm_client import LLMClient
+from .llm_client import LLMClient, LLMUnavailableError
 from .schemas import Source
+from .sessions import ChatSession, Turn
+from .snippets import compile_query, extract_snippet
+from .tracing import span
+from .vectorstore import get_embedding_model
+
+CHAT_TURNS = REGISTRY.counter(
+    "chatbot_chat_turns_total", "Conversation turns by how their context was obtained (search, reused).", ("retrieval",)
+)
+
+NO_HITS_ANSWER = "I couldn't find any relevant information for your role in the available documents."
+
+# Fixed start of every prompt (kept byte-identical so provider prompt caches can match it)
+PROMPT_INSTRUCTIONS = """You are an internal chatbot for a fintech company.
+You answer employee questions strictly based on the provided sources.
+You must:
+- Use only the context below (do NOT hallucinate).
+- If the answer is not present, clearly say you don't know.
+- When you give an answer, reference which SOURCE numbers you used (e.g., "Based on SOURCE 1 and SOURCE 3")."""
 
 
 def build_context_block(hits: List[Dict[str, Any]]) -> str:
@@ -31,15 +55,15 @@ file: {source_file}
 
 
 def build_rag_prompt(query: str, hits: List[Dict[str, Any]]) -> str:
+    with span("rag.build_prompt"):
+        return _build_rag_prompt(query, hits)
+
+
+def _build_rag_prompt(query: str, hits: List[Dict[str, Any]]) -> str:
     context_block = build_context_block(hits)
 
     prompt = f"""
-You are an internal chatbot for a fintech company.
-You answer employee questions strictly based on the provided sources.
-You must:
-- Use only the context below (do NOT hallucinate).
-- If the answer is not present, clearly say you don't know.
-- When you give an answer, reference which SOURCE numbers you used (e.g., "Based on SOURCE 1 and SOURCE 3").
+{PROMPT_INSTRUCTIONS}
 
 -------------------- CONTEXT START --------------------
 {context_block}
@@ -54,21 +78,59 @@ If relevant, mention SOURCE numbers in your explanation.
     return prompt.strip()
 
 
-async def generate_rag_answer(
-    query: str,
-    user_role: str,
-    top_k: int = 4,
-) -> tuple[str, List[Source]]:
+def build_chat_prompt(query: str, hits: List[Dict[str, Any]], turns: List[Turn]) -> str:
+    with span("rag.build_prompt"):
+        return _build_chat_prompt(query, hits, turns)
+
+
+def _build_chat_prompt(query: str, hits: List[Dict[str, Any]], turns: List[Turn]) -> str:
     """
-    Full RAG pipeline:
-      - semantic_search with RBAC
-      - prompt construction
-      - LLM call
-      - source packaging
+    Instructions, sources, earlier turns, question: the parts that change
+    least come first. A follow-up answered from the same chunks repeats the
+    previous prompt up to the new turn, which providers can serve from their
+    prompt cache.
     """
-    hits = semantic_search(query, user_role=user_role, top_k=top_k)
+    parts = [
+        PROMPT_INSTRUCTIONS + "\n- Earlier turns of this conversation are context only; facts must come from the sources.",
+        "-------------------- CONTEXT START --------------------\n"
+        f"{build_context_block(hits)}\n"
+        "-------------------- CONTEXT END ----------------------",
+    ]
+    if turns:
+        history = "\n\n".join(f"User: {t.query}\nAssistant: {t.answer}" for t in turns)
+        parts.append(
+            "-------------------- CONVERSATION START --------------------\n"
+            f"{history}\n"
+            "-------------------- CONVERSATION END ----------------------"
+        )
+    parts.append(
+        f"User question:\n{query}\n\n"
+        "Now provide a helpful, concise answer for the user.\n"
+        "If relevant, mention SOURCE numbers in your explanation."
+    )
+    return "\n\n".join(parts)
 
-    # Build source objects for API response
+
+def with_hr_aggregates(query: str, user_role: str, hits: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    """
+    For analytical HR questions, put the precomputed aggregates in place of
+    the per-row hits of the CSVs they cover.
+    """
+    if not HR_STATS_ENABLED:
+        return hits
+    # "Average rating by department" needs all HR rows, not the few retrieved
+    with span("rag.hr_aggregates"):
+        aggregates = aggregate_hits(query, user_role)
+    if not aggregates:
+        return hits
+    covered = {h["metadata"]["source_file"] for h in aggregates}
+    rest = [h for h in hits if h["metadata"].get("source_file") not in covered]
+    return aggregates + rest[: max(top_k - len(aggregates), 0)]
+
+
+def to_sources(query: str, hits: List[Dict[str, Any]]) -> List[Source]:
+    # Snippets show the part of each source around the question's terms
+    terms = compile_query(query)
     sources: List[Source] = []
     for h in hits:
         meta = h["metadata"]
@@ -78,16 +140,56 @@ async def generate_rag_answer(
                 department=meta.get("department", ""),
                 source_file=meta.get("source_file", ""),
                 score=h["score"],
-                snippet=h["text"][:300].replace("\n", " ") + ("..." if len(h["text"]) > 300 else ""),
+                snippet=extract_snippet(h["text"], terms, 300),
+                rerank_score=h.get("rerank_score"),
             )
         )
+    return sources
+
+
+async def retrieve_rag_hits(
+    query: str,
+    user_role: str,
+    top_k: int = 4,
+    rerank: Optional[bool] = None,
+    diversify: Optional[bool] = None,
+) -> List[Dict]:
+    """
+    Retrieval half of the RAG pipeline: RBAC-filtered search plus HR aggregates.
+    """
+    # Retrieval is CPU-bound; run it off the event loop so requests waiting on
+    # the LLM (and the rest of the API) keep being served meanwhile, in the
+    # caller's fair share of the retrieval lane
+    hits = await run_fair(
+        RETRIEVAL, semantic_search, query, user_role=user_role, top_k=top_k, rerank=rerank, diversify=diversify
+    )
+    return with_hr_aggregates(query, user_role, hits, top_k)
+
+
+async def generate_rag_answer(
+    query: str,
+    user_role: str,
+    top_k: int = 4,
+    rerank: Optional[bool] = None,
+    diversify: Optional[bool] = None,
+) -> tuple[str, List[Source]]:
+    """
+    Full RAG pipeline:
+      - semantic_search with RBAC
+      - precomputed HR aggregates for analytical HR questions
+      - prompt construction
+      - LLM call
+      - source packaging
+    """
+    hits = await retrieve_rag_hits(query, user_role, top_k, rerank, diversify)
+
+    # Build source objects for API response
+    sources = to_sources(query, hits)
 
     # If no hits (RBAC blocked or irrelevant), we can short-circuit
     if not hits:
-        return (
-            "I couldn't find any relevant information for your role in the available documents.",
-            sources,
-        )
+        refund_llm_cost()
+        return NO_HITS_ANSWER, sources
 
     # Build prompt and call LLM
     prompt = build_rag_prompt(query, hits)
@@ -95,3 +197,94 @@ async def generate_rag_answer(
     answer = await client.generate(prompt)
 
     return answer, sources
+
+
+async def stream_rag_answer(
+    query: str,
+    user_role: str,
+    top_k: int = 4,
+    rerank: Optional[bool] = None,
+    diversify: Optional[bool] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    The RAG pipeline as events for POST /rag/stream: {"type": "sources"} as
+    soon as retrieval is done, then {"type": "answer"} or, if the LLM call
+    fails, {"type": "error"} with the status /rag would have returned.
+    """
+    hits = await retrieve_rag_hits(query, user_role, top_k, rerank, diversify)
+    yield {"type": "sources", "sources": [s.model_dump() for s in to_sources(query, hits)]}
+
+    if not hits:
+        refund_llm_cost()
+        yield {"type": "answer", "answer": NO_HITS_ANSWER}
+        return
+    try:
+        answer = await LLMClient().generate(build_rag_prompt(query, hits))
+    except LLMUnavailableError as exc:
+        yield {"type": "error", "status": 503, "detail": str(exc)}
+        return
+    except OverloadedError as exc:
+        yield {"type": "error", "status": 503, "detail": str(exc), "retry_after": exc.retry_after_header}
+        return
+    yield {"type": "answer", "answer": answer}
+
+
+async def generate_chat_answer(
+    session: ChatSession,
+    query: str,
+    top_k: int = 4,
+    rerank: Optional[bool] = None,
+    diversify: Optional[bool] = None,
+) -> tuple[str, List[Source], str]:
+    """
+    One conversation turn. Like generate_rag_answer, but:
+      - short follow-ups are searched together with the session's topic
+      - if the session's retrieved chunks already cover the question, they are
+        used and the search is skipped
+      - the prompt repeats the earlier turns (build_chat_prompt)
+    Returns (answer, sources, "search" | "reused").
+    """
+    async with session.lock:
+        search_query = session.search_query(query)
+        model = get_embedding_model()
+        with span("chat.encode"):
+            query_embedding = (await run_fair(RETRIEVAL, model.encode, [search_query]))[0].tolist()
+
+        with span("chat.reuse"):
+            hits = session.reusable_hits(query_embedding, top_k)
+        if hits is not None:
+            retrieval = "reused"
+            # The index may have changed since these were retrieved: check RBAC again
+            role_index = get_role_index()
+            hits = [
+                h for h in hits
+                if (role_index.is_allowed(session.role, h["id"]) if role_index is not None
+                    else session.role in allowed_roles_from_metadata(h["metadata"]))
+            ]
+        else:
+            retrieval = "search"
+            hits = await run_fair(
+                RETRIEVAL,
+                semantic_search,
+                search_query,
+                user_role=session.role,
+                top_k=top_k,
+                rerank=rerank,
+                diversify=diversify,
+                query_embedding=query_embedding,
+                with_embeddings=True,
+            )
+            session.add_context(query_embedding, hits)
+        CHAT_TURNS.inc(retrieval)
+
+        hits = with_hr_aggregates(search_query, session.role, hits, top_k)
+        sources = to_sources(query, hits)
+        if not hits:
+            refund_llm_cost()
+            answer = NO_HITS_ANSWER
+        else:
+            prompt = build_chat_prompt(query, hits, list(session.turns))
+            answer = await LLMClient().generate(prompt)
+
+        session.add_turn(query, answer, [s.id for s in sources])
+        return answer, sources, retrieval
@@ -0,0 +1,260 @@
+# app/ratelimit.py
+"""
+Backpressure for outbound LLM calls: a token bucket (requests per second) and
+an async concurrency limiter with a bounded FIFO queue, one pair per provider.
+
+When the queue is full, or a caller cannot get a slot and a token within its
+wait budget, the limiter raises OverloadedError right away rather than letting
+requests pile up. The API turns that into 503 with a Retry-After header.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from .config import LLM_LIMITS
+from .metrics import REGISTRY
+
+QUEUE_SECONDS = REGISTRY.histogram(
+    "chatbot_llm_queue_seconds",
+    "Time spent waiting for an LLM concurrency slot and rate-limit token.",
+    ("provider",),
+)
+IN_FLIGHT = REGISTRY.gauge("chatbot_llm_in_flight", "LLM calls currently holding a slot.", ("provider",))
+QUEUE_DEPTH = REGISTRY.gauge("chatbot_llm_queue_depth", "Callers waiting for an LLM slot.", ("provider",))
+REJECTED = REGISTRY.counter(
+    "chatbot_llm_rejected_total",
+    "LLM calls rejected by the limiter (queue_full, queue_timeout, rate_limited).",
+    ("provider", "reason"),
+)
+
+
+class OverloadedError(RuntimeError):
+    """
+    The limiter could not admit the call; retry_after_s is a hint for clients.
+    """
+
+    def __init__(self, message: str, retry_after_s: float = 1.0):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after_s)))
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate_per_s` tokens per second, at most `burst` stored.
+    rate_per_s <= 0 disables it.
+    """
+
+    def __init__(self, rate_per_s: float, burst: float):
+        self.rate = rate_per_s
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait_s: float, tokens: float = 1.0) -> Optional[float]:
+        """
+        Take `tokens` (at most the burst) and return how long to wait before
+        using them, or None (nothing taken) if that wait would exceed max_wait_s.
+        """
+        if self.rate <= 0:
+            return 0.0
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = 0.0 if self._tokens >= tokens else (tokens - self._tokens) / self.rate
+            if wait > max_wait_s:
+                return None
+            self._tokens -= tokens
+            return wait
+
+    def refund(self, tokens: float) -> None:
+        """
+        Give back tokens taken by reserve() that were not used (up to the burst).
+        """
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def time_to_token(self, tokens: float = 1.0) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (min(tokens, self.capacity) - self._tokens) / self.rate)
+
+
+class ConcurrencyLimiter:
+    """
+    At most `max_concurrency` calls in flight, at most `max_queue` waiting (FIFO).
+    Lives on the event loop; not meant to be shared across threads.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout_s: float,
+        bucket: Optional[TokenBucket] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_s = queue_timeout_s
+        self.bucket = bucket
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # EWMA of how long a slot is held, used for the Retry-After estimate
+        self._hold_s = 1.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after_s(self) -> float:
+        drain = (len(self._waiters) + 1) / self.max_concurrency * self._hold_s
+        if self.bucket is not None:
+            drain = max(drain, self.bucket.time_to_token())
+        return drain
+
+    def _update_gauges(self) -> None:
+        IN_FLIGHT.set(self.name, value=self._in_flight)
+        QUEUE_DEPTH.set(self.name, value=len(self._waiters))
+
+    def _reject(self, reason: str) -> OverloadedError:
+        REJECTED.inc(self.name, reason)
+        return OverloadedError(
+            f"LLM provider '{self.name}' is saturated ({reason}); "
+            f"{self._in_flight} in flight, {len(self._waiters)} queued",
+            retry_after_s=self.retry_after_s(),
+        )
+
+    def try_acquire(self) -> bool:
+        """
+        Take a slot (and token) only if one is free right now. Used for hedged
+        requests, which should never queue.
+        """
+        if self._in_flight >= self.max_concurrency or self._waiters:
+            return False
+        if self.bucket is not None and self.bucket.reserve(0.0) is None:
+            return False
+        self._in_flight += 1
+        self._update_gauges()
+        return True
+
+    async def acquire(self, timeout_s: Optional[float] = None) -> float:
+        """
+        Wait for a slot and a token; returns the time spent waiting.
+        Raises OverloadedError if the queue is full or the wait budget runs out.
+        """
+        t0 = time.monotonic()
+        budget = self.queue_timeout_s if timeout_s is None else min(timeout_s, self.queue_timeout_s)
+
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            self._in_flight += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                raise self._reject("queue_full")
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._update_gauges()
+            try:
+                # release() hands its slot straight to the first live waiter
+                await asyncio.wait_for(waiter, timeout=max(budget, 0.0))
+            except BaseException as exc:
+                if waiter.done() and not waiter.cancelled():
+                    self.release()
+                else:
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        pass
+                if isinstance(exc, TimeoutError):
+                    self._update_gauges()
+                    raise self._reject("queue_timeout") from None
+                raise
+        self._update_gauges()
+
+        if self.bucket is not None:
+            wait = self.bucket.reserve(max(0.0, budget - (time.monotonic() - t0)))
+            if wait is None:
+                self.release()
+                raise self._reject("rate_limited")
+            if wait:
+                try:
+                    await asyncio.sleep(wait)
+                except BaseException:
+                    self.release()
+                    raise
+
+        waited = time.monotonic() - t0
+        QUEUE_SECONDS.observe(self.name, value=waited)
+        return waited
+
+    def release(self, held_s: Optional[float] = None) -> None:
+        if held_s is not None:
+            self._hold_s = 0.8 * self._hold_s + 0.2 * held_s
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self._in_flight = max(0, self._in_flight - 1)
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def slot(self, timeout_s: Optional[float] = None) -> AsyncIterator[float]:
+        waited = await self.acquire(timeout_s)
+        t0 = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.release(time.monotonic() - t0)
+
+
+_limiters: Dict[str, ConcurrencyLimiter] = {}
+
+
+def get_limiter(provider: str) -> ConcurrencyLimiter:
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limits = LLM_LIMITS.get(provider, LLM_LIMITS["default"])
+        bucket = TokenBucket(limits["rate_per_s"], limits["burst"]) if limits["rate_per_s"] > 0 else None
+        limiter = _limiters[provider] = ConcurrencyLimiter(
+            provider,
+            max_concurrency=limits["max_concurrency"],
+            max_queue=limits["max_queue"],
+            queue_timeout_s=limits["queue_timeout_s"],
+            bucket=bucket,
+        )
+    return limiter
+
+
+def set_limiter(provider: str, limiter: ConcurrencyLimiter) -> None:
+    _limiters[provider] = limiter
+
+
+def reset_limiters() -> None:
+    _limiters.clear()
@@ -0,0 +1,217 @@
+"""
+Precomputed RBAC visibility over the indexed chunk corpus.
+
+At index time every chunk gets a small department bitmask ("dept_bits", one bit
+per department folder). Role visibility is derived from those bits and
+ROLE_TO_DEPARTMENTS, packed into one bitmap per role and saved next to the
+vector DB. At query time we only do a dict lookup + bit test per candidate,
+instead of splitting the allowed_roles string of every hit.
+
+Department bits describe the chunk, not the roles, so editing
+ROLE_TO_DEPARTMENTS (or adding a role) never requires re-embedding: a config
+fingerprint mismatch simply rebuilds the role bitmaps from the stored bits.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .config import (
+    DEPARTMENTS,
+    DEPARTMENT_IDS,
+    ROLE_TO_DEPARTMENTS,
+    VECTOR_DB_DIR,
+)
+
+RBAC_INDEX_PATH = VECTOR_DB_DIR / "rbac_index.npz"
+
+# department id ("finance") -> folder name ("Finance")
+DEPARTMENT_FOLDERS_BY_ID = {dept_id: folder for folder, dept_id in DEPARTMENT_IDS.items()}
+
+
+def config_fingerprint() -> str:
+    """
+    Hash of the role/department configuration the bitmaps were derived from.
+    """
+    payload = json.dumps(
+        {"roles": ROLE_TO_DEPARTMENTS, "departments": DEPARTMENTS},
+        sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def chunk_departments(chunk: Dict[str, Any]) -> List[str]:
+    """
+    Department folders a chunk belongs to: its own, or for a canonical
+    near-duplicate (app/dedupe.py) those of every merged copy.
+    """
+    if chunk.get("departments"):
+        return list(chunk["departments"])
+    dept_id = chunk["department"]
+    return [DEPARTMENT_FOLDERS_BY_ID.get(dept_id, dept_id)]
+
+
+def department_bits(folders: Iterable[str], departments: Sequence[str] = DEPARTMENTS) -> int:
+    bits = 0
+    for folder in folders:
+        if folder in departments:
+            bits |= 1 << departments.index(folder)
+    return bits
+
+
+def role_department_mask(role: str, departments: Sequence[str] = DEPARTMENTS) -> int:
+    return department_bits(ROLE_TO_DEPARTMENTS.get(role, []), departments)
+
+
+def build_role_masks(
+    dept_bits: np.ndarray,
+    departments: Sequence[str],
+    roles: Iterable[str],
+) -> Dict[str, np.ndarray]:
+    """
+    Boolean visibility mask per role over rows with the given department bits.
+    """
+    dept_bits = np.asarray(dept_bits, dtype=np.uint32)
+    return {
+        role: (dept_bits & np.uint32(role_department_mask(role, departments))) != 0
+        for role in roles
+    }
+
+
+class RoleIndex:
+    """
+    Chunk id -> position map plus one visibility bitmap per role.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        dept_bits: np.ndarray,
+        departments: Sequence[str],
+        bitmaps: Optional[np.ndarray] = None,
+        fingerprint: Optional[str] = None,
+    ):
+        self.ids = ids
+        self.id_to_pos = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        self.dept_bits = np.asarray(dept_bits, dtype=np.uint32)
+        self.departments = list(departments)
+        self.roles = list(ROLE_TO_DEPARTMENTS)
+
+        self._masks: Dict[str, np.ndarray] = {}
+        if bitmaps is not None and fingerprint == config_fingerprint() and len(bitmaps) == len(self.roles):
+            for role, packed in zip(self.roles, bitmaps):
+                self._masks[role] = np.unpackbits(packed, count=len(ids)).astype(bool)
+        else:
+            # Config changed since indexing (or fresh build): derive from the stored bits
+            self._masks = build_role_masks(self.dept_bits, self.departments, self.roles)
+
+        self._chroma_where: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    @classmethod
+    def from_chunks(cls, chunks: Sequence[Dict[str, Any]]) -> "RoleIndex":
+        return cls(
+            ids=[c["id"] for c in chunks],
+            dept_bits=np.array([department_bits(chunk_departments(c)) for c in chunks], dtype=np.uint32),
+            departments=DEPARTMENTS,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def mask(self, role: str) -> np.ndarray:
+        mask = self._masks.get(role)
+        if mask is None:
+            # Unknown role: sees nothing
+            mask = np.zeros(len(self.ids), dtype=bool)
+            self._masks[role] = mask
+        return mask
+
+    def is_allowed(self, role: str, chunk_id: str) -> bool:
+        pos = self.id_to_pos.get(chunk_id)
+        return pos is not None and bool(self.mask(role)[pos])
+
+    def chroma_where(self, role: str) -> Optional[Dict[str, Any]]:
+        """
+        Chroma `where` pre-filter selecting exactly the chunks `role` may see,
+        expressed over the handful of distinct dept_bits values in the corpus.
+        Returns None when the role can see nothing.
+        """
+        if role not in self._chroma_where:
+            visible = np.unique(self.dept_bits[self.mask(role)])
+            if len(visible) == 0:
+                self._chroma_where[role] = None
+            elif len(visible) == 1:
+                self._chroma_where[role] = {"dept_bits": int(visible[0])}
+            else:
+                self._chroma_where[role] = {"dept_bits": {"$in": [int(v) for v in visible]}}
+        return self._chroma_where[role]
+
+    def save(self, path: Path = RBAC_INDEX_PATH) -> None:
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(
+            tmp_path,
+            ids=np.frombuffer("\n".join(self.ids).encode("utf-8"), dtype=np.uint8),
+            dept_bits=self.dept_bits,
+            departments=np.array(self.departments),
+            roles=np.array(self.roles),
+            bitmaps=np.stack([np.packbits(self.mask(r)) for r in self.roles]),
+            fingerprint=np.array(config_fingerprint()),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path = RBAC_INDEX_PATH) -> "RoleIndex":
+        with np.load(path) as data:
+            blob = data["ids"].tobytes().decode("utf-8")
+            ids = blob.split("\n") if blob else []
+            stored_roles = [str(r) for r in data["roles"]]
+            bitmaps = data["bitmaps"] if stored_roles == list(ROLE_TO_DEPARTMENTS) else None
+            return cls(
+                ids=ids,
+                dept_bits=data["dept_bits"],
+                departments=[str(d) for d in data["departments"]],
+                bitmaps=bitmaps,
+                fingerprint=str(data["fingerprint"]),
+            )
+
+
+# Loaded once per process; reloaded when index_chunks rewrites the file
+_role_index: RoleIndex | None = None
+_role_index_mtime: int | None = None
+# Pointed into the snapshot by app/snapshot.py when serving from one
+_role_index_path: Path = RBAC_INDEX_PATH
+
+
+def set_role_index_path(path: Path) -> None:
+    global _role_index_path, _role_index
+    _role_index_path = path
+    _role_index = None
+
+
+def get_role_index() -> Optional[RoleIndex]:
+    """
+    The process-wide RoleIndex, or None for indexes built before it existed
+    (callers then fall back to parsing the allowed_roles metadata).
+    """
+    global _role_index, _role_index_mtime
+    try:
+        mtime = _role_index_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _role_index is None or mtime != _role_index_mtime:
+        _role_index = RoleIndex.load(_role_index_path)
+        _role_index_mtime = mtime
+    return _role_index
+
+
+def allowed_roles_from_metadata(meta: Dict[str, Any]) -> List[str]:
+    """
+    Legacy visibility check input: the comma-separated allowed_roles string.
+    """
+    allowed_roles_str = meta.get("allowed_roles", "") or ""
+    return [r.strip().lower() for r in allowed_roles_str.split(",") if r.strip()]
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .config import (
+    RERANK_MODEL_NAME,
+    RERANK_BATCH_SIZE,
+    RERANK_BUDGET_MS,
+    RERANK_CACHE_SIZE,
+)
+
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
+
+
+class RerankScoreCache:
+    """
+    Thread-safe LRU of cross-encoder scores keyed by (query, chunk id, text digest).
+    Chunk ids are positional, so an edited file reuses them for new text.
+    """
+
+    def __init__(self, max_size: int = RERANK_CACHE_SIZE):
+        self.max_size = max_size
+        self._data: OrderedDict[Tuple[str, str, bytes], float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str, bytes]) -> Optional[float]:
+        with self._lock:
+            score = self._data.get(key)
+            if score is not None:
+                self._data.move_to_end(key)
+            return score
+
+    def put(self, key: Tuple[str, str, bytes], score: float) -> None:
+        with self._lock:
+            self._data[key] = score
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+# Lazy singletons, like the embedding model in vectorstore.py
+_cross_encoder: CrossEncoder | None = None
+_score_cache = RerankScoreCache()
+
+
+def _cache_key(query: str, hit: Dict[str, Any]) -> Tuple[str, str, bytes]:
+    return query, hit["id"], hashlib.blake2b(hit["text"].encode("utf-8"), digest_size=8).digest()
+
+
+def get_cross_encoder() -> CrossEncoder:
+    global _cross_encoder
+    if _cross_encoder is None:
+        from sentence_transformers import CrossEncoder
+
+        # Small MS MARCO cross-encoder, fast enough for a few dozen pairs on CPU
+        _cross_encoder = CrossEncoder(RERANK_MODEL_NAME, max_length=512, device="cpu")
+    return _cross_encoder
+
+
+def rerank_hits(
+    query: str,
+    hits: List[Dict[str, Any]],
+    deadline: Optional[float] = None,
+    batch_size: int = RERANK_BATCH_SIZE,
+) -> List[Dict[str, Any]]:
+    """
+    Reorder RBAC-filtered hits by cross-encoder relevance within a time budget.
+
+    Candidates are scored in vector order, batch by batch, until `deadline`
+    (a time.perf_counter() value; default RERANK_BUDGET_MS from now) would be
+    exceeded by another batch. Scored hits come first, sorted by
+    "rerank_score"; whatever the budget did not cover keeps its vector order
+    after them with rerank_score=None. Cached (query, chunk) scores are free.
+    """
+    if not hits:
+        return hits
+
+    model = get_cross_encoder()  # load outside the budget
+    if deadline is None:
+        deadline = time.perf_counter() + RERANK_BUDGET_MS / 1000
+
+    scores: Dict[str, float] = {}
+    pending: List[Tuple[Dict[str, Any], Tuple[str, str, bytes]]] = []
+    for h in hits:
+        key = _cache_key(query, h)
+        cached = _score_cache.get(key)
+        if cached is None:
+            pending.append((h, key))
+        else:
+            scores[h["id"]] = cached
+
+    last_batch_s = 0.0
+    for i in range(0, len(pending), batch_size):
+        # Stop if the next batch is not expected to finish before the deadline
+        if time.perf_counter() + last_batch_s > deadline:
+            break
+        batch = pending[i : i + batch_size]
+        t0 = time.perf_counter()
+        batch_scores = model.predict(
+            [(query, h["text"]) for h, _ in batch],
+            batch_size=len(batch),
+            show_progress_bar=False,
+        )
+        last_batch_s = time.perf_counter() - t0
+        for (h, key), score in zip(batch, batch_scores):
+            scores[h["id"]] = float(score)
+            _score_cache.put(key, float(score))
+
+    scored = sorted(
+        (h for h in hits if h["id"] in scores),
+        key=lambda h: scores[h["id"]],
+        reverse=True,
+    )
+    unscored = [h for h in hits if h["id"] not in scores]
+
+    for h in scored:
+        h["rerank_score"] = scores[h["id"]]
+    for h in unscored:
+        h["rerank_score"] = None
+
+    return scored + unscored
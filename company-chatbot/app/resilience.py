@@ -0,0 +1,202 @@
+# app/resilience.py
+"""
+Failure-handling primitives for outbound provider calls: error
+classification, jittered backoff, a rolling latency window (for hedging) and
+a per-provider circuit breaker.
+
+Everything here is process-local and shared by all requests of a worker, so a
+provider that starts failing is shed by every request at once instead of each
+request discovering it on its own.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from .metrics import REGISTRY
+
+# Exception classes (by name, anywhere in the MRO) that indicate a transport
+# problem rather than a bad request. Matched by name so neither provider SDK
+# has to be imported here; groq and openai share the same class names.
+RETRYABLE_EXCEPTION_NAMES = {
+    "TimeoutError",
+    "APIConnectionError",
+    "APITimeoutError",
+    "TransportError",
+}
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429}
+
+BREAKER_STATE = REGISTRY.gauge(
+    "chatbot_llm_circuit_state",
+    "LLM provider circuit breaker state (0=closed, 1=half_open, 2=open).",
+    ("provider",),
+)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    True for timeouts, connection errors, 429 and 5xx responses.
+    """
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    return any(cls.__name__ in RETRYABLE_EXCEPTION_NAMES for cls in type(exc).__mro__)
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """
+    Retry-After (seconds form) from an SDK status error, if the provider sent one.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base_s: float, max_s: float) -> float:
+    """
+    "Full jitter" exponential backoff: uniform(0, min(max, base * 2^attempt)).
+    """
+    return random.uniform(0.0, min(max_s, base_s * (2 ** attempt)))
+
+
+class LatencyWindow:
+    """
+    Rolling window of recent successful call latencies (seconds).
+    """
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        q in [0, 1]; None until enough samples have been seen.
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed     calls pass; `failure_threshold` failures in a row -> open
+    open       calls are rejected until `reset_timeout_s` has elapsed -> half_open
+    half_open  a single probe call is let through; success -> closed, failure -> open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_s: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(name, value=0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        BREAKER_STATE.set(self.name, value=self._STATE_VALUE[state])
+
+    def _maybe_half_open(self) -> None:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_s:
+            self._set_state(self.HALF_OPEN)
+            self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """
+        Whether a call may be attempted now. In half_open only one caller gets True
+        until that probe reports back.
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._set_state(self.OPEN)
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """
+        Give back a half_open probe slot without recording an outcome
+        (e.g. the call was cancelled or failed for a non-provider reason).
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyWindow] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str, failure_threshold: int = 5, reset_timeout_s: float = 30.0) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout_s)
+        return breaker
+
+
+def get_latency_window(name: str, min_samples: int = 20) -> LatencyWindow:
+    with _registry_lock:
+        window = _latencies.get(name)
+        if window is None:
+            window = _latencies[name] = LatencyWindow(min_samples=min_samples)
+        return window
+
+
+def reset_resilience_state() -> None:
+    """
+    Drop all breakers and latency windows (used between test scenarios).
+    """
+    with _registry_lock:
+        _breakers.clear()
+        _latencies.clear()
@@ -0,0 +1,178 @@
+"""
+Cheaper response encoding for the search endpoints.
+
+* FastJSONResponse serializes plain dicts with orjson when it is installed
+  (stdlib json otherwise). The search endpoints return it directly, so FastAPI
+  skips re-validating and encoding every hit through the Pydantic models.
+* CompressionMiddleware compresses bodies of RESPONSE_COMPRESS_MIN_BYTES or
+  more: brotli if the client accepts it and the `brotli` package is installed,
+  else gzip. Streaming bodies are compressed chunk by chunk, except event
+  streams (NDJSON, SSE): a compressor would hold back each event until it
+  has enough input. It only relies on the ASGI message protocol (zlib /
+  brotli streams), not on Starlette's GZipMiddleware internals, which change
+  between releases.
+"""
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Any, Callable, Optional, Union
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import RESPONSE_BROTLI_QUALITY, RESPONSE_COMPRESS_MIN_BYTES, RESPONSE_GZIP_LEVEL
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json below
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", NDJSON_MEDIA_TYPE)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int = RESPONSE_GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        # A sync flush per chunk lets the client decode each part as it arrives
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int = RESPONSE_BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+
+Encoder = Union[GzipEncoder, BrotliEncoder]
+
+
+class CompressionResponder:
+    """
+    Compresses one response. The start message is held back until the first
+    body chunk shows whether the body is big enough (or streamed).
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, make_encoder: Callable[[], Encoder]):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.make_encoder = make_encoder
+        self.send: Send
+        self.start: Optional[Message] = None
+        self.encoder: Optional[Encoder] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            # Already encoded, or an event stream that must not be held back
+            self.passthrough = "content-encoding" in headers or headers.get("content-type", "").startswith(
+                EXCLUDED_CONTENT_TYPES
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+            return
+
+        if self.passthrough or message["type"] != "http.response.body":
+            if self.start is not None:  # e.g. http.response.pathsend: leave it alone
+                await self.send(self.start)
+                self.start, self.passthrough = None, True
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is None:
+            body = self.encoder.encode(body, not more_body)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        start, self.start = self.start, None
+        if not more_body and len(body) < self.minimum_size:
+            self.passthrough = True
+            await self.send(start)
+            await self.send(message)
+            return
+
+        self.encoder = self.make_encoder()
+        body = self.encoder.encode(body, not more_body)
+        headers = MutableHeaders(raw=list(start["headers"]))
+        headers["Content-Encoding"] = self.encoder.name
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(body))
+        await self.send({**start, "headers": headers.raw})
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = RESPONSE_COMPRESS_MIN_BYTES,
+        gzip_level: int = RESPONSE_GZIP_LEVEL,
+        brotli_quality: int = RESPONSE_BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = Headers(scope=scope).get("Accept-Encoding", "")
+        if brotli is not None and _accepts(accept, "br"):
+            make_encoder: Callable[[], Encoder] = lambda: BrotliEncoder(self.brotli_quality)
+        elif _accepts(accept, "gzip"):
+            make_encoder = lambda: GzipEncoder(self.gzip_level)
+        else:
+            await self.app(scope, receive, send)
+            return
+        await CompressionResponder(self.app, self.minimum_size, make_encoder)(scope, receive, send)
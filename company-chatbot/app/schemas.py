@@ -1,7 +1,9 @@
 # app/schemas.py
 
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional,List
+from typing import Literal, Optional,List
+
+from .config import SEARCH_BATCH_MAX_QUERIES, SEARCH_MAX_TOP_K, SEARCH_SNIPPET_CHARS
 
 
 class UserBase(BaseModel):
@@ -27,22 +29,63 @@ class LoginRequest(BaseModel):
     password: str
 
 
-class SearchRequest(BaseModel):
+HitField = Literal["id", "text", "snippet", "score", "department", "source_file", "rerank_score"]
+
+# Hit fields returned when a request does not list `fields`, per `mode`
+HIT_FIELDS = {
+    "full": ["id", "text", "score", "department", "source_file", "rerank_score"],
+    "snippet": ["id", "snippet", "score", "department", "source_file", "rerank_score"],
+}
+
+
+class HitProjection(BaseModel):
+    """
+    Which hit fields a search response carries. "snippet" is the window of
+    the text around the query terms (app/snippets.py).
+    """
+
+    mode: Literal["full", "snippet"] = "full"
+    fields: Optional[List[HitField]] = Field(None, min_length=1)  # overrides `mode`
+    snippet_chars: int = Field(SEARCH_SNIPPET_CHARS, ge=40, le=4000)
+    highlight: bool = False  # query terms in snippets wrapped in ** ** (opt-in)
+
+    def hit_fields(self) -> List[str]:
+        return list(self.fields) if self.fields else HIT_FIELDS[self.mode]
+
+
+class SearchRequest(HitProjection):
     query: str
-    top_k: int = 5
+    top_k: int = Field(5, ge=1, le=SEARCH_MAX_TOP_K)
+    rerank: Optional[bool] = None  # None = server default (RERANK_ENABLED)
+    diversify: Optional[bool] = None  # MMR; None = server default (MMR_ENABLED)
 
 
 class SearchHit(BaseModel):
-    id: str
-    text: str
-    score: float
-    department: str
-    source_file: str
+    # Only the requested fields are present (see HitProjection)
+    id: Optional[str] = None
+    text: Optional[str] = None
+    snippet: Optional[str] = None
+    score: Optional[float] = None
+    department: Optional[str] = None
+    source_file: Optional[str] = None
+    rerank_score: Optional[float] = None
 
 
 class SearchResponse(BaseModel):
     hits: list[SearchHit]
 
+
+class BatchSearchRequest(HitProjection):
+    queries: list[str] = Field(..., min_length=1, max_length=SEARCH_BATCH_MAX_QUERIES)
+    top_k: int = Field(5, ge=1, le=SEARCH_MAX_TOP_K)
+    rerank: Optional[bool] = None
+    diversify: Optional[bool] = None
+
+
+class BatchSearchResponse(BaseModel):
+    # One entry per request query, in the same order
+    results: list[SearchResponse]
+
 class UserOut(BaseModel):
     id: int
     username: str
@@ -56,13 +99,31 @@ class Source(BaseModel):
     source_file: str
     score: float
     snippet: str
+    rerank_score: Optional[float] = None
 
 
 class RagRequest(BaseModel):
     query: str = Field(..., min_length=3)
-    top_k: int = 4
+    top_k: int = Field(4, ge=1, le=SEARCH_MAX_TOP_K)
+    rerank: Optional[bool] = None
+    diversify: Optional[bool] = None
 
 
 class RagResponse(BaseModel):
     answer: str
-    sources: List[Source]
\ No newline at end of file
+    sources: List[Source]
+
+
+class ChatRequest(BaseModel):
+    query: str = Field(..., min_length=1)  # follow-ups can be as short as "Q3?"
+    session_id: Optional[str] = None  # None = start a new conversation
+    top_k: int = Field(4, ge=1, le=SEARCH_MAX_TOP_K)
+    rerank: Optional[bool] = None
+    diversify: Optional[bool] = None
+
+
+class ChatResponse(BaseModel):
+    session_id: str
+    answer: str
+    sources: List[Source]
+    retrieval: str  # "search", or "reused" when the session's earlier chunks covered the question
\ No newline at end of file
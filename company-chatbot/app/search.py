@@ -1,59 +1,203 @@
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Sequence
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
+from .config import (
+    VECTOR_BACKEND,
+    RERANK_ENABLED,
+    RERANK_CANDIDATES,
+    RERANK_BUDGET_MS,
+    MMR_ENABLED,
+    MMR_LAMBDA,
+    MMR_FETCH_FACTOR,
+)
+from .embeddings import EmbeddingBackend
+from .rbac import allowed_roles_from_metadata, get_role_index
+from .tracing import span
 from .vectorstore import get_collection, get_embedding_model
 
 
+def mmr_order(
+    query_embedding: Sequence[float],
+    embeddings: Sequence[Sequence[float]],
+    k: int,
+    lambda_: float = MMR_LAMBDA,
+) -> List[int]:
+    """
+    Maximal marginal relevance: greedily pick `k` of `embeddings`, each time the
+    one maximising lambda * sim(query, d) - (1 - lambda) * max sim(d, picked).
+    Returns positions in pick order.
+    """
+    if len(embeddings) == 0:
+        return []
+    docs = np.asarray(embeddings, dtype=np.float32)
+    docs = docs / np.maximum(np.linalg.norm(docs, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(query_embedding, dtype=np.float32)
+    relevance = docs @ (q / max(float(np.linalg.norm(q)), 1e-12))
+    pairwise = docs @ docs.T
+
+    picked: List[int] = []
+    redundancy = np.zeros(len(docs), dtype=np.float32)
+    available = np.ones(len(docs), dtype=bool)
+    for _ in range(min(k, len(docs))):
+        score = np.where(available, lambda_ * relevance - (1 - lambda_) * redundancy, -np.inf)
+        best = int(np.argmax(score))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return picked
+
+
 def semantic_search(
     query: str,
     user_role: str,
     top_k: int = 5,
+    rerank: Optional[bool] = None,
+    diversify: Optional[bool] = None,
+    query_embedding: Optional[Sequence[float]] = None,
+    with_embeddings: bool = False,
 ) -> List[Dict[str, Any]]:
     """
-    Run semantic search and then enforce RBAC in Python.
+    Run semantic search with RBAC.
+
+    When the per-role bitmaps from app/rbac.py are available, RBAC is applied
+    as a pre-filter (Chroma `where` / flat index mask) and re-checked per hit
+    with a bit test. Older indexes without them fall back to over-fetching and
+    parsing the allowed_roles metadata.
+
+    With `diversify` (default: MMR_ENABLED), the hits are picked from
+    MMR_FETCH_FACTOR times as many visible candidates by maximal marginal
+    relevance, so overlapping chunks do not fill the top-k.
+
+    With `rerank` (default: RERANK_ENABLED), up to RERANK_CANDIDATES visible
+    hits are reordered by a cross-encoder within RERANK_BUDGET_MS.
+
+    `query_embedding` skips encoding a query the caller already encoded;
+    `with_embeddings` adds each hit's vector as "embedding".
+    """
+    return semantic_search_batch(
+        [query],
+        user_role=user_role,
+        top_k=top_k,
+        rerank=rerank,
+        diversify=diversify,
+        query_embeddings=None if query_embedding is None else [query_embedding],
+        with_embeddings=with_embeddings,
+    )[0]
+
+
+def semantic_search_batch(
+    queries: List[str],
+    user_role: str,
+    top_k: int = 5,
+    rerank: Optional[bool] = None,
+    diversify: Optional[bool] = None,
+    query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+    with_embeddings: bool = False,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Search many queries for one role at once: a single batched encode and a
+    single multi-row vector store query. Returns one hit list per query, in order.
+    The rerank budget, if enabled, is shared by the whole batch.
     """
     user_role = user_role.lower().strip()
+    if not queries:
+        return []
+
+    if rerank is None:
+        rerank = RERANK_ENABLED
+    if diversify is None:
+        diversify = MMR_ENABLED
+    # Number of RBAC-visible candidates kept per query before the final cut
+    keep = max(top_k, RERANK_CANDIDATES) if rerank else top_k
+    # ... picked by MMR from a larger pool when diversifying
+    pool = keep * max(MMR_FETCH_FACTOR, 1) if diversify else keep
 
     collection = get_collection()
-    model: SentenceTransformer = get_embedding_model()
+    model: EmbeddingBackend = get_embedding_model()
+    role_index = get_role_index()
 
-    query_embedding = model.encode([query]).tolist()[0]
+    query_kwargs: Dict[str, Any] = {}
+    n_results = max(pool * 5, 20)  # over-fetch to allow RBAC filtering
+    if VECTOR_BACKEND in ("flat", "sharded"):
+        # The flat index (each shard's, when sharded) applies RBAC before ranking via its role bitsets
+        query_kwargs["allowed_role"] = user_role
+        n_results = pool
+    elif role_index is not None:
+        where = role_index.chroma_where(user_role)
+        if where is None:
+            return [[] for _ in queries]  # role cannot see any indexed chunk
+        query_kwargs["where"] = where
+        n_results = pool
 
-    # Note: no "ids" in include – this Chroma version doesn't allow that
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=max(top_k * 5, 20),  # over-fetch to allow RBAC filtering
-        include=["documents", "metadatas", "distances"],
-    )
+    if query_embeddings is None:
+        with span("search.encode"):
+            query_embeddings = model.encode(queries).tolist()
+    fetch_vectors = diversify or with_embeddings
 
-    # Chroma still returns "ids" even if we don't ask for it in include
-    ids = results.get("ids", [[]])[0]
-    docs = results.get("documents", [[]])[0]
-    metas = results.get("metadatas", [[]])[0]
-    distances = results.get("distances", [[]])[0]
-
-    hits: List[Dict[str, Any]] = []
-
-    for _id, doc, meta, dist in zip(ids, docs, metas, distances):
-        allowed_roles_str = meta.get("allowed_roles", "") or ""
-        allowed_roles_list = [
-            r.strip().lower()
-            for r in allowed_roles_str.split(",")
-            if r.strip()
-        ]
-
-        # Enforce RBAC here
-        if user_role not in allowed_roles_list:
-            continue
-
-        hits.append(
-            {
-                "id": _id,
-                "text": doc,
-                "metadata": meta,
-                "score": float(dist),
-            }
+    # Note: no "ids" in include – this Chroma version doesn't allow that.
+    # Sharded: shards that miss SHARD_TIMEOUT_S are left out (partial result,
+    # counted in chatbot_shard_failures_total) rather than failing the search.
+    with span("search.vector_query"):
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            include=["documents", "metadatas", "distances", *(["embeddings"] if fetch_vectors else [])],
+            **query_kwargs,
         )
 
-    return hits[:top_k]
+    # Chroma still returns "ids" even if we don't ask for it in include
+    with span("search.rbac_filter"):
+        all_hits: List[List[Dict[str, Any]]] = []
+        all_vectors: List[List[Any]] = []
+        for row in range(len(queries)):
+            ids = results["ids"][row]
+            docs = results["documents"][row]
+            metas = results["metadatas"][row]
+            distances = results["distances"][row]
+            vectors = results["embeddings"][row] if fetch_vectors else [None] * len(ids)
+
+            hits: List[Dict[str, Any]] = []
+            hit_vectors = []
+
+            for _id, doc, meta, dist, vec in zip(ids, docs, metas, distances, vectors):
+                # Enforce RBAC here (defense in depth on top of the pre-filter)
+                if role_index is not None:
+                    if not role_index.is_allowed(user_role, _id):
+                        continue
+                elif user_role not in allowed_roles_from_metadata(meta):
+                    continue
+
+                hit = {
+                    "id": _id,
+                    "text": doc,
+                    "metadata": meta,
+                    "score": float(dist),
+                }
+                if with_embeddings:
+                    hit["embedding"] = vec
+                hits.append(hit)
+                hit_vectors.append(vec)
+
+            all_hits.append(hits)
+            all_vectors.append(hit_vectors)
+
+    if diversify:
+        with span("search.mmr"):
+            all_hits = [
+                [hits[i] for i in mmr_order(q, vectors, keep)]
+                for q, hits, vectors in zip(query_embeddings, all_hits, all_vectors)
+            ]
+    else:
+        all_hits = [hits[:keep] for hits in all_hits]
+
+    if rerank:
+        from .rerank import get_cross_encoder, rerank_hits
+
+        get_cross_encoder()  # first-use model load does not eat the budget
+        with span("search.rerank"):
+            deadline = time.perf_counter() + RERANK_BUDGET_MS / 1000
+            all_hits = [rerank_hits(q, hits, deadline=deadline) for q, hits in zip(queries, all_hits)]
+
+    return [hits[:top_k] for hits in all_hits]
@@ -0,0 +1,183 @@
+"""
+Server-side conversation state for POST /chat.
+
+A stateless /rag call searches again for every question, and a follow-up
+like "and for Q3?" is searched on its own. A ChatSession keeps per
+conversation:
+
+* the last SESSION_MAX_TURNS turns, repeated in the prompt so follow-ups
+  have their context
+* up to SESSION_MAX_CONTEXT_CHUNKS retrieved chunks with their embeddings. A
+  follow-up they already cover is answered from them without a search.
+* the topic: the last question that was not a short follow-up. It is
+  prepended to short follow-ups before they are encoded.
+
+Sessions live in the worker's memory (SessionStore: least recently used
+beyond SESSION_MAX_SESSIONS and idle ones after SESSION_TTL_S are evicted).
+With several API workers, a session is only found on the worker that created
+it, so chat clients need sticky routing; an unknown session is a 404.
+"""
+from __future__ import annotations
+
+import asyncio
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import (
+    SESSION_FOLLOWUP_MAX_WORDS,
+    SESSION_MAX_CONTEXT_CHUNKS,
+    SESSION_MAX_SESSIONS,
+    SESSION_MAX_TURNS,
+    SESSION_REUSE_RATIO,
+    SESSION_TTL_S,
+)
+from .metrics import REGISTRY
+
+SESSIONS_ACTIVE = REGISTRY.gauge("chatbot_chat_sessions", "Conversation sessions held by this worker.")
+SESSIONS_EVICTED = REGISTRY.counter(
+    "chatbot_chat_sessions_evicted_total", "Conversation sessions dropped, by reason (ttl, lru).", ("reason",)
+)
+
+# Answers are repeated in later prompts; cap what one turn adds
+MAX_ANSWER_CHARS = 800
+
+
+@dataclass
+class Turn:
+    query: str
+    answer: str
+    source_ids: List[str]
+
+
+@dataclass
+class ChatSession:
+    id: str
+    username: str
+    role: str
+    last_used: float = field(default_factory=time.monotonic)
+    turns: Deque[Turn] = field(default_factory=lambda: deque(maxlen=SESSION_MAX_TURNS))
+    # chunk id -> search hit with its "embedding", oldest retrieval first
+    context: OrderedDict[str, Dict[str, Any]] = field(default_factory=OrderedDict)
+    topic: str = ""
+    # top_k-th query similarity of the last search, the bar for reusing context
+    reference_similarity: float = 0.0
+    # One turn at a time: a turn reads and extends the state of the previous one
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def search_query(self, query: str) -> str:
+        """
+        The text to encode for `query`: short follow-ups are read in the
+        context of the current topic, other questions start a new topic.
+        """
+        if self.topic and len(query.split()) <= SESSION_FOLLOWUP_MAX_WORDS:
+            return f"{self.topic} {query}"
+        self.topic = query
+        return query
+
+    def reusable_hits(self, query_embedding: Sequence[float], top_k: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        The `top_k` context chunks most similar to the question, if all of
+        them are about as similar as the last search's hits were; else None.
+        """
+        if len(self.context) < top_k or self.reference_similarity <= 0:
+            return None
+        hits = list(self.context.values())
+        sims = _cosine(query_embedding, [h["embedding"] for h in hits])
+        best = np.argsort(-sims)[:top_k]
+        if sims[best[-1]] < SESSION_REUSE_RATIO * self.reference_similarity:
+            return None
+        # In retrieval order: the same chunks as last turn give the same prompt prefix
+        return [{**hits[i], "score": float(1.0 - sims[i])} for i in sorted(best)]
+
+    def add_context(self, query_embedding: Sequence[float], hits: List[Dict[str, Any]]) -> None:
+        """
+        Remember freshly searched hits (they must carry "embedding").
+        """
+        if not hits:
+            return
+        sims = _cosine(query_embedding, [h["embedding"] for h in hits])
+        self.reference_similarity = float(sims.min())
+        for hit in hits:
+            self.context.pop(hit["id"], None)
+            self.context[hit["id"]] = hit
+        while len(self.context) > SESSION_MAX_CONTEXT_CHUNKS:
+            self.context.popitem(last=False)
+
+    def add_turn(self, query: str, answer: str, source_ids: List[str]) -> None:
+        if len(answer) > MAX_ANSWER_CHARS:
+            answer = answer[:MAX_ANSWER_CHARS] + "..."
+        self.turns.append(Turn(query, answer, source_ids))
+
+
+def _cosine(query_embedding: Sequence[float], embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+    docs = np.asarray(embeddings, dtype=np.float32)
+    docs = docs / np.maximum(np.linalg.norm(docs, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(query_embedding, dtype=np.float32)
+    return docs @ (q / max(float(np.linalg.norm(q)), 1e-12))
+
+
+class SessionStore:
+    """
+    Thread-safe LRU of sessions with an idle timeout.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, ttl_s: float = SESSION_TTL_S):
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self._sessions: OrderedDict[str, ChatSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, username: str, role: str) -> ChatSession:
+        session = ChatSession(id=secrets.token_urlsafe(16), username=username, role=role)
+        with self._lock:
+            self._expire()
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                SESSIONS_EVICTED.inc("lru")
+            SESSIONS_ACTIVE.set(value=len(self._sessions))
+        return session
+
+    def get(self, session_id: str, username: str, role: str) -> Optional[ChatSession]:
+        """
+        The live session, or None if it expired, was evicted, or belongs to
+        another user (or to this user under a different role).
+        """
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None or session.username != username or session.role != role:
+                return None
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str, username: str) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.username != username:
+                return False
+            del self._sessions[session_id]
+            SESSIONS_ACTIVE.set(value=len(self._sessions))
+            return True
+
+    def _expire(self) -> None:
+        # Least recently used first, so expired sessions sit at the front
+        cutoff = time.monotonic() - self.ttl_s
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            SESSIONS_EVICTED.inc("ttl")
+        SESSIONS_ACTIVE.set(value=len(self._sessions))
+
+
+# One store per worker process
+SESSIONS = SessionStore()
@@ -0,0 +1,101 @@
+"""
+One index shard behind a socket (run with `python -m scripts.shard_server`).
+
+Serves the flat index in SHARD_INDEX_DIR/shard_<i> to the ShardedCollection
+client in app/shards.py. Requests are app/wire.py frames:
+
+    {"op": "query", "n", "dim", "n_results", "include", "role"} + float32 payload
+        -> {"ok", "ids", "distances", ["documents"], ["metadatas"], "count"}
+           (+ float32 payload with the rows' vectors, in result order, if "embeddings" is included)
+    {"op": "info"} -> {"ok", "shard", "count", "dim"}
+
+Queries run on a small thread pool (SHARD_SERVER_THREADS) because NumPy
+releases the GIL in the scan. The index is reopened after a rebuild swaps the
+shard directory, like the flat backend does in the API.
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from .config import SHARD_SERVER_THREADS
+from .flat_index import get_flat_collection
+from .wire import pack_frame, read_frame, remove_socket_file, serve_until_stopped, start_server
+
+
+class ShardServer:
+    def __init__(self, shard: int, index_dir: Path, threads: int = SHARD_SERVER_THREADS):
+        self.shard = shard
+        self.index_dir = index_dir
+        self._executor = ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix=f"shard{shard}")
+        self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    def _query(self, header: Dict[str, Any], payload: bytes) -> Tuple[Dict[str, Any], bytes]:
+        collection = get_flat_collection(self.index_dir)
+        q = np.frombuffer(payload, dtype="<f4").reshape(header["n"], header["dim"])
+        include = [
+            "distances",
+            *(k for k in header.get("include", []) if k in ("documents", "metadatas", "embeddings")),
+        ]
+        result = collection.query(
+            query_embeddings=q,
+            n_results=int(header["n_results"]),
+            include=include,
+            allowed_role=header.get("role"),
+        )
+        vectors = b""
+        if "embeddings" in result:
+            rows = [v for row in result.pop("embeddings") for v in row]
+            if rows:
+                vectors = np.asarray(rows, dtype="<f4").tobytes()
+        return {"ok": True, **result, "count": collection.count()}, vectors
+
+    def _info(self) -> Dict[str, Any]:
+        collection = get_flat_collection(self.index_dir)
+        return {"ok": True, "shard": self.shard, "count": collection.count(), "dim": collection.dim}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections[writer] = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    header, payload = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+
+                op = header.get("op")
+                out = b""
+                try:
+                    if op == "query":
+                        response, out = await loop.run_in_executor(self._executor, self._query, header, payload)
+                    elif op == "info":
+                        response = await loop.run_in_executor(self._executor, self._info)
+                    else:
+                        response = {"ok": False, "error": f"unknown op: {op!r}"}
+                except Exception as e:
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                writer.write(pack_frame(response, out))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def serve(self, address: str) -> None:
+        server = await start_server(self._handle, address)
+        try:
+            count = get_flat_collection(self.index_dir).count()
+        except RuntimeError:
+            count = 0  # not built yet; queries report the error until it is
+        print(f"Shard {self.shard} serving {self.index_dir} ({count} rows) on {address}", flush=True)
+        try:
+            await serve_until_stopped(server, self._connections)
+        finally:
+            self._executor.shutdown(wait=False)
+            remove_socket_file(address)
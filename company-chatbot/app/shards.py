@@ -0,0 +1,222 @@
+"""
+Sharded retrieval (VECTOR_BACKEND=sharded): scatter-gather over shard processes.
+
+Chunks are hash-partitioned by id into SHARD_COUNT flat indexes
+(SHARD_INDEX_DIR/shard_<i>, written by the indexer). Each one is served by its
+own process (scripts/shard_server.py, app/shard_server.py), so index size and
+query CPU are spread over several processes, and over several nodes once
+SHARD_ADDRESSES points at TCP ports elsewhere.
+
+A query embeds once in the API worker, then sends the vectors and the role to
+every shard concurrently. Each shard applies its RBAC mask and returns its own
+top-k; the global top-k is a merge by distance. Shards that miss the
+SHARD_TIMEOUT_S deadline or are unreachable are left out, and the result is
+flagged as partial instead of failing the request.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import SHARD_ADDRESSES, SHARD_COUNT, SHARD_INDEX_DIR, SHARD_TIMEOUT_S
+from .metrics import REGISTRY
+from .wire import connect, pack_frame, recv_frame
+
+SHARDS_MANIFEST = "shards.json"
+PARTITIONING = "crc32(id) % count"
+
+SHARD_QUERY_SECONDS = REGISTRY.histogram(
+    "chatbot_shard_query_seconds",
+    "Round trip of one shard query, as seen by the API worker.",
+    ("shard",),
+)
+SHARD_FAILURES = REGISTRY.counter(
+    "chatbot_shard_failures_total",
+    "Shard queries left out of a result (timeout, unavailable, error).",
+    ("shard", "reason"),
+)
+
+
+def shard_of(chunk_id: str, count: int = SHARD_COUNT) -> int:
+    """
+    Stable shard number of a chunk; identical in every process and on every node.
+    """
+    return zlib.crc32(chunk_id.encode("utf-8")) % count
+
+
+def shard_dir(shard: int, root: Path = SHARD_INDEX_DIR) -> Path:
+    return root / f"shard_{shard}"
+
+
+def partition(chunks: Sequence[Dict[str, Any]], count: int = SHARD_COUNT) -> List[List[Dict[str, Any]]]:
+    parts: List[List[Dict[str, Any]]] = [[] for _ in range(count)]
+    for chunk in chunks:
+        parts[shard_of(chunk["id"], count)].append(chunk)
+    return parts
+
+
+def write_shards_manifest(count: int = SHARD_COUNT, root: Path = SHARD_INDEX_DIR) -> None:
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = {"count": count, "partitioning": PARTITIONING}
+    (root / SHARDS_MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def shards_index_exists(count: int = SHARD_COUNT, root: Path = SHARD_INDEX_DIR) -> bool:
+    """
+    True if every shard exists and was partitioned for `count` shards; after a
+    SHARD_COUNT change the incremental path must rebuild instead.
+    """
+    try:
+        manifest = json.loads((root / SHARDS_MANIFEST).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return False
+    return (
+        manifest.get("count") == count
+        and manifest.get("partitioning") == PARTITIONING
+        and all((shard_dir(i, root) / "columns.json").exists() for i in range(count))
+    )
+
+
+class ShardError(RuntimeError):
+    pass
+
+
+class ShardClient:
+    """
+    Connection to one shard; each calling thread keeps its own socket.
+    """
+
+    def __init__(self, shard: int, address: str, timeout_s: float = SHARD_TIMEOUT_S):
+        self.shard = shard
+        self.address = address
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+
+    def request(self, header: Dict[str, Any], payload: bytes = b"") -> Dict[str, Any]:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = self._local.sock = connect(self.address, self.timeout_s)
+        try:
+            sock.sendall(pack_frame(header, payload))
+            response, vectors = recv_frame(sock)
+        except OSError:
+            # A late response would otherwise be read as the answer to the next request
+            sock.close()
+            self._local.sock = None
+            raise
+        if not response.get("ok"):
+            raise ShardError(f"shard {self.shard}: {response.get('error')}")
+        if vectors:
+            # Result vectors arrive as one float32 block, row after row
+            flat = np.frombuffer(vectors, dtype="<f4").reshape(-1, header["dim"])
+            ends = np.cumsum([len(ids) for ids in response["ids"]])
+            response["embeddings"] = [list(part) for part in np.split(flat, ends[:-1])]
+        return response
+
+
+class ShardedCollection:
+    """
+    Drop-in for the Chroma / flat collection in app/search.py (`count`, `query`
+    with `allowed_role`). Query results carry an extra "failed_shards" list.
+    """
+
+    def __init__(self, addresses: Sequence[str] = SHARD_ADDRESSES, timeout_s: float = SHARD_TIMEOUT_S):
+        self.timeout_s = timeout_s
+        self.shards = [ShardClient(i, a, timeout_s) for i, a in enumerate(addresses)]
+        # Enough threads for several API requests fanning out at once
+        self._pool = ThreadPoolExecutor(max_workers=8 * len(self.shards), thread_name_prefix="shard")
+
+    def _scatter(self, header: Dict[str, Any], payload: bytes = b""):
+        """
+        Send the request to every shard; returns ({shard: response}, {shard: failure reason})
+        once all shards answered or the deadline passed.
+        """
+
+        def call(client: ShardClient) -> Dict[str, Any]:
+            t0 = time.perf_counter()
+            try:
+                return client.request(header, payload)
+            finally:
+                SHARD_QUERY_SECONDS.observe(str(client.shard), value=time.perf_counter() - t0)
+
+        futures = {self._pool.submit(call, client): client.shard for client in self.shards}
+        done, _ = wait(futures, timeout=self.timeout_s)
+
+        responses: Dict[int, Dict[str, Any]] = {}
+        failures: Dict[int, str] = {}
+        for future, shard in futures.items():
+            if future not in done:
+                # The socket timeout ends the worker thread and drops its connection
+                failures[shard] = "timeout"
+                continue
+            exc = future.exception()
+            if exc is None:
+                responses[shard] = future.result()
+            elif isinstance(exc, OSError):
+                failures[shard] = "timeout" if isinstance(exc, TimeoutError) else "unavailable"
+            else:
+                failures[shard] = "error"
+        for shard, reason in failures.items():
+            SHARD_FAILURES.inc(str(shard), reason)
+        return responses, failures
+
+    def count(self) -> int:
+        responses, failures = self._scatter({"op": "info"})
+        if failures:
+            raise ShardError(f"shards unavailable: {sorted(failures)}")
+        return sum(r["count"] for r in responses.values())
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        include: Sequence[str] = ("documents", "metadatas", "distances"),
+        allowed_role: Optional[str] = None,
+    ) -> Dict[str, List[Any]]:
+        q = np.ascontiguousarray(query_embeddings, dtype="<f4")
+        header = {
+            "op": "query",
+            "n": int(q.shape[0]),
+            "dim": int(q.shape[1]),
+            "n_results": n_results,
+            "include": [k for k in include if k in ("documents", "metadatas", "embeddings")],
+            "role": allowed_role,
+        }
+        responses, failures = self._scatter(header, q.tobytes())
+
+        keys = ["ids", *(k for k in include if k in ("documents", "metadatas", "distances", "embeddings"))]
+        results: Dict[str, List[Any]] = {key: [] for key in keys}
+        for row in range(q.shape[0]):
+            # Each shard's list is sorted by distance already: merge, keep n_results
+            candidates = heapq.nsmallest(
+                n_results,
+                (
+                    (dist, shard, pos)
+                    for shard, response in responses.items()
+                    for pos, dist in enumerate(response["distances"][row])
+                ),
+            )
+            for key in keys:
+                results[key].append([responses[shard][key][row][pos] for _, shard, pos in candidates])
+        results["failed_shards"] = sorted(failures)
+        return results
+
+
+_sharded_collection: ShardedCollection | None = None
+
+
+def get_sharded_collection() -> ShardedCollection:
+    global _sharded_collection
+    if _sharded_collection is None:
+        if len(SHARD_ADDRESSES) != SHARD_COUNT:
+            raise RuntimeError(f"SHARD_ADDRESSES lists {len(SHARD_ADDRESSES)} shards, SHARD_COUNT is {SHARD_COUNT}")
+        _sharded_collection = ShardedCollection()
+    return _sharded_collection
@@ -0,0 +1,352 @@
+"""
+Portable index snapshots for bootstrapping API replicas.
+
+A snapshot is one uncompressed .tar (scripts/build_snapshot.py) holding
+everything a replica needs to answer queries, so it does not rebuild the index
+or download the embedding model:
+
+    manifest.json           format, version, embedding model, counts, sha256 + size per file
+    index/                  flat index (app/flat_index.py) of the served vectors
+    chunk_store/            preprocessed chunks (app/chunk_store.py), if present
+    rbac_index.npz          per-role bitmaps (app/rbac.py)
+    hr_stats.json           HR CSV aggregates (app/hr_stats.py), if present
+    model/                  torch / onnx weights the vectors were encoded with
+
+The version is "<UTC build time>-<content digest>". A replica sets
+SNAPSHOT_PATH; `main.lifespan` then calls `load_snapshot()`, which extracts the
+tar once into SNAPSHOT_CACHE_DIR/<version> (verified against the manifest,
+then reused across restarts), memory-maps the index, loads the model from
+the snapshot, and warms both up before the worker accepts requests.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .changeset import ingest_lock
+from .config import (
+    CHUNK_STORE_DIR,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_QUANTIZE,
+    EMBEDDING_SIDECAR_BACKEND,
+    FLAT_INDEX_DIR,
+    HR_STATS_PATH,
+    ONNX_MODEL_DIR,
+    ROLE_TO_DEPARTMENTS,
+    SHARD_COUNT,
+    SNAPSHOT_CACHE_DIR,
+    SNAPSHOT_DIR,
+    SNAPSHOT_PATH,
+    SNAPSHOT_VERIFY,
+    VECTOR_BACKEND,
+)
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+# Written into an extracted snapshot once its files matched the manifest
+VERIFIED_MARKER = ".verified"
+
+
+class SnapshotError(RuntimeError):
+    pass
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# --- Building ---
+
+
+def _export_index(dest: Path) -> int:
+    """
+    Flat index of the vectors currently served, written to `dest`. A flat index
+    is copied as is (quantization included); Chroma and shards are exported.
+    """
+    import numpy as np
+
+    from .flat_index import FlatCollection, write_flat_index
+
+    if VECTOR_BACKEND == "flat":
+        shutil.copytree(FLAT_INDEX_DIR, dest)
+        return FlatCollection(dest).count()
+
+    if VECTOR_BACKEND == "sharded":
+        from .shards import shard_dir
+
+        ids, parts, documents, metadatas = [], [], [], []
+        for shard in range(SHARD_COUNT):
+            c = FlatCollection(shard_dir(shard))
+            ids += [c.ids[i] for i in range(c.count())]
+            parts.append(np.asarray(c.embeddings, dtype=np.float32))
+            documents += [c.documents[i] for i in range(c.count())]
+            metadatas += [c.metadata(i) for i in range(c.count())]
+        embeddings = np.concatenate(parts)
+    else:
+        from .vectorstore import get_collection
+
+        data = get_collection().get(include=["embeddings", "documents", "metadatas"])
+        ids, documents, metadatas = data["ids"], data["documents"], data["metadatas"]
+        embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+
+    write_flat_index(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas, index_dir=dest)
+    return len(ids)
+
+
+def _export_model(backend: str, dest: Path) -> Dict[str, Any]:
+    """
+    Save the weights of `backend` under `dest`; returns the manifest's "embedding" entry.
+    """
+    from .embeddings import ONNX_MODEL_FILE, ONNX_QUANTIZED_MODEL_FILE, create_embedding_backend
+
+    if backend == "sidecar":
+        backend = EMBEDDING_SIDECAR_BACKEND  # the model the sidecar serves
+    model = create_embedding_backend(backend)
+
+    if backend == "torch":
+        model.model.save(str(dest))
+    elif backend == "onnx":
+        dest.mkdir(parents=True)
+        model_file = ONNX_QUANTIZED_MODEL_FILE if EMBEDDING_ONNX_QUANTIZE else ONNX_MODEL_FILE
+        for path in ONNX_MODEL_DIR.iterdir():
+            # Only the graph in use; the tokenizer files are small
+            if path.is_file() and (path.suffix != ".onnx" or path.name == model_file):
+                shutil.copy2(path, dest / path.name)
+
+    return {
+        "backend": backend,
+        "name": model.name,
+        "dim": model.dim,
+        "quantized": backend == "onnx" and EMBEDDING_ONNX_QUANTIZE,
+    }
+
+
+def build_snapshot(out_dir: Path = SNAPSHOT_DIR, backend: str = EMBEDDING_BACKEND) -> Path:
+    """
+    Package the served index, chunk store, RBAC index and model weights into
+    out_dir/snapshot-<version>.tar and return its path.
+    """
+    from .chunk_store import ChunkStore
+    from .rbac import RBAC_INDEX_PATH, RoleIndex, config_fingerprint
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stage = Path(tempfile.mkdtemp(prefix=".build-", dir=out_dir))
+    try:
+        vector_count = _export_index(stage / "index")
+        embedding = _export_model(backend, stage / "model")
+
+        index_info = json.loads((stage / "index" / "columns.json").read_text(encoding="utf-8"))
+        if index_info["dim"] != embedding["dim"]:
+            raise SnapshotError(
+                f"Index dim {index_info['dim']} != {embedding['name']} dim {embedding['dim']}; "
+                "rebuild the index with this model first."
+            )
+
+        chunk_count = None
+        if ChunkStore.exists():
+            shutil.copytree(CHUNK_STORE_DIR, stage / "chunk_store")
+            chunk_count = len(ChunkStore(stage / "chunk_store"))
+        if RBAC_INDEX_PATH.exists():
+            shutil.copy2(RBAC_INDEX_PATH, stage / "rbac_index.npz")
+        else:
+            from .vectorstore import load_chunks
+
+            RoleIndex.from_chunks(load_chunks()).save(stage / "rbac_index.npz")
+        if HR_STATS_PATH.exists():
+            shutil.copy2(HR_STATS_PATH, stage / "hr_stats.json")
+
+        files = {
+            p.relative_to(stage).as_posix(): {"size": p.stat().st_size, "sha256": _sha256(p)}
+            for p in sorted(stage.rglob("*"))
+            if p.is_file()
+        }
+        content_digest = hashlib.sha256(
+            "\n".join(f"{name} {f['sha256']}" for name, f in files.items()).encode("utf-8")
+        ).hexdigest()
+        version = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{content_digest[:12]}"
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "version": version,
+            "created_at": time.time(),
+            "content_sha256": content_digest,
+            "embedding": embedding,
+            "vector_count": vector_count,
+            "chunk_count": chunk_count,
+            "quantization": index_info.get("quantization", "none"),
+            "rbac_fingerprint": config_fingerprint(),
+            "files": files,
+        }
+        (stage / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+        # Uncompressed: extraction is a plain copy, and most of the bytes are float vectors anyway
+        tar_path = out_dir / f"snapshot-{version}.tar"
+        tmp_path = tar_path.with_name(tar_path.name + ".tmp")
+        with tarfile.open(tmp_path, "w", format=tarfile.PAX_FORMAT) as tar:
+            tar.add(stage / MANIFEST, arcname=MANIFEST)  # first, so replicas read it without a full scan
+            for name in files:
+                tar.add(stage / name, arcname=name, recursive=False)
+        os.replace(tmp_path, tar_path)
+        return tar_path
+    finally:
+        shutil.rmtree(stage, ignore_errors=True)
+
+
+# --- Loading ---
+
+
+@dataclass
+class Snapshot:
+    path: Path  # extracted directory
+    manifest: Dict[str, Any]
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    """
+    Manifest of a snapshot .tar or extracted directory.
+    """
+    if path.is_dir():
+        manifest = json.loads((path / MANIFEST).read_text(encoding="utf-8"))
+    else:
+        with tarfile.open(path, "r:") as tar:
+            member = tar.extractfile(MANIFEST)
+            if member is None:
+                raise SnapshotError(f"{path} has no {MANIFEST}")
+            manifest = json.loads(member.read().decode("utf-8"))
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format in {path}: {manifest.get('format_version')}")
+    return manifest
+
+
+def verify_snapshot(directory: Path, manifest: Dict[str, Any], mode: str = "full") -> None:
+    """
+    Check every file against the manifest: "full" = sha256 and size, "size" = size only.
+    """
+    if mode == "none":
+        return
+    bad = []
+    for name, expected in manifest["files"].items():
+        path = directory / name
+        if not path.is_file() or path.stat().st_size != expected["size"]:
+            bad.append(name)
+        elif mode == "full" and _sha256(path) != expected["sha256"]:
+            bad.append(name)
+    if bad:
+        raise SnapshotError(f"Snapshot {manifest['version']} failed verification: {', '.join(bad[:5])}")
+
+
+def open_snapshot(
+    path: Path = Path(SNAPSHOT_PATH),
+    cache_dir: Path = SNAPSHOT_CACHE_DIR,
+    verify: str = SNAPSHOT_VERIFY,
+) -> Snapshot:
+    """
+    Extract (first start only) and verify a snapshot. Later starts, and the
+    other workers on the node, reuse the verified directory after a size check.
+    """
+    manifest = read_manifest(path)
+    directory = path if path.is_dir() else cache_dir / manifest["version"]
+
+    if not (directory / VERIFIED_MARKER).exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # One worker extracts and verifies, the others wait and then reuse the result
+        with ingest_lock(cache_dir / ".extract.lock"):
+            if not (directory / VERIFIED_MARKER).exists():
+                if not path.is_dir():
+                    tmp = Path(tempfile.mkdtemp(prefix=f".{manifest['version']}-", dir=cache_dir))
+                    try:
+                        with tarfile.open(path, "r:") as tar:
+                            tar.extractall(tmp, filter="data")
+                        verify_snapshot(tmp, manifest, verify)
+                    except BaseException:
+                        shutil.rmtree(tmp, ignore_errors=True)
+                        raise
+                    shutil.rmtree(directory, ignore_errors=True)  # partial leftovers
+                    os.replace(tmp, directory)
+                else:
+                    verify_snapshot(directory, manifest, verify)
+                (directory / VERIFIED_MARKER).write_text(manifest["version"], encoding="utf-8")
+
+    verify_snapshot(directory, manifest, "size")
+    return Snapshot(directory, manifest)
+
+
+def activate_snapshot(snapshot: Snapshot) -> Dict[str, float]:
+    """
+    Serve `snapshot`: mmap its index, load its model, and warm both up so the
+    first request does not pay for page faults, role masks or model init.
+    Returns the duration of each step in seconds.
+    """
+    from .embeddings import create_embedding_backend
+    from .flat_index import get_flat_collection
+    from .hr_stats import set_hr_stats_path
+    from .rbac import set_role_index_path
+    from .vectorstore import get_embedding_model, use_snapshot
+
+    timings: Dict[str, float] = {}
+    embedding = snapshot.manifest["embedding"]
+
+    t0 = time.perf_counter()
+    model = None
+    if EMBEDDING_BACKEND != "sidecar":
+        model_dir = snapshot.path / "model"
+        model = create_embedding_backend(
+            embedding["backend"],
+            quantized=embedding["quantized"],
+            model_dir=model_dir if model_dir.exists() else None,
+        )
+        if model.name != embedding["name"]:
+            raise SnapshotError(f"Snapshot model {embedding['name']} loaded as {model.name}")
+    use_snapshot(snapshot.path / "index", model)
+    set_role_index_path(snapshot.path / "rbac_index.npz")
+    set_hr_stats_path(snapshot.path / "hr_stats.json")
+    model = get_embedding_model()
+    if model.name != embedding["name"]:
+        # Sidecar serving a different model: query vectors would not match the index
+        raise SnapshotError(f"Embedding sidecar serves {model.name}, snapshot needs {embedding['name']}")
+    timings["model_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    collection = get_flat_collection(snapshot.path / "index")
+    for role in ROLE_TO_DEPARTMENTS:
+        collection.role_mask(role)
+    timings["index_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    q = model.encode(["warm-up query"])
+    collection.query(query_embeddings=q, n_results=1, allowed_role=next(iter(ROLE_TO_DEPARTMENTS)))
+    timings["warmup_s"] = time.perf_counter() - t0
+    return timings
+
+
+def load_snapshot(path: Optional[Path] = None) -> Snapshot:
+    """
+    Startup path used by main.lifespan when SNAPSHOT_PATH is set.
+    """
+    t0 = time.perf_counter()
+    snapshot = open_snapshot(path or Path(SNAPSHOT_PATH))
+    opened_s = time.perf_counter() - t0
+    timings = activate_snapshot(snapshot)
+    print(
+        f"Serving snapshot {snapshot.version} ({snapshot.manifest['vector_count']} vectors, "
+        f"{snapshot.manifest['embedding']['name']}): open {opened_s:.2f}s, model {timings['model_s']:.2f}s, "
+        f"index {timings['index_s']:.2f}s, warm-up {timings['warmup_s']:.2f}s",
+        flush=True,
+    )
+    return snapshot
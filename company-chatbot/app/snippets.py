@@ -0,0 +1,121 @@
+"""
+Query-centred snippets for search hits and RAG sources.
+
+Instead of the first N characters of a chunk, `extract_snippet` returns the
+window of up to `max_chars` characters that contains the most distinct query
+terms. With `highlight` (off by default; clients ask for it on /search), the
+terms in it are wrapped in ** (Markdown bold).
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Pattern
+
+# Words too common to anchor a snippet on
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its me my of on or our "
+    "show tell that the their there this to was we were what when where which who why will with you your".split()
+)
+
+_WORD_RE = re.compile(r"\w+")
+_HEADING_RE = re.compile(r"(?<!\S)#+(?=\s)")
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    Distinct lowercase terms of `query` worth highlighting: words of 3+
+    characters, or shorter ones with a digit ("Q3"), minus stopwords.
+    """
+    terms: List[str] = []
+    for word in _WORD_RE.findall(query.lower()):
+        if word in STOPWORDS or word in terms:
+            continue
+        if len(word) >= 3 or any(ch.isdigit() for ch in word):
+            terms.append(word)
+    return terms
+
+
+@dataclass(frozen=True)
+class QueryTerms:
+    """
+    Compiled once per query, reused for all of its hits.
+    """
+
+    # Term prefixes, case-sensitive and without \b: run on the lowercased text,
+    # word starts are checked per match (several times faster than re.I + \b)
+    scan: Pattern[str]
+    # Whole words starting with a term, case-insensitive: marks terms in the (short) snippet
+    mark: Pattern[str]
+
+
+def compile_query(query: str) -> Optional[QueryTerms]:
+    """
+    Patterns for the terms of `query` (a term also matches the rest of its
+    word, so "budget" also marks "budgets"); None if it has none.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return None
+    alternatives = "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+    return QueryTerms(
+        scan=re.compile(rf"(?:{alternatives})\w*"),
+        mark=re.compile(rf"\b(?:{alternatives})\w*", re.IGNORECASE),
+    )
+
+
+def _flatten(text: str) -> str:
+    # Markdown emphasis / heading markers would clash with the highlighting
+    text = text.replace("**", " ").replace("__", " ")
+    if "#" in text:
+        text = _HEADING_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+def extract_snippet(
+    text: str,
+    terms: Optional[QueryTerms],
+    max_chars: int = 240,
+    highlight: bool = False,
+) -> str:
+    start = 0
+    if terms is not None and len(text) > max_chars:
+        low = text.lower()
+        if len(low) == len(text):
+            matches = [m for m in terms.scan.finditer(low) if m.start() == 0 or not _is_word(low[m.start() - 1])]
+        else:  # lower() changed offsets (rare non-ASCII case folding)
+            matches = list(terms.mark.finditer(text))
+        if matches:
+            # Window start with the most distinct terms in the following max_chars (two pointers)
+            best, best_score = 0, (0, 0)
+            j = 0
+            for i, m in enumerate(matches):
+                j = max(j, i)
+                while j + 1 < len(matches) and matches[j + 1].end() <= m.start() + max_chars:
+                    j += 1
+                window = matches[i : j + 1]
+                score = (len({w.group().lower() for w in window}), len(window))
+                if score > best_score:
+                    best, best_score = i, score
+            # A little lead-in before the first term reads better than starting on it
+            first = matches[best].start()
+            start = max(0, first - max_chars // 6)
+            while start < first and not text[start].isspace():
+                start += 1
+
+    # Only the window is flattened; whitespace and markup shrink it, hence the margin
+    raw_end = start + 2 * max_chars
+    flat = _flatten(text[start:raw_end])
+    truncated = raw_end < len(text)
+    if len(flat) > max_chars:
+        space = flat.rfind(" ", 0, max_chars)
+        flat = flat[: space if space > 0 else max_chars]
+        truncated = True
+
+    if highlight and terms is not None:
+        flat = terms.mark.sub(lambda m: f"**{m.group()}**", flat)
+    return ("..." if start > 0 else "") + flat + ("..." if truncated else "")
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
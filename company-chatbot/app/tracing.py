@@ -0,0 +1,140 @@
+"""
+Request-level span timing for the auth / retrieval / RAG pipeline.
+
+    with span("search.encode"):
+        ...
+
+Every span feeds the `chatbot_stage_duration_seconds{stage=...}` histogram and,
+inside an HTTP request, the request's trace, which TracingMiddleware turns into
+a `Server-Timing` header (SERVER_TIMING_ENABLED) and a per-route latency histogram.
+
+With TRACING_ENABLED=false, span() returns a shared no-op context manager and
+the middleware is not installed, so the cost is one attribute check per span.
+"""
+from __future__ import annotations
+
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from .config import TRACING_ENABLED, SERVER_TIMING_ENABLED
+from .metrics import REGISTRY
+
+STAGE_DURATION = REGISTRY.histogram(
+    "chatbot_stage_duration_seconds",
+    "Duration of instrumented pipeline stages.",
+    ["stage"],
+)
+REQUEST_DURATION = REGISTRY.histogram(
+    "chatbot_request_duration_seconds",
+    "End-to-end HTTP request duration.",
+    ["method", "route", "status"],
+)
+
+_NULL_SPAN = nullcontext()
+
+
+class RequestTrace:
+    """
+    Spans recorded while serving one request. Mutated in place, so spans from
+    threadpool-run dependencies/endpoints (which see a copy of the context)
+    still land in the same object.
+    """
+
+    __slots__ = ("spans",)
+
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []
+
+    def totals_ms(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for name, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds * 1000
+        return totals
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms:.2f}" for name, ms in self.totals_ms().items())
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("chatbot_request_trace", default=None)
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self.start
+        STAGE_DURATION.observe(self.name, value=elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append((self.name, elapsed))
+
+
+def span(name: str):
+    """
+    Time a pipeline stage. No-op unless TRACING_ENABLED.
+    """
+    if not TRACING_ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task hop): opens a RequestTrace
+    per HTTP request, records the request histogram and optionally adds the
+    Server-Timing header.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if self.server_timing and trace.spans:
+                    total_ms = (time.perf_counter() - start) * 1000
+                    value = f"{trace.server_timing()}, total;dur={total_ms:.2f}"
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"server-timing", value.encode("latin-1"))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            route = scope.get("route")
+            # Route templates ("/conversations/{id}") keep label cardinality bounded
+            route_path = getattr(route, "path", None) or "unmatched"
+            REQUEST_DURATION.observe(
+                scope.get("method", ""),
+                route_path,
+                str(status["code"]),
+                value=time.perf_counter() - start,
+            )
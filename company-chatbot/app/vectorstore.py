@@ -1,34 +1,63 @@
+from __future__ import annotations
+
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any
 
 import json
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 
+from .changeset import ChangeSet, load_pending_changeset, mark_changeset_applied
+from .chunk_store import ChunkStore
 from .config import (
-    DATA_PROCESSED_DIR,
+    CHUNK_STORE_DIR,
+    CHUNKS_JSONL_PATH,
+    FLAT_INDEX_DIR,
     VECTOR_DB_DIR,
     VECTOR_COLLECTION_NAME,
+    VECTOR_BACKEND,
 )
+from .embedding_cache import EmbeddingCache, open_embedding_cache
+from .embeddings import EmbeddingBackend, create_embedding_backend
+from .rbac import RoleIndex, chunk_departments, department_bits
+
+# chromadb is heavy to import, so it is only loaded the first time a client is
+# actually requested (the embedding backends do the same for torch / onnxruntime).
+if TYPE_CHECKING:
+    import chromadb
 
 # Lazy singletons so we don't reload model / client repeatedly
-_embedding_model: SentenceTransformer | None = None
+_embedding_model: EmbeddingBackend | None = None
 _chroma_client: chromadb.api.ClientAPI | None = None
 _collection = None
+# Served flat index; app/snapshot.py points it into the active snapshot
+_flat_index_dir: Path = FLAT_INDEX_DIR
+
+
+def use_snapshot(index_dir: Path, model: EmbeddingBackend | None) -> None:
+    """
+    Serve the flat index in `index_dir` and, unless None, query with `model`
+    (the weights the snapshot's vectors were built with).
+    """
+    global _flat_index_dir, _embedding_model
+    _flat_index_dir = index_dir
+    if model is not None:
+        _embedding_model = model
 
 
-def get_embedding_model() -> SentenceTransformer:
+def get_embedding_model() -> EmbeddingBackend:
     global _embedding_model
     if _embedding_model is None:
-        # Small, fast, good-quality sentence transformer
-        _embedding_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        # Small, fast, good-quality sentence transformer (all-MiniLM-L6-v2),
+        # served by the backend selected with EMBEDDING_BACKEND (torch | onnx)
+        _embedding_model = create_embedding_backend()
     return _embedding_model
 
 
 def get_chroma_client() -> chromadb.api.ClientAPI:
     global _chroma_client
     if _chroma_client is None:
+        import chromadb
+        from chromadb.config import Settings
+
         _chroma_client = chromadb.PersistentClient(
             path=str(VECTOR_DB_DIR),
             settings=Settings(
@@ -40,6 +69,16 @@ def get_chroma_client() -> chromadb.api.ClientAPI:
 
 def get_collection():
     global _collection
+    if VECTOR_BACKEND == "flat":
+        from .flat_index import get_flat_collection
+
+        # Not cached here: get_flat_collection() reopens the index after a rebuild
+        return get_flat_collection(_flat_index_dir)
+    if VECTOR_BACKEND == "sharded":
+        from .shards import get_sharded_collection
+
+        return get_sharded_collection()
+
     if _collection is None:
         client = get_chroma_client()
         _collection = client.get_or_create_collection(
@@ -50,26 +89,270 @@ def get_collection():
 
 
 def load_chunks() -> List[Dict[str, Any]]:
-    chunks_path = DATA_PROCESSED_DIR / "document_chunks.jsonl"
+    """
+    Preprocessed chunks to index, read from the binary chunk store unless the
+    JSONL file is newer (or the store is missing, e.g. on a fresh clone).
+    Near-duplicates merged into a canonical chunk (app/dedupe.py) are skipped.
+    """
+    if ChunkStore.exists() and (
+        not CHUNKS_JSONL_PATH.exists()
+        or (CHUNK_STORE_DIR / "meta.json").stat().st_mtime >= CHUNKS_JSONL_PATH.stat().st_mtime
+    ):
+        return [c for c in ChunkStore() if "duplicate_of" not in c]
+
+    chunks_path = CHUNKS_JSONL_PATH
     chunks: List[Dict[str, Any]] = []
     with chunks_path.open("r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
-            chunks.append(json.loads(line))
+            chunk = json.loads(line)
+            if "duplicate_of" not in chunk:
+                chunks.append(chunk)
     return chunks
 
 
-def index_chunks(batch_size: int = 64) -> None:
+def chunk_metadata(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "source_file": chunk["source_file"],
+        "source_path": chunk["source_path"],
+        "department": chunk["department"],
+        "chunk_index": chunk["chunk_index"],
+        # store as comma-separated string to satisfy Chroma type rules
+        "allowed_roles": ",".join(chunk["allowed_roles"]),
+        # department bitmask used for RBAC pre-filtering (see app/rbac.py)
+        "dept_bits": department_bits(chunk_departments(chunk)),
+    }
+
+
+def encode_texts(model: EmbeddingBackend, texts: List[str], cache: EmbeddingCache | None = None):
+    """
+    Encode through the persistent embedding cache when one is given.
+    """
+    if cache is None:
+        return model.encode(texts)
+    return cache.encode(model, texts)
+
+
+def index_chunks_flat(
+    chunks: List[Dict[str, Any]],
+    model: EmbeddingBackend,
+    batch_size: int = 64,
+    cache: EmbeddingCache | None = None,
+    index_dir: Path = FLAT_INDEX_DIR,
+) -> None:
+    """
+    Encode all chunks and write them as a flat mmap'd index (VECTOR_BACKEND=flat).
+    """
+    import numpy as np
+
+    from .flat_index import write_flat_index
+
+    parts = []
+    for i in range(0, len(chunks), batch_size):
+        batch = chunks[i : i + batch_size]
+        parts.append(encode_texts(model, [c["text"] for c in batch], cache))
+        print(f"Encoded batch {i}–{i + len(batch) - 1}")
+
+    embeddings = np.concatenate(parts) if parts else np.zeros((0, model.dim), dtype=np.float32)
+    write_flat_index(
+        ids=[c["id"] for c in chunks],
+        embeddings=embeddings,
+        documents=[c["text"] for c in chunks],
+        metadatas=[chunk_metadata(c) for c in chunks],
+        index_dir=index_dir,
+    )
+    print(f"Flat index written ({len(chunks)} rows).")
+
+
+def index_chunks_sharded(
+    chunks: List[Dict[str, Any]],
+    model: EmbeddingBackend,
+    batch_size: int = 64,
+    cache: EmbeddingCache | None = None,
+    changes: ChangeSet | None = None,
+) -> None:
+    """
+    Partition chunks by id hash and write one flat index per shard
+    (VECTOR_BACKEND=sharded). With `changes`, only the shards owning a changed
+    id are rewritten, like the incremental flat index (only upserts encoded).
+    """
+    from .shards import partition, shard_dir, shard_of, write_shards_manifest
+
+    touched = None
+    if changes is not None:
+        touched = {shard_of(i) for i in [*changes.upserted, *changes.removed]}
+    for shard, shard_chunks in enumerate(partition(chunks)):
+        if touched is not None and shard not in touched:
+            print(f"Shard {shard}: unchanged")
+            continue
+        print(f"Shard {shard}: {len(shard_chunks)} chunks")
+        if changes is None:
+            index_chunks_flat(shard_chunks, model, batch_size, cache, index_dir=shard_dir(shard))
+        else:
+            _apply_changeset_flat(shard_chunks, changes, model, batch_size, cache, index_dir=shard_dir(shard))
+    write_shards_manifest()
+
+
+def index_chunks(batch_size: int = 64, incremental: bool = False) -> None:
     """
-    Load preprocessed chunks, generate embeddings, and index into Chroma.
+    Load preprocessed chunks, generate embeddings, and index into the
+    configured vector store (Chroma by default).
+
+    With `incremental=True` only the pending change set written by
+    preprocess_docs is applied (upserts / deletes by chunk id). It falls back
+    to a full rebuild when the change set asks for one or there is no index yet.
     """
-    from .config import VECTOR_COLLECTION_NAME  # if not already imported at top
+    changes = load_pending_changeset() if incremental else None
+    if incremental and changes is not None and changes.is_empty():
+        mark_changeset_applied()
+        print("Change set is empty, index is up to date.")
+        return
+    if incremental and changes is None and _index_exists():
+        print("No pending change set, index is up to date.")
+        return
+
     chunks = load_chunks()
     print(f"Loaded {len(chunks)} chunks from processed data")
 
     model = get_embedding_model()
+    cache = open_embedding_cache()
+    try:
+        if changes is not None and not changes.full_rebuild and _index_exists():
+            print(f"Applying change set: {changes.summary()}")
+            _apply_changeset(chunks, changes, model, batch_size, cache)
+        else:
+            _index_chunks(chunks, model, batch_size, cache)
+        # A full rebuild covers whatever was pending as well
+        mark_changeset_applied()
+    finally:
+        if cache is not None:
+            cache.evict()
+            print(cache.summary())
+            cache.close()
+
+
+def _index_exists() -> bool:
+    if VECTOR_BACKEND == "flat":
+        return (FLAT_INDEX_DIR / "columns.json").exists()
+    if VECTOR_BACKEND == "sharded":
+        from .shards import shards_index_exists
+
+        return shards_index_exists()
+    try:
+        get_chroma_client().get_collection(VECTOR_COLLECTION_NAME)
+    except Exception:
+        return False
+    return True
+
+
+def _apply_changeset(
+    chunks: List[Dict[str, Any]],
+    changes: ChangeSet,
+    model: EmbeddingBackend,
+    batch_size: int,
+    cache: EmbeddingCache | None,
+) -> None:
+    if VECTOR_BACKEND == "flat":
+        _apply_changeset_flat(chunks, changes, model, batch_size, cache)
+        RoleIndex.from_chunks(chunks).save()
+        return
+    if VECTOR_BACKEND == "sharded":
+        index_chunks_sharded(chunks, model, batch_size, cache, changes=changes)
+        RoleIndex.from_chunks(chunks).save()
+        return
+
+    collection = get_chroma_client().get_collection(VECTOR_COLLECTION_NAME)
+
+    for i in range(0, len(changes.removed), batch_size):
+        collection.delete(ids=changes.removed[i : i + batch_size])
+    print(f"Removed {len(changes.removed)} chunks")
+
+    by_id = {c["id"]: c for c in chunks}
+    # Ids upserted by an earlier run and removed since are no longer in the store
+    upserts = [by_id[i] for i in changes.upserted if i in by_id]
+    for i in range(0, len(upserts), batch_size):
+        batch = upserts[i : i + batch_size]
+        texts = [c["text"] for c in batch]
+        collection.upsert(
+            ids=[c["id"] for c in batch],
+            embeddings=encode_texts(model, texts, cache).tolist(),
+            documents=texts,
+            metadatas=[chunk_metadata(c) for c in batch],
+        )
+        print(f"Upserted batch {i}–{i + len(batch) - 1}")
+
+    RoleIndex.from_chunks(chunks).save()
+    print("Incremental indexing complete.")
+
+
+def _apply_changeset_flat(
+    chunks: List[Dict[str, Any]],
+    changes: ChangeSet,
+    model: EmbeddingBackend,
+    batch_size: int,
+    cache: EmbeddingCache | None,
+    index_dir: Path = FLAT_INDEX_DIR,
+) -> None:
+    """
+    The flat index is immutable files, so it is rewritten, but vectors of
+    chunks outside the change set are copied from the current index and only
+    the upserted chunks are encoded.
+    """
+    import numpy as np
+
+    from .flat_index import FlatCollection, write_flat_index
+
+    current = FlatCollection(index_dir)
+    if current.dim != model.dim:
+        print(f"Index dim {current.dim} != model dim {model.dim}, rebuilding.")
+        index_chunks_flat(chunks, model, batch_size, cache, index_dir=index_dir)
+        return
+
+    positions = {current.ids[i]: i for i in range(current.count())}
+    changed = set(changes.upserted)
+    embeddings = np.empty((len(chunks), model.dim), dtype=np.float32)
+    to_encode = []
+    for row, c in enumerate(chunks):
+        pos = positions.get(c["id"])
+        if pos is None or c["id"] in changed:
+            to_encode.append(row)
+        else:
+            embeddings[row] = current.embeddings[pos]
+
+    for i in range(0, len(to_encode), batch_size):
+        rows = to_encode[i : i + batch_size]
+        embeddings[rows] = encode_texts(model, [chunks[r]["text"] for r in rows], cache)
+    print(f"Reused {len(chunks) - len(to_encode)} vectors, encoded {len(to_encode)}")
+    # Drop the mmaps before the index directory is swapped out underneath them
+    del current
+
+    write_flat_index(
+        ids=[c["id"] for c in chunks],
+        embeddings=embeddings,
+        documents=[c["text"] for c in chunks],
+        metadatas=[chunk_metadata(c) for c in chunks],
+        index_dir=index_dir,
+    )
+    print(f"Flat index written ({len(chunks)} rows).")
+
+
+def _index_chunks(
+    chunks: List[Dict[str, Any]],
+    model: EmbeddingBackend,
+    batch_size: int,
+    cache: EmbeddingCache | None,
+) -> None:
+    if VECTOR_BACKEND == "flat":
+        index_chunks_flat(chunks, model, batch_size, cache)
+        RoleIndex.from_chunks(chunks).save()
+        return
+    if VECTOR_BACKEND == "sharded":
+        index_chunks_sharded(chunks, model, batch_size, cache)
+        RoleIndex.from_chunks(chunks).save()
+        return
+
     client = get_chroma_client()
 
     # --- Safely recreate collection instead of delete(where={}) ---
@@ -92,20 +375,9 @@ def index_chunks(batch_size: int = 64) -> None:
 
         ids = [c["id"] for c in batch]
         texts = [c["text"] for c in batch]
-        metadatas = [
-            {
-                "source_file": c["source_file"],
-                "source_path": c["source_path"],
-                "department": c["department"],
-                "chunk_index": c["chunk_index"],
-                # store as comma-separated string to satisfy Chroma type rules
-                "allowed_roles": ",".join(c["allowed_roles"]),
-            }
-            for c in batch
-        ]
-
+        metadatas = [chunk_metadata(c) for c in batch]
 
-        embeddings = model.encode(texts).tolist()
+        embeddings = encode_texts(model, texts, cache).tolist()
 
         collection.add(
             ids=ids,
@@ -116,4 +388,7 @@ def index_chunks(batch_size: int = 64) -> None:
 
         print(f"Indexed batch {i}–{i + len(batch) - 1}")
 
+    # Per-role visibility bitmaps over exactly the chunks just indexed; written
+    # last so search never pre-filters on dept_bits a partial index lacks
+    RoleIndex.from_chunks(chunks).save()
     print("Indexing complete.")
@@ -0,0 +1,133 @@
+"""
+Length-prefixed frames for the app's internal socket services (the embedding
+sidecar in app/embedding_server.py, the index shards in app/shard_server.py).
+
+Wire format, identical in both directions:
+
+    <uint32 header length> <uint32 payload length> <JSON header> <payload>
+
+The header carries the request / response fields, the payload raw arrays
+(little-endian float32), so vectors never go through JSON or pickle.
+
+Addresses are "unix:/path/to.sock", "tcp:host:port", or a bare socket path.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+_FRAME = struct.Struct("<II")
+
+
+def pack_frame(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    head = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return _FRAME.pack(len(head), len(payload)) + head + payload
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytearray:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        chunk = sock.recv_into(view[got:])
+        if not chunk:
+            raise ConnectionError("peer closed the connection")
+        got += chunk
+    return buf
+
+
+def recv_frame(sock: socket.socket) -> Tuple[Dict[str, Any], bytearray]:
+    """
+    Blocking read of one frame (client side).
+    """
+    head_len, payload_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header = json.loads(_recv_exact(sock, head_len).decode("utf-8"))
+    return header, _recv_exact(sock, payload_len)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    head_len, payload_len = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    header = json.loads((await reader.readexactly(head_len)).decode("utf-8"))
+    payload = await reader.readexactly(payload_len) if payload_len else b""
+    return header, payload
+
+
+def parse_address(address: str) -> Tuple[str, Any]:
+    """
+    ("unix", path) or ("tcp", (host, port)).
+    """
+    if address.startswith("tcp:"):
+        host, _, port = address[len("tcp:") :].rpartition(":")
+        return "tcp", (host or "127.0.0.1", int(port))
+    return "unix", address[len("unix:") :] if address.startswith("unix:") else address
+
+
+def connect(address: str, timeout_s: float) -> socket.socket:
+    kind, target = parse_address(address)
+    if kind == "unix":
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix sockets are not supported on this platform")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.settimeout(timeout_s)
+    try:
+        sock.connect(target)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+async def start_server(
+    handler: Callable[[asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]],
+    address: str,
+) -> asyncio.AbstractServer:
+    """
+    asyncio server on a Unix socket (stale socket file replaced, mode 660) or TCP port.
+    """
+    kind, target = parse_address(address)
+    if kind == "tcp":
+        return await asyncio.start_server(handler, host=target[0], port=target[1])
+
+    path = Path(target)
+    if path.exists():
+        path.unlink()  # stale socket from a previous run
+    server = await asyncio.start_unix_server(handler, path=str(path))
+    os.chmod(path, 0o660)
+    return server
+
+
+async def serve_until_stopped(
+    server: asyncio.AbstractServer,
+    connections: Dict[asyncio.StreamWriter, "asyncio.Task[None]"],
+) -> None:
+    """
+    Serve until SIGINT / SIGTERM (Ctrl+C or a process manager), then close the
+    open client connections so their handlers end (EOF) before the loop shuts down.
+    `connections` is maintained by the server's connection handler.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with server:
+        await stop.wait()
+        handlers = list(connections.values())
+        for writer in list(connections):
+            writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+
+def remove_socket_file(address: str) -> None:
+    kind, target = parse_address(address)
+    if kind == "unix" and os.path.exists(target):
+        os.unlink(target)
@@ -1,5 +1,7 @@
+import httpx
 import streamlit as st
-import requests
+
+from chatbot_client import ChatbotAPIError, ChatbotClient
 
 BACKEND_URL = "http://127.0.0.1:8000"
 
@@ -7,38 +9,31 @@ BACKEND_URL = "http://127.0.0.1:8000"
 # ---------------------------
 # Auth helpers
 # ---------------------------
-def get_auth_headers():
-    token = st.session_state.get("access_token")
-    if not token:
-        return {}
-    return {"Authorization": f"Bearer {token}"}
+def get_client() -> ChatbotClient:
+    # One client (connection pool + token) per browser session, kept across reruns
+    client = st.session_state.get("client")
+    if client is None:
+        client = ChatbotClient(BACKEND_URL)
+        st.session_state["client"] = client
+    return client
 
 
 # ---------------------------
 # Login
 # ---------------------------
 def login(username: str, password: str) -> bool:
-    url = f"{BACKEND_URL}/auth/login"
-    data = {
-        "username": username,
-        "password": password,
-    }
-
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    resp = requests.post(url, data=data, headers=headers)
-
-    if resp.status_code != 200:
+    client = get_client()
+    try:
+        # Username and role come from the token, no /auth/me round trip
+        st.session_state["current_user"] = client.login(username, password)
+    except ChatbotAPIError:
         st.error("Login failed: incorrect username or password.")
         return False
+    except httpx.HTTPError as exc:
+        st.error(f"Login failed: backend unreachable ({exc}).")
+        return False
 
-    token_data = resp.json()
-    st.session_state["access_token"] = token_data["access_token"]
-    st.session_state["token_type"] = token_data["token_type"]
-
-    me_resp = requests.get(f"{BACKEND_URL}/auth/me", headers=get_auth_headers())
-    if me_resp.status_code == 200:
-        st.session_state["current_user"] = me_resp.json()
-
+    st.session_state["access_token"] = client.token
     return True
 
 
@@ -46,23 +41,18 @@ def login(username: str, password: str) -> bool:
 # Register
 # ---------------------------
 def register(username: str, password: str, role: str) -> bool:
-    url = f"{BACKEND_URL}/auth/register"
-    body = {
-        "username": username,
-        "password": password,
-        "role": role,
-    }
-
-    headers = {"Content-Type": "application/json"}
-    resp = requests.post(url, json=body, headers=headers)
-
-    if resp.status_code == 200:
-        st.success("Registration successful! You can now log in.")
-        return True
-    else:
-        st.error(f"Registration failed: {resp.text}")
+    try:
+        get_client().register(username, password, role)
+    except ChatbotAPIError as exc:
+        st.error(f"Registration failed: {exc.detail}")
+        return False
+    except httpx.HTTPError as exc:
+        st.error(f"Registration failed: backend unreachable ({exc}).")
         return False
 
+    st.success("Registration successful! You can now log in.")
+    return True
+
 
 # ---------------------------
 # UI: Register
@@ -112,22 +102,37 @@ def render_login():
 # ---------------------------
 # Chat
 # ---------------------------
-def call_rag(query: str, top_k: int = 4):
-    url = f"{BACKEND_URL}/rag"
-    body = {"query": query, "top_k": top_k}
-    headers = get_auth_headers()
-    headers["Content-Type"] = "application/json"
-
-    resp = requests.post(url, json=body, headers=headers)
-    if resp.status_code != 200:
-        st.error(resp.text)
+def call_chat(query: str, top_k: int = 4):
+    # The server keeps the conversation (earlier turns + retrieved chunks) under chat_session_id
+    client = get_client()
+    session_id = st.session_state.get("chat_session_id")
+    try:
+        try:
+            data = client.chat(query, session_id=session_id, top_k=top_k)
+        except ChatbotAPIError as exc:
+            if exc.status_code != 404 or not session_id:
+                raise
+            # Session expired (or served by another worker): start a new one
+            data = client.chat(query, top_k=top_k)
+    except (ChatbotAPIError, httpx.HTTPError) as exc:
+        st.error(str(exc))
         return None
 
-    return resp.json()
+    st.session_state["chat_session_id"] = data["session_id"]
+    return data
 
 
 def logout():
-    for key in ["access_token", "token_type", "current_user", "chat_history"]:
+    client = st.session_state.get("client")
+    session_id = st.session_state.get("chat_session_id")
+    if client is not None:
+        if session_id:
+            try:
+                client.end_chat(session_id)
+            except (ChatbotAPIError, httpx.HTTPError):
+                pass  # it expires on the server anyway
+        client.close()
+    for key in ["client", "access_token", "current_user", "chat_history", "chat_session_id"]:
         st.session_state.pop(key, None)
 
 
@@ -154,7 +159,7 @@ def render_chat():
 
     if submitted and query.strip():
         with st.spinner("Thinking..."):
-            rag_response = call_rag(query)
+            rag_response = call_chat(query)
     if rag_response:
         # Store both user query and bot answer
         st.session_state["chat_history"].append({
@@ -0,0 +1,499 @@
+"""
+Python client for the chatbot API, sync (ChatbotClient) and async
+(AsyncChatbotClient), used by the Streamlit frontend.
+
+    from chatbot_client import ChatbotClient           # next to frontend/app.py
+    from frontend.chatbot_client import ChatbotClient  # from the project root
+
+    with ChatbotClient("http://127.0.0.1:8000", "alice", "secret") as client:
+        client.me()                                   # from the token, no /auth/me call
+        client.search("travel policy", mode="snippet")
+        client.search_batch(["Q3 revenue", "Q4 revenue"], fields=["id", "score"])
+        for event in client.rag_stream("What was the Q3 marketing budget?"):
+            ...                                       # "sources" first, then "answer"
+        reply = client.chat("What is the leave policy?")
+        client.chat("and for interns?", session_id=reply["session_id"])
+
+* One httpx connection pool per client, with keep-alive: a request reuses an
+  open connection instead of a new TCP (and TLS) handshake each time.
+* The bearer token is cached until CLIENT_TOKEN_REFRESH_MARGIN_S before its
+  `exp`. The API has no refresh endpoint, so renewing means logging in again
+  with the stored credentials; a 401 does the same once and retries.
+* Connection errors, timeouts and 429/502/504 answers, and 503 overload
+  refusals (those with Retry-After) are retried with jittered exponential
+  backoff, waiting at least the Retry-After the server sent. A 503 without it
+  means the LLM is unavailable after the server's own retries, and is raised. POST /chat changes the session, so it is only retried when the
+  request cannot have reached the server (connect errors, 429/503 refusals).
+
+Only httpx and the standard library are needed. It lives in frontend/
+rather than app/ because `streamlit run frontend/app.py` puts frontend/ first
+on sys.path, where `app` is the Streamlit script, and because clients should
+not need the server's dependencies.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=5.0)  # /rag and /chat wait on the LLM
+DEFAULT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+CLIENT_TOKEN_REFRESH_MARGIN_S = 60.0
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Answers that mean the request was turned away before doing anything
+REFUSED_STATUSES = frozenset({429, 503})
+
+
+class ChatbotAPIError(RuntimeError):
+    """
+    Non-2xx answer from the API (after retries).
+    """
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _error(response: httpx.Response) -> ChatbotAPIError:
+    try:
+        detail = response.json().get("detail", response.text)
+    except ValueError:
+        detail = response.text
+    return ChatbotAPIError(response.status_code, detail)
+
+
+def token_claims(token: str) -> Dict[str, Any]:
+    """
+    Claims of a JWT, read without verifying the signature (the server does that).
+    """
+    try:
+        payload = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (IndexError, ValueError):
+        return {}
+
+
+def _projection(options: Dict[str, Any]) -> Dict[str, Any]:
+    # Unset options are left to the server defaults
+    return {k: v for k, v in options.items() if v is not None}
+
+
+class _ClientBase:
+    def __init__(
+        self,
+        base_url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        *,
+        token: Optional[str] = None,
+        max_retries: int = 3,
+        backoff_s: float = 0.25,
+        max_backoff_s: float = 8.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self._password = password
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self._token: Optional[str] = None
+        self._claims: Dict[str, Any] = {}
+        if token:
+            self._set_token(token)
+
+    # --- token ---
+
+    def _set_token(self, token: str) -> None:
+        self._token = token
+        self._claims = token_claims(token)
+        self.username = self._claims.get("sub", self.username)
+
+    @property
+    def token(self) -> Optional[str]:
+        return self._token
+
+    @property
+    def role(self) -> Optional[str]:
+        # None until the first login (explicit, or on the first call)
+        return self._claims.get("role")
+
+    def _token_fresh(self) -> bool:
+        if not self._token:
+            return False
+        exp = self._claims.get("exp")
+        return exp is None or time.time() < exp - CLIENT_TOKEN_REFRESH_MARGIN_S
+
+    def _can_login(self) -> bool:
+        return bool(self.username and self._password)
+
+    def _user(self) -> Dict[str, Any]:
+        return {"username": self.username, "role": self.role}
+
+    # --- retries ---
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        delay = min(self.max_backoff_s, self.backoff_s * 2**attempt) * random.uniform(0.5, 1.0)
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get("Retry-After", 0)))
+            except ValueError:
+                pass
+        return delay
+
+    def _should_retry(self, attempt: int, response: httpx.Response, idempotent: bool) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if response.status_code == 503 and "Retry-After" not in response.headers:
+            return False  # the LLM is down and the server already retried it; not an overload refusal
+        return response.status_code in (RETRY_STATUSES if idempotent else REFUSED_STATUSES)
+
+    def _should_retry_error(self, attempt: int, exc: httpx.TransportError, idempotent: bool) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        return idempotent or isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+    # --- request bodies ---
+
+    @staticmethod
+    def _search_body(query: str, top_k: int, options: Dict[str, Any]) -> Dict[str, Any]:
+        return {"query": query, "top_k": top_k, **_projection(options)}
+
+    @staticmethod
+    def _rag_body(query: str, top_k: int, rerank: Optional[bool], diversify: Optional[bool]) -> Dict[str, Any]:
+        return {"query": query, "top_k": top_k, **_projection({"rerank": rerank, "diversify": diversify})}
+
+
+class ChatbotClient(_ClientBase):
+    """
+    Blocking client; safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        *,
+        token: Optional[str] = None,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        max_retries: int = 3,
+        backoff_s: float = 0.25,
+        max_backoff_s: float = 8.0,
+    ):
+        super().__init__(
+            base_url, username, password,
+            token=token, max_retries=max_retries, backoff_s=backoff_s, max_backoff_s=max_backoff_s,
+        )
+        self._http = httpx.Client(base_url=self.base_url, timeout=timeout, limits=limits)
+        self._login_lock = threading.Lock()
+
+    def __enter__(self) -> "ChatbotClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._http.close()
+
+    # --- auth ---
+
+    def login(self, username: Optional[str] = None, password: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get a token (and remember the credentials for renewing it).
+        Raises ChatbotAPIError(401) for wrong credentials.
+        """
+        if username is not None:
+            self.username, self._password = username, password
+        response = self._send("POST", "/auth/login", data={"username": self.username, "password": self._password})
+        if response.status_code != 200:
+            raise _error(response)
+        self._set_token(response.json()["access_token"])
+        return self._user()
+
+    def me(self) -> Dict[str, Any]:
+        """
+        The user (username, role) as in the token; logs in if needed but
+        never calls /auth/me.
+        """
+        self._auth_headers()
+        return self._user()
+
+    def register(self, username: str, password: str, role: str) -> Dict[str, Any]:
+        return self._json("POST", "/auth/register", auth=False, json={"username": username, "password": password, "role": role})
+
+    def _auth_headers(self, renew: bool = False) -> Dict[str, str]:
+        if renew or not self._token_fresh():
+            if self._can_login():
+                stale = self._token
+                with self._login_lock:
+                    if self._token == stale:  # another thread may have renewed it meanwhile
+                        self.login()
+        return {"Authorization": f"Bearer {self._token}"} if self._token else {}
+
+    # --- transport ---
+
+    def _send(self, method: str, path: str, *, auth: bool = False, idempotent: bool = True, **kwargs) -> httpx.Response:
+        renewed = False
+        attempt = 0
+        while True:
+            headers = self._auth_headers() if auth else {}
+            try:
+                response = self._http.request(method, path, headers=headers, **kwargs)
+            except httpx.TransportError as exc:
+                if not self._should_retry_error(attempt, exc, idempotent):
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                attempt += 1
+                continue
+            if response.status_code == 401 and auth and not renewed and self._can_login():
+                self._auth_headers(renew=True)
+                renewed = True
+                continue
+            if self._should_retry(attempt, response, idempotent):
+                time.sleep(self._retry_delay(attempt, response))
+                attempt += 1
+                continue
+            return response
+
+    def _json(self, method: str, path: str, *, auth: bool = True, idempotent: bool = True, **kwargs) -> Any:
+        response = self._send(method, path, auth=auth, idempotent=idempotent, **kwargs)
+        if response.status_code >= 400:
+            raise _error(response)
+        return response.json() if response.content else None
+
+    # --- API ---
+
+    def search(self, query: str, top_k: int = 5, **options) -> List[Dict[str, Any]]:
+        """
+        Hits for `query`. `options`: rerank, diversify and the projection
+        (mode, fields, snippet_chars, highlight).
+        """
+        return self._json("POST", "/search", json=self._search_body(query, top_k, options))["hits"]
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 5, **options) -> List[List[Dict[str, Any]]]:
+        """
+        Hits per query, in order, from one request.
+        """
+        body = {"queries": list(queries), "top_k": top_k, **_projection(options)}
+        return [r["hits"] for r in self._json("POST", "/search/batch", json=body)["results"]]
+
+    def rag(self, query: str, top_k: int = 4, rerank: Optional[bool] = None, diversify: Optional[bool] = None) -> Dict[str, Any]:
+        return self._json("POST", "/rag", json=self._rag_body(query, top_k, rerank, diversify))
+
+    def rag_stream(
+        self, query: str, top_k: int = 4, rerank: Optional[bool] = None, diversify: Optional[bool] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Events of POST /rag/stream as they arrive. Retries happen only before
+        the first event; an "error" event is yielded as is.
+        """
+        body = self._rag_body(query, top_k, rerank, diversify)
+        renewed = False
+        attempt = 0
+        while True:
+            request = self._http.build_request("POST", "/rag/stream", json=body, headers=self._auth_headers())
+            try:
+                response = self._http.send(request, stream=True)
+            except httpx.TransportError as exc:
+                if not self._should_retry_error(attempt, exc, True):
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                attempt += 1
+                continue
+            try:
+                if response.status_code == 401 and not renewed and self._can_login():
+                    self._auth_headers(renew=True)
+                    renewed = True
+                    continue
+                if self._should_retry(attempt, response, True):
+                    time.sleep(self._retry_delay(attempt, response))
+                    attempt += 1
+                    continue
+                if response.status_code >= 400:
+                    response.read()
+                    raise _error(response)
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+                return
+            finally:
+                response.close()
+
+    def chat(self, query: str, session_id: Optional[str] = None, top_k: int = 4, **options) -> Dict[str, Any]:
+        """
+        One conversation turn; pass the returned session_id with the next one.
+        An unknown or expired session is ChatbotAPIError(404).
+        """
+        body = {"query": query, "session_id": session_id, "top_k": top_k, **_projection(options)}
+        return self._json("POST", "/chat", idempotent=False, json=body)
+
+    def end_chat(self, session_id: str) -> None:
+        response = self._send("DELETE", f"/chat/{session_id}", auth=True)
+        if response.status_code >= 400 and response.status_code != 404:
+            raise _error(response)
+
+
+class AsyncChatbotClient(_ClientBase):
+    """
+    asyncio counterpart of ChatbotClient, with the same methods as coroutines
+    (rag_stream is an async iterator).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        *,
+        token: Optional[str] = None,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        max_retries: int = 3,
+        backoff_s: float = 0.25,
+        max_backoff_s: float = 8.0,
+    ):
+        super().__init__(
+            base_url, username, password,
+            token=token, max_retries=max_retries, backoff_s=backoff_s, max_backoff_s=max_backoff_s,
+        )
+        self._http = httpx.AsyncClient(base_url=self.base_url, timeout=timeout, limits=limits)
+        self._login_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncChatbotClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+    # --- auth ---
+
+    async def login(self, username: Optional[str] = None, password: Optional[str] = None) -> Dict[str, Any]:
+        if username is not None:
+            self.username, self._password = username, password
+        response = await self._send("POST", "/auth/login", data={"username": self.username, "password": self._password})
+        if response.status_code != 200:
+            raise _error(response)
+        self._set_token(response.json()["access_token"])
+        return self._user()
+
+    async def me(self) -> Dict[str, Any]:
+        await self._auth_headers()
+        return self._user()
+
+    async def register(self, username: str, password: str, role: str) -> Dict[str, Any]:
+        return await self._json(
+            "POST", "/auth/register", auth=False, json={"username": username, "password": password, "role": role}
+        )
+
+    async def _auth_headers(self, renew: bool = False) -> Dict[str, str]:
+        if renew or not self._token_fresh():
+            if self._can_login():
+                stale = self._token
+                async with self._login_lock:
+                    if self._token == stale:  # a concurrent call may have renewed it meanwhile
+                        await self.login()
+        return {"Authorization": f"Bearer {self._token}"} if self._token else {}
+
+    # --- transport ---
+
+    async def _send(
+        self, method: str, path: str, *, auth: bool = False, idempotent: bool = True, **kwargs
+    ) -> httpx.Response:
+        renewed = False
+        attempt = 0
+        while True:
+            headers = await self._auth_headers() if auth else {}
+            try:
+                response = await self._http.request(method, path, headers=headers, **kwargs)
+            except httpx.TransportError as exc:
+                if not self._should_retry_error(attempt, exc, idempotent):
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt))
+                attempt += 1
+                continue
+            if response.status_code == 401 and auth and not renewed and self._can_login():
+                await self._auth_headers(renew=True)
+                renewed = True
+                continue
+            if self._should_retry(attempt, response, idempotent):
+                await asyncio.sleep(self._retry_delay(attempt, response))
+                attempt += 1
+                continue
+            return response
+
+    async def _json(self, method: str, path: str, *, auth: bool = True, idempotent: bool = True, **kwargs) -> Any:
+        response = await self._send(method, path, auth=auth, idempotent=idempotent, **kwargs)
+        if response.status_code >= 400:
+            raise _error(response)
+        return response.json() if response.content else None
+
+    # --- API ---
+
+    async def search(self, query: str, top_k: int = 5, **options) -> List[Dict[str, Any]]:
+        return (await self._json("POST", "/search", json=self._search_body(query, top_k, options)))["hits"]
+
+    async def search_batch(self, queries: Sequence[str], top_k: int = 5, **options) -> List[List[Dict[str, Any]]]:
+        body = {"queries": list(queries), "top_k": top_k, **_projection(options)}
+        return [r["hits"] for r in (await self._json("POST", "/search/batch", json=body))["results"]]
+
+    async def rag(
+        self, query: str, top_k: int = 4, rerank: Optional[bool] = None, diversify: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        return await self._json("POST", "/rag", json=self._rag_body(query, top_k, rerank, diversify))
+
+    async def rag_stream(
+        self, query: str, top_k: int = 4, rerank: Optional[bool] = None, diversify: Optional[bool] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        body = self._rag_body(query, top_k, rerank, diversify)
+        renewed = False
+        attempt = 0
+        while True:
+            request = self._http.build_request("POST", "/rag/stream", json=body, headers=await self._auth_headers())
+            try:
+                response = await self._http.send(request, stream=True)
+            except httpx.TransportError as exc:
+                if not self._should_retry_error(attempt, exc, True):
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt))
+                attempt += 1
+                continue
+            try:
+                if response.status_code == 401 and not renewed and self._can_login():
+                    await self._auth_headers(renew=True)
+                    renewed = True
+                    continue
+                if self._should_retry(attempt, response, True):
+                    await asyncio.sleep(self._retry_delay(attempt, response))
+                    attempt += 1
+                    continue
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise _error(response)
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+                return
+            finally:
+                await response.aclose()
+
+    async def chat(self, query: str, session_id: Optional[str] = None, top_k: int = 4, **options) -> Dict[str, Any]:
+        body = {"query": query, "session_id": session_id, "top_k": top_k, **_projection(options)}
+        return await self._json("POST", "/chat", idempotent=False, json=body)
+
+    async def end_chat(self, session_id: str) -> None:
+        response = await self._send("DELETE", f"/chat/{session_id}", auth=True)
+        if response.status_code >= 400 and response.status_code != 404:
+            raise _error(response)
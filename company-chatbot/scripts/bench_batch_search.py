@@ -0,0 +1,48 @@
+"""
+Per-query throughput of semantic_search (one call per query) vs.
+semantic_search_batch (one batched encode + one multi-vector query).
+
+Usage:
+    python -m scripts.bench_batch_search --batch-size 32 --rounds 5
+"""
+import argparse
+import time
+
+from app.search import semantic_search, semantic_search_batch
+from scripts.test_search import TEST_QUERIES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--role", default="c_level")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = [q for q, _ in TEST_QUERIES]
+    queries = (texts * (args.batch_size // len(texts) + 1))[: args.batch_size]
+
+    # Warm up model + index so load time is not measured
+    semantic_search_batch(queries[:2], args.role, args.top_k)
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for q in queries:
+            semantic_search(q, args.role, args.top_k)
+    sequential_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        semantic_search_batch(queries, args.role, args.top_k)
+    batch_s = time.perf_counter() - t0
+
+    n = args.rounds * len(queries)
+    print(f"queries:     {n} (batch size {len(queries)}, role {args.role})")
+    print(f"sequential:  {n / sequential_s:8.1f} queries/s")
+    print(f"batched:     {n / batch_s:8.1f} queries/s")
+    print(f"speed-up:    {sequential_s / batch_s:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Scripted multi-turn conversations through stateless /rag calls vs. chat
+sessions (app/sessions.py), with a local LLM stand-in that records prompts.
+
+Per turn it reports the vector searches run, the prompt size, and how much of
+each prompt repeats the start of the conversation's previous prompt (what a
+provider-side prompt cache can reuse).
+
+Usage:
+    python -m scripts.bench_chat_sessions
+    python -m scripts.bench_chat_sessions --answer-chars 800 --top-k 4
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List, Tuple
+
+import app.rag as rag
+from app.sessions import ChatSession
+
+# (role, questions) per conversation; follow-ups lean on the previous turns
+CONVERSATIONS: List[Tuple[str, List[str]]] = [
+    ("marketing", [
+        "What was the marketing budget in Q2 2024?",
+        "and for Q3?",
+        "Which campaigns drove the most conversions in Q3 2024?",
+        "and in Q4?",
+        "What were the main risks called out?",
+    ]),
+    ("employee", [
+        "What is the leave policy for employees?",
+        "How many days of sick leave?",
+        "Can unused leave be carried forward?",
+        "What about maternity leave?",
+    ]),
+    ("finance", [
+        "Summarize the 2024 quarterly financial performance.",
+        "What drove the change in Q3?",
+        "and the vendor costs?",
+        "How did cash flow develop over the year?",
+    ]),
+]
+
+
+class RecordingLLM:
+    prompts: List[str] = []
+    answer_chars = 400
+
+    async def generate(self, prompt: str) -> str:
+        RecordingLLM.prompts.append(prompt)
+        return ("Based on SOURCE 1, " + "the figures are as reported. " * 40)[: RecordingLLM.answer_chars]
+
+
+def count_searches() -> Dict[str, int]:
+    counter = {"n": 0}
+    search = rag.semantic_search
+
+    def counting(*args, **kwargs):
+        counter["n"] += 1
+        return search(*args, **kwargs)
+
+    rag.semantic_search = counting
+    return counter
+
+
+async def run(mode: str, top_k: int) -> Dict[str, float]:
+    searches = count_searches()
+    turns = prompt_chars = shared_chars = 0
+    elapsed = 0.0
+    for role, questions in CONVERSATIONS:
+        session = ChatSession(id=f"bench-{role}", username="bench", role=role)
+        previous = ""
+        for question in questions:
+            t0 = time.perf_counter()
+            if mode == "session":
+                await rag.generate_chat_answer(session, question, top_k=top_k)
+            else:
+                await rag.generate_rag_answer(question, role, top_k=top_k)
+            elapsed += time.perf_counter() - t0
+            prompt = RecordingLLM.prompts[-1]
+            turns += 1
+            prompt_chars += len(prompt)
+            shared_chars += len(os.path.commonprefix([previous, prompt]))
+            previous = prompt
+    return {
+        "turns": turns,
+        "searches": searches["n"],
+        "prompt_chars": prompt_chars / turns,
+        "cacheable_chars": shared_chars / turns,
+        "retrieval_ms": elapsed / turns * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--answer-chars", type=int, default=400, help="Length of the stand-in LLM answers")
+    args = parser.parse_args()
+
+    RecordingLLM.answer_chars = args.answer_chars
+    rag.LLMClient = RecordingLLM
+    search = rag.semantic_search
+    results = {}
+    for mode in ("stateless", "session"):
+        rag.semantic_search = search
+        asyncio.run(run(mode, args.top_k))  # warm-up: model, index, role masks
+        rag.semantic_search = search
+        results[mode] = asyncio.run(run(mode, args.top_k))
+
+    print("=" * 80)
+    print(f"{'mode':<10} {'turns':>6} {'searches':>9} {'prompt chars':>13} {'cacheable':>10} {'uncached':>9} {'ms/turn':>8}")
+    print("-" * 80)
+    for mode, r in results.items():
+        print(
+            f"{mode:<10} {r['turns']:>6} {r['searches']:>9} {r['prompt_chars']:>13.0f} "
+            f"{r['cacheable_chars']:>10.0f} {r['prompt_chars'] - r['cacheable_chars']:>9.0f} {r['retrieval_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Compare the binary chunk store (app/chunk_store.py) with the JSONL intermediate:
+on-disk size, full load time, open time and random access by chunk id.
+
+The chunks are read from the existing JSONL (or a synthetic corpus preprocessed
+with DATA_PROCESSED_DIR) and can be replicated to simulate a larger corpus.
+Both formats are written to a temp dir and checked for identical content.
+
+Usage:
+    python -m scripts.bench_chunk_store
+    python -m scripts.bench_chunk_store --replicate 50 --lookups 5000 --json chunk_store.json
+"""
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.chunk_store import ChunkStore, write_chunk_store
+from app.config import CHUNKS_JSONL_PATH
+
+
+def dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    chunks = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                chunks.append(json.loads(line))
+    return chunks
+
+
+def replicate(chunks: List[Dict[str, Any]], factor: int) -> List[Dict[str, Any]]:
+    if factor <= 1:
+        return chunks
+    out = []
+    for r in range(factor):
+        for c in chunks:
+            out.append({**c, "id": f"{c['id']}#r{r}" if r else c["id"]})
+    return out
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jsonl", type=Path, default=CHUNKS_JSONL_PATH, help="Source chunks (JSONL)")
+    parser.add_argument("--replicate", type=int, default=1, help="Duplicate the corpus N times")
+    parser.add_argument("--lookups", type=int, default=1000, help="Random get-by-id lookups")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N for load timings")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    chunks = replicate(read_jsonl(args.jsonl), args.replicate)
+    print(f"{len(chunks)} chunks")
+
+    with tempfile.TemporaryDirectory(prefix="chunk_store_bench_") as tmp:
+        tmp = Path(tmp)
+        jsonl_path = tmp / "document_chunks.jsonl"
+        store_dir = tmp / "chunk_store"
+
+        t0 = time.perf_counter()
+        with jsonl_path.open("w", encoding="utf-8") as f:
+            for c in chunks:
+                f.write(json.dumps(c, ensure_ascii=False) + "\n")
+        jsonl_write_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        write_chunk_store(chunks, store_dir)
+        store_write_s = time.perf_counter() - t0
+
+        # Content check: the store must round-trip exactly
+        if list(ChunkStore(store_dir)) != chunks:
+            raise SystemExit("Chunk store round-trip mismatch")
+
+        jsonl_load_s = best_of(lambda: read_jsonl(jsonl_path), args.repeat)
+        store_open_s = best_of(lambda: ChunkStore(store_dir), args.repeat)
+        store_scan_s = best_of(lambda: list(ChunkStore(store_dir)), args.repeat)
+
+        ids = random.Random(0).choices([c["id"] for c in chunks], k=args.lookups)
+        store = ChunkStore(store_dir)
+        lookup_us = []
+        for chunk_id in ids:
+            t0 = time.perf_counter()
+            store.get_by_id(chunk_id)
+            lookup_us.append((time.perf_counter() - t0) * 1e6)
+
+        # JSONL has no index: a lookup means parsing the file and building a dict first
+        jsonl_first_lookup_s = best_of(lambda: {c["id"]: c for c in read_jsonl(jsonl_path)}[ids[0]], args.repeat)
+
+        results = {
+            "chunks": len(chunks),
+            "jsonl_mb": round(jsonl_path.stat().st_size / 1e6, 2),
+            "store_mb": round(dir_size(store_dir) / 1e6, 2),
+            "store_text_mb": round((store_dir / "text.bin").stat().st_size / 1e6, 2),
+            "jsonl_write_s": round(jsonl_write_s, 3),
+            "store_write_s": round(store_write_s, 3),
+            "jsonl_load_s": round(jsonl_load_s, 3),
+            "store_open_ms": round(store_open_s * 1000, 3),
+            "store_scan_s": round(store_scan_s, 3),
+            "jsonl_first_lookup_s": round(jsonl_first_lookup_s, 3),
+            "store_lookup_p50_us": round(statistics.median(lookup_us), 1),
+            "store_lookup_max_us": round(max(lookup_us), 1),
+        }
+
+    print(f"  size        JSONL {results['jsonl_mb']:.2f} MB  ->  store {results['store_mb']:.2f} MB "
+          f"(text {results['store_text_mb']:.2f} MB)")
+    print(f"  full load   JSONL {results['jsonl_load_s']:.3f} s  ->  store scan {results['store_scan_s']:.3f} s "
+          f"(open {results['store_open_ms']:.2f} ms)")
+    print(f"  by id       JSONL {results['jsonl_first_lookup_s']:.3f} s (parse + dict)  ->  store "
+          f"p50 {results['store_lookup_p50_us']:.1f} us, max {results['store_lookup_max_us']:.1f} us")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-call HTTP requests (how the Streamlit frontend used to talk to the API)
+vs. the pooled client (frontend/chatbot_client.py), against a running API.
+
+* per-call: login + /auth/me, then one new connection per request
+* pooled: ChatbotClient, role from the token, keep-alive connections
+* async: AsyncChatbotClient with --concurrency requests in flight
+
+Reports wall ms per request over `--requests` /search calls (ids and scores
+only, so transport dominates), login included.
+
+Usage:
+    uvicorn app.main:app --port 8000 &
+    python -m scripts.bench_client --username carol_hr --password password123
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from frontend.chatbot_client import AsyncChatbotClient, ChatbotClient
+
+QUERIES = ["leave policy", "performance ratings", "quarterly budget", "onboarding checklist"]
+
+
+def per_call(args) -> float:
+    t0 = time.perf_counter()
+    token = httpx.post(
+        f"{args.url}/auth/login", data={"username": args.username, "password": args.password}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    httpx.get(f"{args.url}/auth/me", headers=headers).raise_for_status()
+    for i in range(args.requests):
+        body = {"query": QUERIES[i % len(QUERIES)], "top_k": 5, "fields": ["id", "score"]}
+        httpx.post(f"{args.url}/search", json=body, headers=headers).raise_for_status()
+    return time.perf_counter() - t0
+
+
+def pooled(args) -> float:
+    t0 = time.perf_counter()
+    with ChatbotClient(args.url, args.username, args.password) as client:
+        client.me()
+        for i in range(args.requests):
+            client.search(QUERIES[i % len(QUERIES)], top_k=5, fields=["id", "score"])
+    return time.perf_counter() - t0
+
+
+async def pooled_async(args) -> float:
+    t0 = time.perf_counter()
+    async with AsyncChatbotClient(args.url, args.username, args.password) as client:
+        await client.me()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(i: int):
+            async with semaphore:
+                await client.search(QUERIES[i % len(QUERIES)], top_k=5, fields=["id", "score"])
+
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    pooled(args)  # warm-up: server caches, role masks
+    results = {
+        "per-call": per_call(args),
+        "pooled": pooled(args),
+        "async": asyncio.run(pooled_async(args)),
+    }
+
+    print("=" * 48)
+    print(f"{'client':<10} {'requests':>9} {'total s':>9} {'ms/request':>11}")
+    print("-" * 48)
+    for name, elapsed in results.items():
+        print(f"{name:<10} {args.requests:>9} {elapsed:>9.2f} {elapsed / args.requests * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Cold start of an API replica: from process spawn to the first answered search.
+
+Starts `uvicorn app.main:app` on a free port for each setup and measures
+
+* ready: spawn -> the server accepts requests (lifespan finished)
+* first search: latency of the first /search after that
+* total: build time (if any) + ready + first search
+
+Setups:
+
+* rebuild: a new node without a snapshot runs preprocess_docs + build_vector_db
+  (VECTOR_BACKEND=flat) into empty directories, then starts the API
+* local index: the API on the index already on this node (VECTOR_BACKEND=flat)
+* snapshot, first start: SNAPSHOT_PATH set, empty cache -> extract + sha256 verify
+* snapshot, restart: the same cache again (size check only)
+
+--evict drops the index / snapshot files from the page cache before each
+start (posix_fadvise, no root needed) to approximate a fresh node's disk.
+Setups other than rebuild run --repeat times; the table shows medians.
+
+Usage:
+    python -m scripts.bench_cold_start                          # newest snapshot in SNAPSHOT_DIR
+    python -m scripts.bench_cold_start --snapshot data/snapshots/snapshot-<version>.tar --evict
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def evict(*paths: Path) -> None:
+    """
+    Ask the kernel to drop these files (recursively) from the page cache.
+    """
+    for root in paths:
+        files = [root] if root.is_file() else [p for p in root.rglob("*") if p.is_file()]
+        for path in files:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+
+def start_api(env: Dict[str, str], username: str, password: str, timeout: float = 300.0) -> Dict[str, float]:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    try:
+        with httpx.Client(base_url=url, timeout=60.0) as client:
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"API exited with {proc.returncode}:\n{proc.stdout.read()}")
+                if time.perf_counter() - t0 > timeout:
+                    raise RuntimeError("API did not become ready in time")
+                try:
+                    r = client.post("/auth/login", data={"username": username, "password": password})
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.02)
+            ready = time.perf_counter() - t0
+            r.raise_for_status()
+            headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+            t1 = time.perf_counter()
+            r = client.post("/search", json={"query": "quarterly budget review", "top_k": 5}, headers=headers)
+            r.raise_for_status()
+            first = time.perf_counter() - t1
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"ready_s": round(ready, 3), "first_search_s": round(first, 3)}
+
+
+def median(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    return {key: round(statistics.median(r[key] for r in runs), 3) for key in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot", type=Path, help="Snapshot .tar (default: newest in SNAPSHOT_DIR)")
+    parser.add_argument("--skip-rebuild", action="store_true", help="Leave out the rebuild setup")
+    parser.add_argument("--evict", action="store_true", help="Drop index files from the page cache before each start")
+    parser.add_argument("--repeat", type=int, default=3, help="Starts per setup (median reported)")
+    parser.add_argument("--username", default="alice_fin")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    from app.config import DATA_RAW_DIR, FLAT_INDEX_DIR, SNAPSHOT_DIR
+
+    snapshot: Optional[Path] = args.snapshot
+    if snapshot is None:
+        snapshots = sorted(SNAPSHOT_DIR.glob("snapshot-*.tar"), key=lambda p: p.stat().st_mtime)
+        if not snapshots:
+            raise SystemExit("No snapshot found; run `python -m scripts.build_snapshot` first")
+        snapshot = snapshots[-1]
+
+    base_env = {k: v for k, v in os.environ.items() if k not in ("SNAPSHOT_PATH", "VECTOR_BACKEND")}
+    work = Path(tempfile.mkdtemp(prefix="bench_cold_start_"))
+    results = {}
+    try:
+        if not args.skip_rebuild:
+            env = {
+                **base_env,
+                "VECTOR_BACKEND": "flat",
+                "DATA_PROCESSED_DIR": str(work / "processed"),
+                "VECTOR_DB_DIR": str(work / "vector_db"),
+                "FLAT_INDEX_DIR": str(work / "flat_index"),
+                "EMBEDDING_CACHE_PATH": str(work / "embedding_cache.sqlite3"),
+            }
+            if args.evict:
+                evict(DATA_RAW_DIR)
+            t0 = time.perf_counter()
+            for script in ("scripts.preprocess_docs", "scripts.build_vector_db"):
+                subprocess.run([sys.executable, "-m", script], cwd=BASE_DIR, env=env, check=True,
+                               stdout=subprocess.DEVNULL)
+            build = round(time.perf_counter() - t0, 3)
+            results["rebuild"] = {"build_s": build, **start_api(env, args.username, args.password)}
+
+        local: List[Dict[str, float]] = []
+        first: List[Dict[str, float]] = []
+        restart: List[Dict[str, float]] = []
+        for i in range(args.repeat):
+            if args.evict:
+                evict(FLAT_INDEX_DIR)
+            local.append(start_api({**base_env, "VECTOR_BACKEND": "flat"}, args.username, args.password))
+
+            # Fresh extraction cache per round, so every "first start" really extracts
+            cache_dir = work / f"snapshots_{i}"
+            env = {**base_env, "SNAPSHOT_PATH": str(snapshot.resolve()), "SNAPSHOT_CACHE_DIR": str(cache_dir)}
+            for runs in (first, restart):
+                if args.evict:
+                    evict(snapshot, *([cache_dir] if cache_dir.exists() else []))
+                runs.append(start_api(env, args.username, args.password))
+
+        results["local index"] = {"build_s": 0.0, **median(local)}
+        results["snapshot, first start"] = {"build_s": 0.0, **median(first)}
+        results["snapshot, restart"] = {"build_s": 0.0, **median(restart)}
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    for r in results.values():
+        r["total_s"] = round(r["build_s"] + r["ready_s"] + r["first_search_s"], 3)
+
+    print("=" * 72)
+    print(f"Snapshot: {snapshot.name} ({snapshot.stat().st_size / 1e6:.1f} MB), evict={args.evict}, "
+          f"median of {args.repeat} starts")
+    print(f"{'setup':<24} {'build s':>9} {'ready s':>9} {'1st search s':>13} {'total s':>9}")
+    print("-" * 72)
+    for setup, r in results.items():
+        print(f"{setup:<24} {r['build_s']:>9.2f} {r['ready_s']:>9.2f} {r['first_search_s']:>13.3f} {r['total_s']:>9.2f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
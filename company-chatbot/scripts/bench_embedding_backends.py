@@ -0,0 +1,162 @@
+"""
+Compare embedding backends (torch vs. ONNX Runtime vs. ONNX int8).
+
+Each backend runs in its own interpreter so load time and peak RSS are not
+polluted by the others. For every backend we measure:
+  - model load time and peak memory (ru_maxrss)
+  - corpus encode throughput (all processed chunks)
+  - single-query encode latency (p50 / p95)
+  - top-k retrieval for the scripts/test_search.py queries, with RBAC applied
+
+The parent then reports retrieval overlap@k and query-embedding cosine
+similarity of every backend against the torch reference.
+
+Usage:
+    python -m scripts.export_onnx_model          # once
+    python -m scripts.bench_embedding_backends --top-k 3 --json bench.json
+"""
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+BACKENDS = {
+    "torch": ("torch", False),
+    "onnx": ("onnx", False),
+    "onnx-int8": ("onnx", True),
+}
+
+
+def run_worker(backend_key: str, top_k: int, repeat: int) -> None:
+    import numpy as np
+
+    from app.embeddings import create_embedding_backend
+    from app.vectorstore import load_chunks
+    from scripts.test_search import TEST_QUERIES
+
+    backend_name, quantized = BACKENDS[backend_key]
+    chunks = load_chunks()
+    texts = [c["text"] for c in chunks]
+
+    t0 = time.perf_counter()
+    model = create_embedding_backend(backend_name, quantized=quantized)
+    load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    corpus = model.encode(texts, batch_size=64)
+    corpus_s = time.perf_counter() - t0
+
+    queries = sorted({q for q, _ in TEST_QUERIES})
+    latencies_ms: List[float] = []
+    query_vectors: Dict[str, List[float]] = {}
+    for q in queries:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            vec = model.encode([q])[0]
+            latencies_ms.append((time.perf_counter() - t0) * 1000)
+        query_vectors[q] = vec.tolist()
+
+    rankings = {}
+    for q, role in TEST_QUERIES:
+        scores = corpus @ np.asarray(query_vectors[q], dtype=np.float32)
+        allowed = np.array([role in c["allowed_roles"] for c in chunks])
+        scores[~allowed] = -np.inf
+        order = np.argsort(-scores)[:top_k]
+        rankings[f"{role}|{q}"] = [chunks[i]["id"] for i in order if np.isfinite(scores[i])]
+
+    latencies_ms.sort()
+    result = {
+        "backend": backend_key,
+        "model": model.name,
+        "load_s": round(load_s, 3),
+        "corpus_chunks": len(texts),
+        "corpus_encode_s": round(corpus_s, 3),
+        "corpus_chunks_per_s": round(len(texts) / corpus_s, 1) if corpus_s else None,
+        "query_p50_ms": round(statistics.median(latencies_ms), 2),
+        "query_p95_ms": round(latencies_ms[int(0.95 * (len(latencies_ms) - 1))], 2),
+        # Linux reports ru_maxrss in KiB
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "query_vectors": query_vectors,
+        "rankings": rankings,
+    }
+    print(json.dumps(result))
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = sum(x * x for x in a) ** 0.5
+    nb = sum(y * y for y in b) ** 0.5
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", action="append", choices=list(BACKENDS), help="Backends to compare")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20, help="Encodes per query for latency stats")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    parser.add_argument("--worker", choices=list(BACKENDS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.top_k, args.repeat)
+        return
+
+    backends = args.backend or list(BACKENDS)
+    if "torch" not in backends:
+        backends.insert(0, "torch")  # reference for the accuracy check
+
+    results: Dict[str, Dict] = {}
+    for key in backends:
+        proc = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_embedding_backends", "--worker", key,
+             "--top-k", str(args.top_k), "--repeat", str(args.repeat)],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            print(f"[{key}] failed:\n{proc.stderr[-2000:]}")
+            continue
+        results[key] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    ref = results.get("torch")
+    print("=" * 100)
+    print(f"{'backend':<10} {'load s':>7} {'chunks/s':>9} {'q p50 ms':>9} {'q p95 ms':>9} "
+          f"{'peak MB':>8} {'overlap@' + str(args.top_k):>10} {'cos vs torch':>12}")
+    print("-" * 100)
+    summary = []
+    for key, res in results.items():
+        overlap = cos = None
+        if ref is not None:
+            overlaps = [
+                len(set(res["rankings"][k]) & set(ids)) / max(len(ids), 1)
+                for k, ids in ref["rankings"].items()
+            ]
+            overlap = statistics.mean(overlaps) if overlaps else None
+            cos = statistics.mean(
+                cosine(res["query_vectors"][q], v) for q, v in ref["query_vectors"].items()
+            )
+        print(f"{key:<10} {res['load_s']:>7.2f} {res['corpus_chunks_per_s'] or 0:>9.1f} "
+              f"{res['query_p50_ms']:>9.2f} {res['query_p95_ms']:>9.2f} {res['peak_rss_mb']:>8.1f} "
+              f"{overlap if overlap is not None else float('nan'):>10.3f} {cos if cos is not None else float('nan'):>12.4f}")
+        summary.append({
+            **{k: v for k, v in res.items() if k not in ("query_vectors", "rankings")},
+            f"overlap_at_{args.top_k}": overlap,
+            "cosine_vs_torch": cos,
+        })
+
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
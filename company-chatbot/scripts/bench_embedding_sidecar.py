@@ -0,0 +1,187 @@
+"""
+Per-node memory and QPS of query embedding with and without the sidecar.
+
+Simulates a node running `--workers` API worker processes, each encoding
+single search queries from `--threads` threads (like the request threadpool)
+for `--duration` seconds:
+
+* in-process: every worker loads its own model (EMBEDDING_BACKEND=<backend>)
+* sidecar: workers use EMBEDDING_BACKEND=sidecar against one sidecar process
+
+Memory is the summed PSS (proportional set size: shared pages are split
+between the processes that map them) of all workers, plus the sidecar.
+
+Usage:
+    python -m scripts.bench_embedding_sidecar --workers 8 --threads 4
+    python -m scripts.bench_embedding_sidecar --backend onnx --sidecar-threads 4 --json sidecar.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+
+def pss_mb(pid: int = 0) -> Optional[float]:
+    """
+    PSS of a process from /proc (Linux), or None.
+    """
+    try:
+        for line in Path(f"/proc/{pid or 'self'}/smaps_rollup").read_text().splitlines():
+            if line.startswith("Pss:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def worker(threads: int, duration: float) -> None:
+    """
+    One simulated API worker: load the configured backend, report ready, wait
+    for "go" on stdin, then encode single queries from `threads` threads.
+    """
+    from app.embeddings import create_embedding_backend
+    from scripts.test_search import TEST_QUERIES
+
+    model = create_embedding_backend()
+    queries = [q for q, _ in TEST_QUERIES]
+    model.encode(queries[:1])  # warm-up (and first sidecar connection)
+    print("ready", flush=True)
+    sys.stdin.readline()
+
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+    deadline = time.perf_counter() + duration
+
+    def run(i: int) -> None:
+        n = i
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            model.encode([queries[n % len(queries)]])
+            latencies[i].append(time.perf_counter() - t0)
+            n += threads
+
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    all_lat = sorted(x for per_thread in latencies for x in per_thread)
+    print(json.dumps({
+        "requests": len(all_lat),
+        "p50_ms": statistics.median(all_lat) * 1000 if all_lat else None,
+        "p95_ms": all_lat[int(0.95 * (len(all_lat) - 1))] * 1000 if all_lat else None,
+        "pss_mb": pss_mb(),
+    }), flush=True)
+
+
+def sidecar_stats(socket_path: str) -> Dict:
+    from app.wire import connect, pack_frame, recv_frame
+
+    with connect(socket_path, timeout_s=10) as sock:
+        sock.sendall(pack_frame({"op": "stats"}))
+        return recv_frame(sock)[0]
+
+
+def run_node(mode: str, args, socket_path: str) -> Dict:
+    env = {**os.environ, "EMBEDDING_SIDECAR_SOCKET": socket_path, "EMBEDDING_SIDECAR_BACKEND": args.backend}
+    sidecar = None
+    if mode == "sidecar":
+        cmd = [sys.executable, "-m", "scripts.embedding_sidecar", "--backend", args.backend, "--socket", socket_path]
+        if args.sidecar_threads:
+            cmd += ["--threads", str(args.sidecar_threads)]
+        sidecar = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.PIPE, text=True)
+        sidecar.stdout.readline()  # "Embedding sidecar serving ..."
+        env["EMBEDDING_BACKEND"] = "sidecar"
+    else:
+        env["EMBEDDING_BACKEND"] = args.backend
+        if args.worker_threads:
+            env["EMBEDDING_NUM_THREADS"] = str(args.worker_threads)
+
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "scripts.bench_embedding_sidecar", "--phase", "worker",
+             "--threads", str(args.threads), "--duration", str(args.duration)],
+            cwd=BASE_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        for _ in range(args.workers)
+    ]
+    try:
+        for w in workers:
+            if w.stdout.readline().strip() != "ready":
+                raise RuntimeError(f"{mode} worker failed to start")
+        for w in workers:
+            w.stdin.write("go\n")
+            w.stdin.flush()
+        results = [json.loads(w.stdout.readline()) for w in workers]
+        sidecar_pss = pss_mb(sidecar.pid) if sidecar else 0.0
+        avg_batch = sidecar_stats(socket_path)["avg_batch"] if sidecar else 1.0
+        for w in workers:
+            w.wait()
+    finally:
+        for w in workers:
+            if w.poll() is None:
+                w.kill()
+        if sidecar:
+            sidecar.terminate()
+            sidecar.wait()
+
+    requests = sum(r["requests"] for r in results)
+    return {
+        "workers": args.workers,
+        "qps": round(requests / args.duration, 1),
+        "p50_ms": round(statistics.median(r["p50_ms"] for r in results), 3),
+        "p95_ms": round(max(r["p95_ms"] for r in results), 3),
+        "workers_pss_mb": round(sum(r["pss_mb"] or 0 for r in results), 1),
+        "sidecar_pss_mb": sidecar_pss,
+        "node_pss_mb": round(sum(r["pss_mb"] or 0 for r in results) + (sidecar_pss or 0), 1),
+        "avg_batch": avg_batch,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default=os.getenv("EMBEDDING_SIDECAR_BACKEND", "torch"),
+                        help="Model backend in both modes (torch | onnx | hash)")
+    parser.add_argument("--workers", type=int, default=4, help="Simulated API worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent requests per worker")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per mode")
+    parser.add_argument("--worker-threads", type=int, default=0, help="EMBEDDING_NUM_THREADS per in-process worker")
+    parser.add_argument("--sidecar-threads", type=int, default=0, help="EMBEDDING_NUM_THREADS of the sidecar")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    parser.add_argument("--phase", choices=["worker"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase == "worker":
+        worker(args.threads, args.duration)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="embed_sidecar_") as tmp:
+        for mode in ("in-process", "sidecar"):
+            results[mode] = run_node(mode, args, str(Path(tmp) / "embed.sock"))
+
+    print("=" * 90)
+    print(f"backend={args.backend} workers={args.workers} threads/worker={args.threads} duration={args.duration}s")
+    print(f"{'mode':<12} {'qps':>9} {'p50 ms':>8} {'p95 ms':>8} {'workers MB':>11} {'sidecar MB':>11} "
+          f"{'node MB':>9} {'batch':>7}")
+    print("-" * 90)
+    for mode, r in results.items():
+        print(f"{mode:<12} {r['qps']:>9.1f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['workers_pss_mb']:>11.1f} "
+              f"{r['sidecar_pss_mb'] or 0:>11.1f} {r['node_pss_mb']:>9.1f} {r['avg_batch']:>7.2f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
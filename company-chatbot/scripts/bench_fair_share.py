@@ -0,0 +1,156 @@
+"""
+Interactive latency while one user hammers /rag, with and without per-user
+quotas and fair queuing (app/fairshare.py).
+
+For each mode the suite starts uvicorn and the LLM stub
+(scripts/llm_stub_server.py), then for --duration seconds:
+
+* abuser: one user (--abuser) with --abuse-concurrency /rag calls in flight
+  in a loop, no pause
+* interactive: every other seed user asks a /rag question, then a /search
+  query, then pauses --think-s, and repeats
+
+Modes:
+  off         FAIR_SHARE_ENABLED=false, QUOTA_ENABLED=false (FIFO everywhere)
+  fair        fair queuing only
+  fair+quota  fair queuing and role quotas (the default configuration)
+
+Reports interactive /rag and /search latency, status counts per side, and
+from /metrics the mean lane wait per role and the rejection counters.
+
+Usage:
+    python -m scripts.bench_fair_share --duration 30 --llm-latency-ms 400
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from scripts.benchmark import SEED_PASSWORD, SEED_USERS, latency_stats, start_servers
+
+MODES = {
+    "off": {"FAIR_SHARE_ENABLED": "false", "QUOTA_ENABLED": "false"},
+    "fair": {"FAIR_SHARE_ENABLED": "true", "QUOTA_ENABLED": "false"},
+    "fair+quota": {"FAIR_SHARE_ENABLED": "true", "QUOTA_ENABLED": "true"},
+}
+
+RAG_QUESTIONS = [
+    "What is the leave policy for employees?",
+    "Summarize the 2024 quarterly financial performance.",
+    "Which campaigns drove the most conversions in Q3 2024?",
+    "What is the on-call rotation for engineering?",
+]
+SEARCH_QUERIES = ["leave policy", "quarterly revenue", "marketing budget", "incident response"]
+
+
+async def run_scenario(base_url: str, args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.abuse_concurrency + 32)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        headers = {}
+        for username in SEED_USERS.values():
+            resp = await client.post("/auth/login", data={"username": username, "password": SEED_PASSWORD})
+            resp.raise_for_status()
+            headers[username] = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        deadline = time.monotonic() + args.duration
+        latencies: Dict[str, List[float]] = {"/rag": [], "/search": []}
+        statuses: Dict[str, Dict[str, int]] = {"abuser": {}, "interactive": {}}
+
+        async def call(side: str, username: str, endpoint: str, query: str) -> None:
+            t0 = time.perf_counter()
+            try:
+                resp = await client.post(endpoint, json={"query": query, "top_k": 4}, headers=headers[username])
+                code = str(resp.status_code)
+            except httpx.HTTPError as exc:
+                code = type(exc).__name__
+            if side == "interactive" and code == "200":
+                latencies[endpoint].append((time.perf_counter() - t0) * 1000)
+            statuses[side][code] = statuses[side].get(code, 0) + 1
+
+        async def abuser(i: int) -> None:
+            while time.monotonic() < deadline:
+                await call("abuser", args.abuser, "/rag", RAG_QUESTIONS[i % len(RAG_QUESTIONS)])
+                i += 1
+
+        async def interactive(username: str, i: int) -> None:
+            while time.monotonic() < deadline:
+                await call("interactive", username, "/rag", RAG_QUESTIONS[i % len(RAG_QUESTIONS)])
+                await call("interactive", username, "/search", SEARCH_QUERIES[i % len(SEARCH_QUERIES)])
+                i += 1
+                await asyncio.sleep(args.think_s)
+
+        users = [u for u in SEED_USERS.values() if u != args.abuser]
+        await asyncio.gather(
+            *(abuser(i) for i in range(args.abuse_concurrency)),
+            *(interactive(u, i) for i, u in enumerate(users)),
+        )
+        metrics = (await client.get("/metrics")).text
+
+    rejections: Dict[str, float] = {}
+    waits: Dict[str, Dict[str, float]] = {}
+    for line in metrics.splitlines():
+        if line.startswith(("chatbot_fair_rejected_total{", "chatbot_quota_rejected_total{", "chatbot_llm_rejected_total{")):
+            name, value = line.rsplit(" ", 1)
+            rejections[name] = float(value)
+        elif line.startswith(("chatbot_fair_queue_seconds_sum{", "chatbot_fair_queue_seconds_count{")):
+            name, value = line.rsplit(" ", 1)
+            series, labels = name.split("{", 1)
+            waits.setdefault("{" + labels, {})[series.rsplit("_", 1)[1]] = float(value)
+    return {
+        "rag": latency_stats(latencies["/rag"]),
+        "search": latency_stats(latencies["/search"]),
+        "statuses": statuses,
+        "rejections": rejections,
+        "queue_wait_ms": {k: v["sum"] / v["count"] * 1000 for k, v in waits.items() if v.get("count")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--abuser", default=SEED_USERS["engineering"])
+    parser.add_argument("--abuse-concurrency", type=int, default=32)
+    parser.add_argument("--think-s", type=float, default=1.0)
+    parser.add_argument("--api-port", type=int, default=8011)
+    parser.add_argument("--llm-port", type=int, default=9011)
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    args.workers = 1  # fair-share state is per worker
+
+    results = {}
+    for mode in args.modes:
+        os.environ.update(MODES[mode])
+        procs = start_servers(args)
+        try:
+            results[mode] = asyncio.run(run_scenario(f"http://127.0.0.1:{args.api_port}", args))
+        finally:
+            for proc in procs:
+                proc.terminate()
+            for proc in procs:
+                proc.wait()
+
+    print("=" * 96)
+    print(f"{'mode':<11} {'rag p50':>8} {'rag p99':>8} {'search p50':>11} {'search p99':>11}  statuses (interactive | abuser)")
+    print("-" * 96)
+    for mode, r in results.items():
+        print(
+            f"{mode:<11} {r['rag'].get('p50_ms', 0):>8.0f} {r['rag'].get('p99_ms', 0):>8.0f} "
+            f"{r['search'].get('p50_ms', 0):>11.1f} {r['search'].get('p99_ms', 0):>11.1f}  "
+            f"{r['statuses']['interactive']} | {r['statuses']['abuser']}"
+        )
+    for mode, r in results.items():
+        if r["rejections"] or r["queue_wait_ms"]:
+            print(f"\n{mode}:")
+            for labels, ms in sorted(r["queue_wait_ms"].items()):
+                print(f"  mean lane wait {labels} {ms:.1f} ms")
+            for name, value in sorted(r["rejections"].items()):
+                print(f"  {name} {value:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Import-time benchmark based on `python -X importtime`.
+
+Runs a fresh interpreter for each target module, parses the importtime log
+from stderr and reports:
+  - total cumulative import time of the target
+  - the slowest direct imports of the target
+  - which heavy dependencies (torch, chromadb, ...) got pulled in
+
+Usage:
+    python -m scripts.bench_import_time
+    python -m scripts.bench_import_time --module app.main --repeat 5 --json out.json
+    python -m scripts.bench_import_time --compare out.json   # delta vs. a saved run
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+DEFAULT_MODULES = ["app.main", "app.auth", "app.search", "app.llm_client"]
+
+# Packages that should only load when a code path actually needs them
+HEAVY_PACKAGES = [
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "chromadb",
+    "onnxruntime",
+    "groq",
+    "openai",
+]
+
+
+def run_importtime(module: str) -> List[Dict]:
+    """
+    Import `module` in a fresh interpreter and return the parsed importtime rows.
+    """
+    env = dict(os.environ)
+    # Make sure the provider SDKs are not selected by a developer's .env
+    env.setdefault("LLM_PROVIDER", "none")
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            _, rest = line.split(":", 1)
+            self_us, cumulative_us, name = rest.split("|", 2)
+            rows.append(
+                {
+                    "self_us": int(self_us.strip()),
+                    "cumulative_us": int(cumulative_us.strip()),
+                    "name": name.rstrip(),
+                }
+            )
+        except ValueError:
+            continue
+    return rows
+
+
+def summarize(module: str, repeat: int, top: int) -> Dict:
+    totals_ms: List[float] = []
+    rows: List[Dict] = []
+
+    for _ in range(repeat):
+        rows = run_importtime(module)
+        target = [r for r in rows if r["name"].strip() == module]
+        total_us = target[-1]["cumulative_us"] if target else sum(r["self_us"] for r in rows)
+        totals_ms.append(total_us / 1000)
+
+    loaded = {r["name"].strip().split(".")[0] for r in rows}
+
+    # importtime indents nested imports by two spaces per level: " app.main",
+    # "   fastapi", ... so the direct imports of the target sit at depth one.
+    direct = [
+        r for r in rows
+        if r["name"].startswith("   ") and not r["name"].startswith("     ")
+    ]
+    slowest = sorted(direct, key=lambda r: r["cumulative_us"], reverse=True)[:top]
+
+    return {
+        "module": module,
+        "repeat": repeat,
+        "median_ms": round(statistics.median(totals_ms), 1),
+        "min_ms": round(min(totals_ms), 1),
+        "heavy_loaded": [p for p in HEAVY_PACKAGES if p in loaded],
+        "slowest": [
+            {"name": r["name"].strip(), "cumulative_ms": round(r["cumulative_us"] / 1000, 1)}
+            for r in slowest
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", action="append", help="Module to import (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    parser.add_argument("--compare", type=Path, help="Previous --json output to diff against")
+    args = parser.parse_args()
+
+    results = [summarize(m, args.repeat, args.top) for m in (args.module or DEFAULT_MODULES)]
+
+    previous = {}
+    if args.compare:
+        previous = {r["module"]: r for r in json.loads(args.compare.read_text(encoding="utf-8"))}
+
+    for res in results:
+        print("=" * 80)
+        print(f"Module: {res['module']}")
+        print(f"  import time (median of {res['repeat']}): {res['median_ms']:.1f} ms  (min {res['min_ms']:.1f} ms)")
+        if res["module"] in previous:
+            before = previous[res["module"]]["median_ms"]
+            print(f"  vs. {args.compare.name}: {before:.1f} ms -> {res['median_ms']:.1f} ms ({res['median_ms'] - before:+.1f} ms)")
+        print(f"  heavy deps loaded: {', '.join(res['heavy_loaded']) or 'none'}")
+        print("  slowest direct imports:")
+        for r in res["slowest"]:
+            print(f"    {r['cumulative_ms']:>9.1f} ms  {r['name']}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Benchmark the flat index storage modes: float32, float16, and the quantized
+first-stage scans (int8, binary) with float16 rescoring.
+
+Each mode is queried in its own interpreter, so peak RSS shows what a serving
+process has to keep resident. Recall@k is measured against exact float32
+brute force.
+
+The dataset is either clustered synthetic unit vectors (default), which have
+neighbourhood structure like real embeddings, or the processed corpus encoded
+with the configured embedding backend and queried with scripts/test_search.py
+queries.
+
+Usage:
+    python -m scripts.bench_quantization                          # 200k synthetic rows
+    python -m scripts.bench_quantization --synthetic 1000000 --rescore-factor 20
+    python -m scripts.bench_quantization --cold                   # index not in page cache
+    EMBEDDING_BACKEND=hash python -m scripts.bench_quantization --corpus
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# mode -> (dtype of embeddings.npy, quantization)
+MODES = {
+    "float32": ("float32", "none"),
+    "float16": ("float16", "none"),
+    "int8": ("float16", "int8"),
+    "binary": ("float16", "binary"),
+}
+
+
+def proc_status_mb(key: str) -> Optional[float]:
+    """
+    A memory field of /proc/self/status in MB (VmHWM = peak RSS, RssAnon =
+    private memory, RssFile = mapped file pages), or None off Linux.
+    """
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith(key + ":"):
+                return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss of a child started via vfork + exec also counts the parent's
+    # high-water mark, so prefer VmHWM
+    hwm = proc_status_mb("VmHWM")
+    return hwm if hwm is not None else round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def prepare_dataset(work: Path, synthetic: int, corpus: bool, n_queries: int, dim: int) -> None:
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    if corpus:
+        from app.vectorstore import get_embedding_model, load_chunks
+        from scripts.test_search import TEST_QUERIES
+
+        model = get_embedding_model()
+        vectors = model.encode([c["text"] for c in load_chunks()], batch_size=64)
+        texts = sorted({q for q, _ in TEST_QUERIES})
+        queries = model.encode((texts * (n_queries // len(texts) + 1))[:n_queries])
+    else:
+        # Topic clusters of ~50 rows; queries are perturbed rows, like paraphrases
+        n_clusters = max(1, synthetic // 50)
+        centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+        vectors = centers[rng.integers(0, n_clusters, size=synthetic)]
+        vectors += rng.normal(scale=0.6, size=vectors.shape).astype(np.float32)
+        queries = vectors[rng.integers(0, synthetic, size=n_queries)]
+        queries = queries + rng.normal(scale=0.4, size=queries.shape).astype(np.float32)
+
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.save(work / "vectors.npy", vectors.astype(np.float32))
+    np.save(work / "queries.npy", np.asarray(queries, dtype=np.float32))
+
+
+def exact_top_k(work: Path, top_k: int) -> List[List[int]]:
+    import numpy as np
+
+    vectors = np.load(work / "vectors.npy")
+    queries = np.load(work / "queries.npy")
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    out = []
+    for q in queries:
+        sims = vectors @ q
+        top = np.argpartition(-sims, top_k - 1)[:top_k]
+        out.append(top[np.argsort(-sims[top])].tolist())
+    return out
+
+
+def build(mode: str, work: Path) -> Dict:
+    import numpy as np
+
+    from app.flat_index import write_flat_index
+
+    vectors = np.load(work / "vectors.npy")
+    n = len(vectors)
+    dtype, quantization = MODES[mode]
+    index_dir = work / f"index_{mode}"
+
+    t0 = time.perf_counter()
+    write_flat_index(
+        ids=[str(i) for i in range(n)],
+        embeddings=vectors,
+        documents=[""] * n,
+        metadatas=[{"chunk_index": 0} for _ in range(n)],
+        index_dir=index_dir,
+        dtype=dtype,
+        quantization=quantization,
+    )
+    build_s = time.perf_counter() - t0
+
+    scanned = {"none": "embeddings.npy", "int8": "quant.int8.npy", "binary": "quant.bits.npy"}[quantization]
+    return {
+        "build_s": round(build_s, 3),
+        "disk_mb": round(dir_size(index_dir) / 1e6, 2),
+        "vectors_disk_mb": round(
+            sum((index_dir / f).stat().st_size for f in ("embeddings.npy", "quant.int8.npy", "quant.bits.npy")
+                if (index_dir / f).exists()) / 1e6,
+            2,
+        ),
+        # What the first stage reads in full for every query, i.e. what has to stay resident
+        "scan_mb": round((index_dir / scanned).stat().st_size / 1e6, 2),
+    }
+
+
+def evict_from_page_cache(directory: Path) -> None:
+    """
+    Drop the index files from the page cache (Linux), so queries start cold
+    like on a replica whose memory went to other processes.
+    """
+    for path in directory.iterdir():
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def query(mode: str, work: Path, top_k: int, rescore_factor: int, cold: bool) -> Dict:
+    import numpy as np
+
+    from app.flat_index import FlatCollection
+
+    queries = np.load(work / "queries.npy")
+    if cold and hasattr(os, "posix_fadvise"):
+        evict_from_page_cache(work / f"index_{mode}")
+    t0 = time.perf_counter()
+    collection = FlatCollection(work / f"index_{mode}")
+    collection.rescore_factor = rescore_factor
+    open_s = time.perf_counter() - t0
+
+    latencies_ms: List[float] = []
+    results: List[List[int]] = []
+    for q in queries:
+        t0 = time.perf_counter()
+        res = collection.query(query_embeddings=[q], n_results=top_k, include=[])
+        latencies_ms.append((time.perf_counter() - t0) * 1000)
+        results.append([int(i) for i in res["ids"][0]])
+
+    latencies_ms.sort()
+    return {
+        "open_s": round(open_s, 3),
+        "p50_ms": round(statistics.median(latencies_ms), 3),
+        "p95_ms": round(latencies_ms[int(0.95 * (len(latencies_ms) - 1))], 3),
+        "peak_rss_mb": peak_rss_mb(),
+        # File pages are reclaimable page cache; the kernel may map more than the
+        # rows actually read (readahead, large folios)
+        "rss_anon_mb": proc_status_mb("RssAnon"),
+        "rss_file_mb": proc_status_mb("RssFile"),
+        "ids": results,
+    }
+
+
+def run_phase(phase: str, mode: str, args, work: Path) -> Dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "scripts.bench_quantization", "--phase", phase, "--mode", mode,
+         "--work", str(work), "--top-k", str(args.top_k), "--rescore-factor", str(args.rescore_factor)]
+        + (["--cold"] if args.cold else []),
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{phase} for {mode} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=200_000, help="Rows of clustered synthetic vectors")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--corpus", action="store_true", help="Use the processed corpus instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rescore-factor", type=int, default=10, help="Candidates rescored = top_k * factor")
+    parser.add_argument("--cold", action="store_true", help="Evict the index from the page cache before querying")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated subset of " + ", ".join(MODES))
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    parser.add_argument("--phase", choices=["build", "query"], help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--work", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase == "build":
+        print(json.dumps(build(args.mode, args.work)))
+        return
+    if args.phase == "query":
+        print(json.dumps(query(args.mode, args.work, args.top_k, args.rescore_factor, args.cold)))
+        return
+
+    work = Path(tempfile.mkdtemp(prefix="bench_quant_"))
+    try:
+        prepare_dataset(work, args.synthetic, args.corpus, args.queries, args.dim)
+        exact = exact_top_k(work, args.top_k)
+        results = {}
+        for mode in args.modes.split(","):
+            res = {**run_phase("build", mode, args, work), **run_phase("query", mode, args, work)}
+            recalls = [len(set(got) & set(want)) / len(want) for got, want in zip(res.pop("ids"), exact)]
+            res["recall_at_k"] = round(statistics.mean(recalls), 4)
+            results[mode] = res
+            shutil.rmtree(work / f"index_{mode}", ignore_errors=True)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    print("=" * 118)
+    print(f"{'mode':<8} {'build s':>8} {'disk MB':>8} {'vec MB':>8} {'scan MB':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'peak MB':>8} {'anon MB':>8} {'file MB':>8} {'recall@' + str(args.top_k):>10}")
+    print("-" * 118)
+    for mode, res in results.items():
+        print(f"{mode:<8} {res['build_s']:>8.2f} {res['disk_mb']:>8.2f} {res['vectors_disk_mb']:>8.2f} "
+              f"{res['scan_mb']:>8.2f} {res['p50_ms']:>8.3f} {res['p95_ms']:>8.3f} {res['peak_rss_mb']:>8.1f} "
+              f"{res['rss_anon_mb'] or 0:>8.1f} {res['rss_file_mb'] or 0:>8.1f} {res['recall_at_k']:>10.4f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Serialization CPU and response size of /search bodies.
+
+For the TEST_QUERIES hits (top_k, role c_level), compares:
+
+* pydantic: the previous path (SearchHit / SearchResponse models,
+  jsonable_encoder, stdlib json), i.e. what FastAPI does with a response_model
+* full: project_hits + FastJSONResponse (orjson if installed), all fields
+* snippet: mode="snippet" (query-centred window instead of the text)
+* ids: fields=["id", "score"]
+
+and reports CPU time per response plus bytes raw, gzip and (if the brotli
+package is installed) brotli, at the configured levels.
+
+Usage:
+    python -m scripts.bench_responses --top-k 10 --rounds 200
+"""
+import argparse
+import gzip
+import time
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.config import RESPONSE_BROTLI_QUALITY, RESPONSE_GZIP_LEVEL
+from app.main import project_hits
+from app.responses import FastJSONResponse, brotli, orjson
+from app.schemas import SearchHit, SearchRequest, SearchResponse
+from app.search import semantic_search
+from scripts.test_search import TEST_QUERIES
+
+
+def pydantic_body(query: str, hits: List[Dict]) -> bytes:
+    models = [
+        SearchHit(
+            id=h["id"],
+            text=h["text"],
+            score=h["score"],
+            department=h["metadata"].get("department", ""),
+            source_file=h["metadata"].get("source_file", ""),
+            rerank_score=h.get("rerank_score"),
+        )
+        for h in hits
+    ]
+    return JSONResponse(jsonable_encoder(SearchResponse(hits=models))).body
+
+
+def projected(**projection) -> Callable[[str, List[Dict]], bytes]:
+    def body(query: str, hits: List[Dict]) -> bytes:
+        request = SearchRequest(query=query, **projection)
+        return FastJSONResponse({"hits": project_hits(hits, query, request)}).body
+
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--role", default="c_level")
+    args = parser.parse_args()
+
+    queries = sorted({q for q, _ in TEST_QUERIES})
+    results = [(q, semantic_search(q, args.role, top_k=args.top_k)) for q in queries]
+
+    variants = {
+        "pydantic": pydantic_body,
+        "full": projected(),
+        "snippet": projected(mode="snippet"),
+        "ids": projected(fields=["id", "score"]),
+    }
+
+    print(f"{len(queries)} queries, top_k={args.top_k}, json={'orjson' if orjson else 'stdlib'}, "
+          f"gzip level {RESPONSE_GZIP_LEVEL}" + (f", brotli quality {RESPONSE_BROTLI_QUALITY}" if brotli else ""))
+    print("=" * 92)
+    print(f"{'variant':<10} {'encode us':>10} {'raw B':>9} {'gzip B':>9} {'gzip us':>9} {'br B':>9} {'br us':>9}")
+    print("-" * 92)
+    for name, encode in variants.items():
+        bodies = [encode(q, hits) for q, hits in results]  # warm-up, and the bodies to compress
+
+        t0 = time.process_time()
+        for _ in range(args.rounds):
+            for q, hits in results:
+                encode(q, hits)
+        encode_us = (time.process_time() - t0) / (args.rounds * len(results)) * 1e6
+
+        def per_body(compress: Callable[[bytes], bytes]):
+            sizes = [len(compress(b)) for b in bodies]
+            t0 = time.process_time()
+            for _ in range(max(args.rounds // 10, 1)):
+                for b in bodies:
+                    compress(b)
+            us = (time.process_time() - t0) / (max(args.rounds // 10, 1) * len(bodies)) * 1e6
+            return sum(sizes) / len(sizes), us
+
+        raw = sum(map(len, bodies)) / len(bodies)
+        gz, gz_us = per_body(lambda b: gzip.compress(b, compresslevel=RESPONSE_GZIP_LEVEL))
+        line = f"{name:<10} {encode_us:>10.0f} {raw:>9.0f} {gz:>9.0f} {gz_us:>9.0f}"
+        if brotli is not None:
+            br, br_us = per_body(lambda b: brotli.compress(b, quality=RESPONSE_BROTLI_QUALITY))
+            line += f" {br:>9.0f} {br_us:>9.0f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
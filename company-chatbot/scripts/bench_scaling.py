@@ -0,0 +1,184 @@
+"""
+Scaling benchmark for the ingestion -> index -> search pipeline.
+
+For every size in --sizes it generates a synthetic corpus
+(scripts/generate_synthetic_corpus.py) in a scratch directory, then runs the
+real pipeline in child processes pointed at it through DATA_RAW_DIR /
+DATA_PROCESSED_DIR / VECTOR_DB_DIR / FLAT_INDEX_DIR:
+
+  preprocess   python -m scripts.preprocess_docs   (time, peak RSS, JSONL size)
+  index        python -m scripts.build_vector_db   (time, peak RSS, index size on disk)
+  query        semantic_search per role             (open time, p50 / p99, peak RSS)
+
+The embedding backend follows EMBEDDING_BACKEND; use `--embedding-backend hash`
+to measure pipeline mechanics at sizes where running the real model is not
+practical.
+
+Usage:
+    python -m scripts.bench_scaling --sizes 10000 100000 --json scaling.json
+    VECTOR_BACKEND=flat python -m scripts.bench_scaling --sizes 1000000 --embedding-backend hash
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+QUERIES = [
+    "quarterly revenue and cash flow",
+    "employee performance rating",
+    "CI/CD pipeline and Kubernetes",
+    "leave policy and public holidays",
+    "campaign conversion rate",
+]
+
+
+def dir_size(path: Path) -> int:
+    if not path.exists():
+        return 0
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def run_measured(args: List[str], env: Dict[str, str]) -> Dict:
+    """
+    Run a child process and return wall time and its peak RSS (from wait4).
+    """
+    # Output goes to temp files (not pipes) so we can reap with wait4 ourselves
+    # without a chatty child blocking on a full pipe.
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(args, cwd=BASE_DIR, env=env, stdout=out, stderr=err)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - t0
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        out.seek(0)
+        err.seek(0)
+        stdout = out.read().decode(errors="replace")
+        stderr = err.read().decode(errors="replace")
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{stderr[-2000:]}")
+    # ru_maxrss is in KiB on Linux
+    return {"seconds": round(elapsed, 3), "peak_rss_mb": round(rusage.ru_maxrss / 1024, 1), "stdout": stdout}
+
+
+def query_worker(repeat: int, top_k: int) -> None:
+    from app.config import ROLES
+    from app.search import semantic_search
+
+    t0 = time.perf_counter()
+    semantic_search(QUERIES[0], "c_level", top_k)
+    first_query_s = time.perf_counter() - t0
+
+    samples = []
+    for _ in range(repeat):
+        for role in ROLES:
+            for q in QUERIES:
+                t0 = time.perf_counter()
+                semantic_search(q, role, top_k)
+                samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+
+    import resource
+
+    print(json.dumps({
+        "first_query_s": round(first_query_s, 3),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p99_ms": round(samples[int(0.99 * (len(samples) - 1))], 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def bench_size(size: int, args) -> Dict:
+    work = Path(tempfile.mkdtemp(prefix=f"scale_{size}_", dir=args.scratch))
+    env = dict(os.environ)
+    env.update(
+        {
+            "DATA_RAW_DIR": str(work / "raw"),
+            "DATA_PROCESSED_DIR": str(work / "processed"),
+            "VECTOR_DB_DIR": str(work / "vector_db"),
+            "FLAT_INDEX_DIR": str(work / "flat_index"),
+        }
+    )
+    if args.embedding_backend:
+        env["EMBEDDING_BACKEND"] = args.embedding_backend
+
+    try:
+        from scripts.generate_synthetic_corpus import generate_corpus
+
+        t0 = time.perf_counter()
+        generate_corpus(work / "raw", size, chunks_per_doc=args.chunks_per_doc)
+        generate_s = time.perf_counter() - t0
+
+        pre = run_measured([sys.executable, "-m", "scripts.preprocess_docs"], env)
+        idx = run_measured([sys.executable, "-m", "scripts.build_vector_db"], env)
+        qry = run_measured(
+            [sys.executable, "-m", "scripts.bench_scaling", "--query-worker",
+             "--repeat", str(args.repeat), "--top-k", str(args.top_k)],
+            env,
+        )
+        query = json.loads(qry["stdout"].strip().splitlines()[-1])
+
+        return {
+            "chunks": size,
+            "raw_mb": round(dir_size(work / "raw") / 1e6, 2),
+            "generate_s": round(generate_s, 2),
+            "preprocess_s": pre["seconds"],
+            "preprocess_peak_rss_mb": pre["peak_rss_mb"],
+            "processed_mb": round(dir_size(work / "processed") / 1e6, 2),
+            "index_s": idx["seconds"],
+            "index_peak_rss_mb": idx["peak_rss_mb"],
+            "index_disk_mb": round((dir_size(work / "vector_db") + dir_size(work / "flat_index")) / 1e6, 2),
+            "query_first_s": query["first_query_s"],
+            "query_p50_ms": query["p50_ms"],
+            "query_p99_ms": query["p99_ms"],
+            "query_peak_rss_mb": query["peak_rss_mb"],
+        }
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--chunks-per-doc", type=int, default=20)
+    parser.add_argument("--embedding-backend", choices=["torch", "onnx", "hash"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--scratch", type=Path, help="Directory for generated corpora (default: system temp)")
+    parser.add_argument("--keep", action="store_true", help="Keep generated corpora and indexes")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    parser.add_argument("--query-worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.query_worker:
+        query_worker(args.repeat, args.top_k)
+        return
+
+    results = []
+    print(f"{'chunks':>10} {'prep s':>8} {'prep MB':>8} {'index s':>8} {'index MB':>9} {'disk MB':>9} "
+          f"{'q p50 ms':>9} {'q p99 ms':>9} {'q RSS MB':>9}")
+    for size in args.sizes:
+        r = bench_size(size, args)
+        results.append(r)
+        print(f"{r['chunks']:>10} {r['preprocess_s']:>8.1f} {r['preprocess_peak_rss_mb']:>8.0f} "
+              f"{r['index_s']:>8.1f} {r['index_peak_rss_mb']:>9.0f} {r['index_disk_mb']:>9.1f} "
+              f"{r['query_p50_ms']:>9.2f} {r['query_p99_ms']:>9.2f} {r['query_peak_rss_mb']:>9.0f}", flush=True)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark scatter-gather sharded retrieval against one in-process flat index.
+
+Splits clustered synthetic vectors (see scripts/bench_quantization.py) into
+1, 2, 4, ... shards by id hash, starts one local shard process per shard
+(scripts/shard_server.py) and measures, for top-k queries sent from the
+benchmark process:
+
+* single-query latency (p50 / p95) and throughput with concurrent clients
+* whether the merged top-k is identical to the unsharded result
+* partial results: latency and recall while one shard is frozen (SIGSTOP)
+
+Usage:
+    python -m scripts.bench_sharding                           # 200k rows, 1/2/4 shards
+    python -m scripts.bench_sharding --rows 1000000 --shards 1,2,4,8 --clients 8
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+
+def build_shards(work: Path, vectors, n_shards: int) -> Path:
+    from app.flat_index import write_flat_index
+    from app.shards import shard_dir, shard_of
+
+    root = work / f"shards_{n_shards}"
+    ids = [str(i) for i in range(len(vectors))]
+    owner = [shard_of(i, n_shards) for i in ids]
+    for shard in range(n_shards):
+        rows = [r for r, s in enumerate(owner) if s == shard]
+        write_flat_index(
+            ids=[ids[r] for r in rows],
+            embeddings=vectors[rows],
+            documents=[""] * len(rows),
+            metadatas=[{"chunk_index": 0} for _ in rows],
+            index_dir=shard_dir(shard, root),
+        )
+    return root
+
+
+def start_shards(work: Path, root: Path, n_shards: int) -> List[subprocess.Popen]:
+    from app.shards import shard_dir
+
+    env = {**os.environ, "SHARD_COUNT": str(n_shards)}
+    procs = []
+    for shard in range(n_shards):
+        address = f"unix:{work}/shard_{n_shards}_{shard}.sock"
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "scripts.shard_server", "--shard", str(shard), "--address", address,
+             "--index-dir", str(shard_dir(shard, root))],
+            cwd=BASE_DIR, env=env, stdout=subprocess.PIPE, text=True,
+        ))
+    for proc in procs:
+        proc.stdout.readline()  # "Shard i serving ..."
+    return procs
+
+
+def measure(collection, queries, top_k: int, clients: int, duration: float) -> Dict:
+    latencies = []
+    results = []
+    for q in queries:
+        t0 = time.perf_counter()
+        res = collection.query(query_embeddings=[q], n_results=top_k, include=[])
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append(res["ids"][0])
+    latencies.sort()
+
+    counts = [0] * clients
+    deadline = time.perf_counter() + duration
+
+    def run(i: int) -> None:
+        n = i
+        while time.perf_counter() < deadline:
+            collection.query(query_embeddings=[queries[n % len(queries)]], n_results=top_k, include=[])
+            counts[i] += 1
+            n += clients
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+        "qps": round(sum(counts) / duration, 1),
+        "ids": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--shards", default="1,2,4", help="Comma-separated shard counts")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent client threads for the QPS run")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of the QPS run")
+    parser.add_argument("--timeout", type=float, default=0.5, help="Per-shard timeout in seconds")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    import numpy as np
+
+    from app.flat_index import FlatCollection, write_flat_index
+    from app.shards import ShardedCollection
+    from scripts.bench_quantization import prepare_dataset
+
+    work = Path(tempfile.mkdtemp(prefix="bench_shards_"))
+    results = {}
+    try:
+        prepare_dataset(work, args.rows, False, args.queries, args.dim)
+        vectors = np.load(work / "vectors.npy")
+        queries = np.load(work / "queries.npy")
+
+        n = len(vectors)
+        write_flat_index(
+            ids=[str(i) for i in range(n)],
+            embeddings=vectors,
+            documents=[""] * n,
+            metadatas=[{"chunk_index": 0} for _ in range(n)],
+            index_dir=work / "single",
+        )
+        single = measure(FlatCollection(work / "single"), queries, args.top_k, args.clients, args.duration)
+        exact = single.pop("ids")
+        results["in-process"] = {**single, "identical": True}
+
+        for n_shards in [int(x) for x in args.shards.split(",")]:
+            root = build_shards(work, vectors, n_shards)
+            procs = start_shards(work, root, n_shards)
+            try:
+                addresses = [f"unix:{work}/shard_{n_shards}_{i}.sock" for i in range(n_shards)]
+                collection = ShardedCollection(addresses, timeout_s=args.timeout)
+                res = measure(collection, queries, args.top_k, args.clients, args.duration)
+                res["identical"] = res.pop("ids") == exact
+
+                # One shard frozen: every query waits for the deadline and loses that shard's rows
+                os.kill(procs[0].pid, signal.SIGSTOP)
+                t0 = time.perf_counter()
+                partial = [collection.query(query_embeddings=[q], n_results=args.top_k, include=[])
+                           for q in queries[:20]]
+                os.kill(procs[0].pid, signal.SIGCONT)
+                res["frozen_ms"] = round((time.perf_counter() - t0) * 1000 / len(partial), 1)
+                res["frozen_recall"] = round(statistics.mean(
+                    len(set(p["ids"][0]) & set(want)) / len(want) for p, want in zip(partial, exact)
+                ), 3)
+                results[f"{n_shards} shard(s)"] = res
+            finally:
+                for proc in procs:
+                    proc.terminate()
+                for proc in procs:
+                    proc.wait()
+            shutil.rmtree(root, ignore_errors=True)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    print("=" * 86)
+    print(f"{args.rows} rows, dim {args.dim}, top-{args.top_k}, {args.clients} clients, timeout {args.timeout}s")
+    print(f"{'setup':<14} {'p50 ms':>8} {'p95 ms':>8} {'qps':>8} {'identical':>10} "
+          f"{'frozen ms':>10} {'frozen recall':>14}")
+    print("-" * 86)
+    for setup, r in results.items():
+        print(f"{setup:<14} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['qps']:>8.1f} {str(r['identical']):>10} "
+              f"{r.get('frozen_ms', 0):>10.1f} {r.get('frozen_recall', 1.0):>14.3f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
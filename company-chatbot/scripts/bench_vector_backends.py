@@ -0,0 +1,249 @@
+"""
+Benchmark the Chroma PersistentClient against the flat mmap'd NumPy index.
+
+The dataset is either the real processed corpus (encoded once with the
+configured embedding backend, optionally replicated to scale it up) or
+synthetic random unit vectors. Build and query phases of every backend run
+in separate interpreters, so peak RSS reflects what a serving process holds.
+
+Reported per backend: build time, index size on disk, open time, per-query
+latency (p50 / p95) with RBAC for a rotating set of roles, peak RSS, and the
+overlap of the returned ids with the flat (exact) results.
+
+Usage:
+    python -m scripts.bench_vector_backends                       # real corpus
+    python -m scripts.bench_vector_backends --replicate 100       # ~15k rows
+    python -m scripts.bench_vector_backends --synthetic 200000 --dtype float16
+"""
+import argparse
+import json
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+BACKENDS = ["chroma", "flat"]
+CHROMA_MAX_BATCH = 5000
+
+
+def dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def prepare_dataset(work: Path, synthetic: int, replicate: int, n_queries: int) -> None:
+    import numpy as np
+
+    from app.config import DEPARTMENT_TO_ROLES, DEPARTMENTS, DEPARTMENT_IDS
+
+    rng = np.random.default_rng(0)
+
+    if synthetic:
+        dim = 384
+        vectors = rng.normal(size=(synthetic, dim)).astype(np.float32)
+        depts = rng.choice(DEPARTMENTS, size=synthetic)
+        records = [
+            {
+                "id": f"synthetic/{i}",
+                "text": f"synthetic chunk {i}",
+                "metadata": {
+                    "source_file": f"doc_{i // 50}.md",
+                    "source_path": f"{d}/doc_{i // 50}.md",
+                    "department": DEPARTMENT_IDS[d],
+                    "chunk_index": i % 50,
+                    "allowed_roles": ",".join(DEPARTMENT_TO_ROLES.get(d, [])),
+                },
+            }
+            for i, d in enumerate(depts)
+        ]
+        queries = rng.normal(size=(n_queries, dim)).astype(np.float32)
+    else:
+        from app.vectorstore import chunk_metadata, get_embedding_model, load_chunks
+        from scripts.test_search import TEST_QUERIES
+
+        chunks = load_chunks()
+        model = get_embedding_model()
+        base = model.encode([c["text"] for c in chunks], batch_size=64)
+        parts, records = [], []
+        for r in range(replicate):
+            # Small jitter keeps replicas distinct without changing the neighbourhood much
+            parts.append(base if r == 0 else base + rng.normal(scale=0.01, size=base.shape).astype(np.float32))
+            for c in chunks:
+                records.append({"id": f"{c['id']}#{r}", "text": c["text"], "metadata": chunk_metadata(c)})
+        vectors = np.concatenate(parts)
+        texts = sorted({q for q, _ in TEST_QUERIES})
+        queries = model.encode((texts * (n_queries // len(texts) + 1))[:n_queries])
+
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.save(work / "vectors.npy", vectors)
+    np.save(work / "queries.npy", queries)
+    with (work / "records.jsonl").open("w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec) + "\n")
+
+
+def load_records(work: Path) -> List[Dict]:
+    with (work / "records.jsonl").open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def build(backend: str, work: Path, dtype: str) -> Dict:
+    import numpy as np
+
+    vectors = np.load(work / "vectors.npy")
+    records = load_records(work)
+    index_dir = work / f"index_{backend}"
+
+    t0 = time.perf_counter()
+    if backend == "flat":
+        from app.flat_index import write_flat_index
+
+        write_flat_index(
+            ids=[r["id"] for r in records],
+            embeddings=vectors,
+            documents=[r["text"] for r in records],
+            metadatas=[r["metadata"] for r in records],
+            index_dir=index_dir,
+            dtype=dtype,
+        )
+    else:
+        import chromadb
+        from chromadb.config import Settings
+
+        client = chromadb.PersistentClient(path=str(index_dir), settings=Settings(anonymized_telemetry=False))
+        collection = client.get_or_create_collection(name="bench", metadata={"hnsw:space": "cosine"})
+        for i in range(0, len(records), CHROMA_MAX_BATCH):
+            batch = records[i : i + CHROMA_MAX_BATCH]
+            collection.add(
+                ids=[r["id"] for r in batch],
+                embeddings=vectors[i : i + len(batch)].tolist(),
+                documents=[r["text"] for r in batch],
+                metadatas=[r["metadata"] for r in batch],
+            )
+    build_s = time.perf_counter() - t0
+
+    return {"build_s": round(build_s, 3), "disk_mb": round(dir_size(index_dir) / 1e6, 2)}
+
+
+def query(backend: str, work: Path, top_k: int) -> Dict:
+    import numpy as np
+
+    from app.config import ROLES
+
+    queries = np.load(work / "queries.npy")
+    index_dir = work / f"index_{backend}"
+
+    t0 = time.perf_counter()
+    if backend == "flat":
+        from app.flat_index import FlatCollection
+
+        collection = FlatCollection(index_dir)
+    else:
+        import chromadb
+        from chromadb.config import Settings
+
+        client = chromadb.PersistentClient(path=str(index_dir), settings=Settings(anonymized_telemetry=False))
+        collection = client.get_collection("bench")
+    open_s = time.perf_counter() - t0
+
+    latencies_ms: List[float] = []
+    results: List[List[str]] = []
+    for qi, q in enumerate(queries):
+        role = ROLES[qi % len(ROLES)]
+        t0 = time.perf_counter()
+        if backend == "flat":
+            res = collection.query(
+                query_embeddings=[q.tolist()], n_results=top_k, include=["distances"], allowed_role=role
+            )
+            ids = res["ids"][0]
+        else:
+            # Same over-fetch + post-filter strategy as app.search.semantic_search
+            res = collection.query(
+                query_embeddings=[q.tolist()], n_results=max(top_k * 5, 20), include=["metadatas", "distances"]
+            )
+            ids = [
+                _id for _id, meta in zip(res["ids"][0], res["metadatas"][0])
+                if role in meta["allowed_roles"].split(",")
+            ][:top_k]
+        latencies_ms.append((time.perf_counter() - t0) * 1000)
+        results.append(ids)
+
+    latencies_ms.sort()
+    return {
+        "open_s": round(open_s, 3),
+        "queries": len(latencies_ms),
+        "p50_ms": round(statistics.median(latencies_ms), 3),
+        "p95_ms": round(latencies_ms[int(0.95 * (len(latencies_ms) - 1))], 3),
+        "qps": round(len(latencies_ms) / (sum(latencies_ms) / 1000), 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "ids": results,
+    }
+
+
+def run_phase(phase: str, backend: str, args, work: Path) -> Dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "scripts.bench_vector_backends", "--phase", phase, "--backend", backend,
+         "--work", str(work), "--top-k", str(args.top_k), "--dtype", args.dtype],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{phase} for {backend} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of the corpus")
+    parser.add_argument("--replicate", type=int, default=1, help="Replicate the real corpus R times")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path")
+    parser.add_argument("--phase", choices=["build", "query"], help=argparse.SUPPRESS)
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--work", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase == "build":
+        print(json.dumps(build(args.backend, args.work, args.dtype)))
+        return
+    if args.phase == "query":
+        print(json.dumps(query(args.backend, args.work, args.top_k)))
+        return
+
+    work = Path(tempfile.mkdtemp(prefix="bench_vectors_"))
+    try:
+        prepare_dataset(work, args.synthetic, args.replicate, args.queries)
+        results = {}
+        for backend in BACKENDS:
+            results[backend] = {**run_phase("build", backend, args, work), **run_phase("query", backend, args, work)}
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    exact = results["flat"]["ids"]
+    print("=" * 96)
+    print(f"{'backend':<8} {'build s':>8} {'disk MB':>8} {'open s':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'qps':>8} {'peak MB':>8} {'overlap@' + str(args.top_k):>10}")
+    print("-" * 96)
+    for backend, res in results.items():
+        overlaps = [len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(res.pop("ids"), exact)]
+        res["overlap_vs_flat"] = round(statistics.mean(overlaps), 4) if overlaps else None
+        print(f"{backend:<8} {res['build_s']:>8.2f} {res['disk_mb']:>8.2f} {res['open_s']:>7.3f} "
+              f"{res['p50_ms']:>8.3f} {res['p95_ms']:>8.3f} {res['qps']:>8.1f} {res['peak_rss_mb']:>8.1f} "
+              f"{res['overlap_vs_flat']:>10.3f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
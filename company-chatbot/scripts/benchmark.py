@@ -0,0 +1,410 @@
+"""
+Reproducible retrieval + RAG benchmark suite.
+
+Sections (all by default, pick with --only):
+  encode   single-query encode latency, batch encode throughput
+  search   in-process semantic_search latency per role
+  recall   recall@k / hit@k against data/benchmarks/labeled_queries.jsonl,
+           plus an RBAC leak check (hits from departments the role can't see)
+  http     end-to-end POST /search and /rag latency + throughput at
+           --concurrency, against a uvicorn server and the local LLM stub
+           (scripts/llm_stub_server.py) that the suite starts itself
+
+Results are written as JSON together with the git commit and the relevant
+config, so runs from different commits can be diffed with --compare.
+
+Usage:
+    python -m scripts.benchmark --out bench.json
+    python -m scripts.benchmark --only http --concurrency 16 --requests 400 --llm-latency-ms 500
+    python -m scripts.benchmark --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+LABELED_QUERIES_PATH = BASE_DIR / "data" / "benchmarks" / "labeled_queries.jsonl"
+
+SECTIONS = ["encode", "search", "recall", "http"]
+
+# Seed users created by app.main.lifespan
+SEED_USERS = {
+    "finance": "alice_fin",
+    "marketing": "bob_mark",
+    "hr": "carol_hr",
+    "engineering": "dave_eng",
+    "employee": "erin_emp",
+    "c_level": "ceo",
+}
+SEED_PASSWORD = "password123"
+
+# Env vars that change what is being measured; recorded with every run
+CONFIG_ENV = [
+    "EMBEDDING_BACKEND",
+    "EMBEDDING_ONNX_QUANTIZE",
+    "EMBEDDING_NUM_THREADS",
+    "VECTOR_BACKEND",
+    "FLAT_INDEX_DTYPE",
+    "RERANK_ENABLED",
+    "RERANK_BUDGET_MS",
+    "MMR_ENABLED",
+    "MMR_LAMBDA",
+    "DEDUP_ENABLED",
+    "TRACING_ENABLED",
+]
+
+
+# ---------------------------
+# Helpers
+# ---------------------------
+def load_labeled_queries(path: Path = LABELED_QUERIES_PATH) -> List[Dict[str, Any]]:
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def latency_stats(samples_ms: List[float]) -> Dict[str, float]:
+    if not samples_ms:
+        return {"n": 0}
+    ordered = sorted(samples_ms)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.mean(ordered), 3),
+        "p50_ms": round(pct(0.50), 3),
+        "p90_ms": round(pct(0.90), 3),
+        "p99_ms": round(pct(0.99), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def git_info() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        proc = subprocess.run(["git", *args], cwd=BASE_DIR, capture_output=True, text=True)
+        return proc.stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def flatten(data: Any, prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            out.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        out[prefix] = float(data)
+    return out
+
+
+# ---------------------------
+# In-process sections
+# ---------------------------
+def bench_encode(repeat: int) -> Dict[str, Any]:
+    from app.vectorstore import get_embedding_model, load_chunks
+
+    queries = [q["query"] for q in load_labeled_queries()]
+    texts = [c["text"] for c in load_chunks()][:256]
+
+    t0 = time.perf_counter()
+    model = get_embedding_model()
+    model.encode(["warm up"])
+    load_s = time.perf_counter() - t0
+
+    single = []
+    for _ in range(repeat):
+        for q in queries:
+            t0 = time.perf_counter()
+            model.encode([q])
+            single.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    model.encode(texts, batch_size=64)
+    batch_s = time.perf_counter() - t0
+
+    return {
+        "model": model.name,
+        "load_s": round(load_s, 3),
+        "single_query": latency_stats(single),
+        "batch_chunks_per_s": round(len(texts) / batch_s, 1) if batch_s else None,
+    }
+
+
+def bench_search(repeat: int, top_k: int) -> Dict[str, Any]:
+    from app.config import ROLES
+    from app.search import semantic_search
+
+    queries = sorted({q["query"] for q in load_labeled_queries()})
+    semantic_search(queries[0], ROLES[0], top_k)  # warm up
+
+    per_role = {}
+    for role in ROLES:
+        samples = []
+        for _ in range(repeat):
+            for q in queries:
+                t0 = time.perf_counter()
+                semantic_search(q, role, top_k)
+                samples.append((time.perf_counter() - t0) * 1000)
+        per_role[role] = latency_stats(samples)
+    return per_role
+
+
+def bench_recall(ks: List[int], rerank: Optional[bool], diversify: Optional[bool] = None) -> Dict[str, Any]:
+    from app.rbac import allowed_roles_from_metadata
+    from app.search import semantic_search
+
+    labeled = load_labeled_queries()
+    recall = {k: [] for k in ks}
+    hit = {k: [] for k in ks}
+    leaks = 0
+
+    for item in labeled:
+        role = item["role"]
+        hits = semantic_search(item["query"], role, top_k=max(ks), rerank=rerank, diversify=diversify)
+        retrieved = [f"{h['metadata'].get('department')}/{h['metadata'].get('source_file')}" for h in hits]
+
+        # allowed_roles, not the department: a merged near-duplicate is visible to every source's roles
+        leaks += sum(1 for h in hits if role not in allowed_roles_from_metadata(h["metadata"]))
+
+        relevant = set(item["relevant"])
+        if not relevant:
+            continue  # RBAC-only probe
+        for k in ks:
+            found = relevant & set(retrieved[:k])
+            recall[k].append(len(found) / len(relevant))
+            hit[k].append(1.0 if found else 0.0)
+
+    return {
+        "queries": len(labeled),
+        "rerank": rerank,
+        "diversify": diversify,
+        **{f"recall@{k}": round(statistics.mean(recall[k]), 4) for k in ks},
+        **{f"hit@{k}": round(statistics.mean(hit[k]), 4) for k in ks},
+        "rbac_leaks": leaks,
+    }
+
+
+# ---------------------------
+# HTTP load generator
+# ---------------------------
+def wait_for_http(url: str, timeout_s: float = 120.0) -> None:
+    import httpx
+
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def start_servers(args) -> List[subprocess.Popen]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "LLM_PROVIDER": "openai",
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+        }
+    )
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "scripts.llm_stub_server", "--port", str(args.llm_port),
+             "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms)],
+            cwd=BASE_DIR,
+        ),
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.api_port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=BASE_DIR,
+            env=env,
+        ),
+    ]
+    wait_for_http(f"http://127.0.0.1:{args.llm_port}/stats")
+    wait_for_http(f"http://127.0.0.1:{args.api_port}/openapi.json")
+    return procs
+
+
+async def run_load(
+    base_url: str,
+    endpoint: str,
+    concurrency: int,
+    total_requests: int,
+    top_k: int,
+) -> Dict[str, Any]:
+    import httpx
+
+    labeled = load_labeled_queries()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        tokens = {}
+        for role, username in SEED_USERS.items():
+            resp = await client.post("/auth/login", data={"username": username, "password": SEED_PASSWORD})
+            resp.raise_for_status()
+            tokens[role] = resp.json()["access_token"]
+
+        latencies: List[float] = []
+        statuses: Dict[str, int] = {}
+        counter = {"next": 0}
+
+        async def worker():
+            while counter["next"] < total_requests:
+                i = counter["next"]
+                counter["next"] += 1
+                item = labeled[i % len(labeled)]
+                headers = {"Authorization": f"Bearer {tokens[item['role']]}"}
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.post(endpoint, json={"query": item["query"], "top_k": top_k}, headers=headers)
+                    code = str(resp.status_code)
+                except httpx.HTTPError as e:
+                    code = type(e).__name__
+                latencies.append((time.perf_counter() - t0) * 1000)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall_s = time.perf_counter() - t0
+
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(statuses.get("200", 0) / wall_s, 2) if wall_s else None,
+        "statuses": statuses,
+        "latency": latency_stats(latencies),
+    }
+
+
+def bench_http(args) -> Dict[str, Any]:
+    procs: List[subprocess.Popen] = []
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            procs = start_servers(args)
+            base_url = f"http://127.0.0.1:{args.api_port}"
+
+        results = {"llm_latency_ms": args.llm_latency_ms if args.base_url is None else None}
+        for endpoint in ("/search", "/rag"):
+            # A short warm-up so model loading is not part of the measurement
+            asyncio.run(run_load(base_url, endpoint, 1, 2, args.top_k))
+            results[endpoint] = asyncio.run(
+                run_load(base_url, endpoint, args.concurrency, args.requests, args.top_k)
+            )
+        return results
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+# ---------------------------
+# Main
+# ---------------------------
+def print_summary(report: Dict[str, Any]) -> None:
+    results = report["results"]
+    print("=" * 80)
+    print(f"commit {report['git']['commit'][:12]}{' (dirty)' if report['git']['dirty'] else ''}  {report['timestamp']}")
+    if "encode" in results:
+        r = results["encode"]
+        print(f"[encode] {r['model']}: p50 {r['single_query']['p50_ms']} ms, "
+              f"p99 {r['single_query']['p99_ms']} ms, batch {r['batch_chunks_per_s']} chunks/s")
+    if "search" in results:
+        for role, r in results["search"].items():
+            print(f"[search] {role:<12} p50 {r['p50_ms']:>8} ms  p99 {r['p99_ms']:>8} ms")
+    if "recall" in results:
+        r = results["recall"]
+        metrics = ", ".join(f"{k}={v}" for k, v in r.items() if k.startswith(("recall@", "hit@")))
+        print(f"[recall] {metrics}, rbac_leaks={r['rbac_leaks']}")
+    if "http" in results:
+        for endpoint in ("/search", "/rag"):
+            r = results["http"][endpoint]
+            print(f"[http]   {endpoint:<8} {r['throughput_rps']} req/s at c={r['concurrency']}, "
+                  f"p50 {r['latency']['p50_ms']} ms, p99 {r['latency']['p99_ms']} ms, statuses {r['statuses']}")
+
+
+def print_comparison(previous: Dict[str, Any], current: Dict[str, Any]) -> None:
+    before = flatten(previous.get("results", {}))
+    after = flatten(current.get("results", {}))
+    print("=" * 80)
+    print(f"vs. {previous.get('git', {}).get('commit', '?')[:12]}")
+    for key in sorted(before.keys() & after.keys()):
+        if not key.endswith(("_ms", "_rps", "_per_s")) and "@" not in key:
+            continue
+        old, new = before[key], after[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {key:<45} {old:>12.3f} -> {new:>12.3f}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", action="append", choices=SECTIONS, help="Run only these sections")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions for in-process sections")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--k", type=int, action="append", help="k values for recall (default 1,3,5)")
+    parser.add_argument("--rerank", choices=["on", "off", "default"], default="default")
+    parser.add_argument("--diversify", choices=["on", "off", "default"], default="default", help="MMR in recall")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint in the http section")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned API")
+    parser.add_argument("--api-port", type=int, default=8765)
+    parser.add_argument("--llm-port", type=int, default=8766)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--base-url", help="Benchmark an already running API instead of spawning one")
+    parser.add_argument("--out", type=Path, help="Write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="Previous JSON report to diff against")
+    args = parser.parse_args()
+
+    sections = args.only or SECTIONS
+    rerank = {"on": True, "off": False, "default": None}[args.rerank]
+    diversify = {"on": True, "off": False, "default": None}[args.diversify]
+
+    results: Dict[str, Any] = {}
+    if "encode" in sections:
+        results["encode"] = bench_encode(args.repeat)
+    if "search" in sections:
+        results["search"] = bench_search(args.repeat, args.top_k)
+    if "recall" in sections:
+        results["recall"] = bench_recall(sorted(args.k or [1, 3, 5]), rerank, diversify)
+    if "http" in sections:
+        results["http"] = bench_http(args)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_info(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {name: os.environ.get(name) for name in CONFIG_ENV},
+        "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "results": results,
+    }
+
+    print_summary(report)
+    if args.compare:
+        print_comparison(json.loads(args.compare.read_text(encoding="utf-8")), report)
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nSaved report to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Package the current index, chunk store, RBAC index and embedding model into
+one versioned snapshot for new API replicas (app/snapshot.py).
+
+    python -m scripts.build_snapshot                    # -> data/snapshots/snapshot-<version>.tar
+    SNAPSHOT_PATH=data/snapshots/snapshot-<version>.tar uvicorn app.main:app
+
+    python -m scripts.build_snapshot --verify data/snapshots/snapshot-<version>.tar
+"""
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+from app.changeset import ingest_lock
+from app.config import EMBEDDING_BACKEND, SNAPSHOT_DIR
+from app.snapshot import build_snapshot, open_snapshot, read_manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out-dir", type=Path, default=SNAPSHOT_DIR, help="Where to write the .tar")
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, help="Embedding backend whose weights to include")
+    parser.add_argument("--verify", type=Path, help="Extract and checksum an existing snapshot instead")
+    args = parser.parse_args()
+
+    if args.verify:
+        # Fresh directory: a cached extraction would only be size-checked
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot = open_snapshot(args.verify, Path(tmp), verify="full")
+            print(f"OK: {snapshot.version} ({len(snapshot.manifest['files'])} files)")
+    else:
+        # An ingest run in the middle of packaging would mix two index versions
+        with ingest_lock():
+            path = build_snapshot(args.out_dir, args.backend)
+        manifest = read_manifest(path)
+        manifest.pop("files")
+        print(f"Wrote {path} ({path.stat().st_size / 1e6:.1f} MB)")
+        print(json.dumps(manifest, indent=2))
@@ -1,4 +1,15 @@
+import argparse
+
+from app.changeset import ingest_lock
 from app.vectorstore import index_chunks
 
 if __name__ == "__main__":
-    index_chunks()
+    parser = argparse.ArgumentParser(description="Embed the preprocessed chunks into the vector index.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Apply only the pending change set from preprocess_docs instead of rebuilding",
+    )
+    args = parser.parse_args()
+    with ingest_lock():
+        index_chunks(incremental=args.incremental)
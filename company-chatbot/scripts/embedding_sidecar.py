@@ -0,0 +1,48 @@
+"""
+Run the node-local embedding sidecar (app/embedding_server.py).
+
+Start one per node, then run the API workers with EMBEDDING_BACKEND=sidecar:
+
+    python -m scripts.embedding_sidecar --threads 4
+    EMBEDDING_BACKEND=sidecar uvicorn app.main:app --workers 8
+
+--threads is the node's whole embedding thread budget. Workers no longer
+load the model or start their own torch / onnxruntime thread pools.
+"""
+import argparse
+import asyncio
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", help="Unix socket path or tcp:host:port (default: EMBEDDING_SIDECAR_SOCKET)")
+    parser.add_argument("--backend", help="torch | onnx | hash (default: EMBEDDING_SIDECAR_BACKEND)")
+    parser.add_argument("--threads", type=int, help="Inference threads (default: EMBEDDING_NUM_THREADS)")
+    parser.add_argument("--max-batch", type=int, help="Texts per model call (default: EMBEDDING_SIDECAR_MAX_BATCH)")
+    parser.add_argument("--max-wait-ms", type=float, help="Micro-batching window (default: EMBEDDING_SIDECAR_MAX_WAIT_MS)")
+    args = parser.parse_args()
+
+    # The backends read the thread budget from config at import time
+    if args.threads is not None:
+        os.environ["EMBEDDING_NUM_THREADS"] = str(args.threads)
+
+    from app import config
+    from app.embedding_server import EmbeddingServer
+    from app.embeddings import create_embedding_backend
+
+    backend = args.backend or config.EMBEDDING_SIDECAR_BACKEND
+    if backend == "sidecar":
+        raise SystemExit("The sidecar cannot serve EMBEDDING_BACKEND=sidecar; pick torch, onnx or hash.")
+
+    server = EmbeddingServer(
+        create_embedding_backend(backend),
+        max_batch=args.max_batch or config.EMBEDDING_SIDECAR_MAX_BATCH,
+        max_wait_ms=config.EMBEDDING_SIDECAR_MAX_WAIT_MS if args.max_wait_ms is None else args.max_wait_ms,
+    )
+    asyncio.run(server.serve(args.socket or config.EMBEDDING_SIDECAR_SOCKET))
+    print("Stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import argparse
+
+from app.config import ONNX_MODEL_DIR
+from app.embeddings import export_onnx_model
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (+ int8 copy)")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 quantized model")
+    args = parser.parse_args()
+
+    export_onnx_model(ONNX_MODEL_DIR, quantize=not args.no_quantize)
@@ -0,0 +1,227 @@
+"""
+Generate a synthetic, department-structured corpus for scale testing.
+
+Produces the same layout as data/raw, i.e. one folder per config.DEPARTMENTS
+entry with markdown reports, plus HR-style CSV files under HR/ with the
+columns of hr_data.csv. Sizes are expressed in *chunks* as produced by
+scripts/preprocess_docs.py (300-word chunks with 50-word overlap for markdown,
+one chunk per CSV row), so `--chunks 1000000` yields ~1M chunks.
+
+Usage:
+    python -m scripts.generate_synthetic_corpus --out /tmp/corpus_100k --chunks 100000
+    DATA_RAW_DIR=/tmp/corpus_100k python -m scripts.preprocess_docs
+"""
+import argparse
+import csv
+import json
+import math
+import random
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from app.config import DEPARTMENTS
+
+# Share of the total chunk count per department (HR share = CSV rows)
+DEFAULT_WEIGHTS = {
+    "Finance": 0.15,
+    "HR": 0.25,
+    "engineering": 0.25,
+    "general": 0.10,
+    "marketing": 0.25,
+}
+
+# Must match scripts/preprocess_docs.chunk_text defaults
+CHUNK_WORDS = 300
+CHUNK_OVERLAP = 50
+
+HR_COLUMNS = [
+    "employee_id", "full_name", "role", "department", "email", "location", "date_of_birth",
+    "date_of_joining", "manager_id", "salary", "leave_balance", "leaves_taken", "attendance_pct",
+    "performance_rating", "last_review_date",
+]
+
+VOCABULARY = {
+    "Finance": [
+        "revenue", "gross margin", "operating expenses", "vendor services", "cash flow", "EBITDA",
+        "net income", "accounts receivable", "capital expenditure", "quarterly forecast", "liquidity",
+        "cost optimization", "budget variance", "software subscriptions", "profitability", "audit",
+    ],
+    "HR": [
+        "onboarding", "attrition", "performance review", "leave policy", "compensation", "headcount",
+        "training", "employee engagement", "payroll", "benefits", "recruitment", "promotion cycle",
+    ],
+    "engineering": [
+        "microservices", "API gateway", "Kubernetes", "CI/CD pipeline", "observability", "latency",
+        "circuit breaker", "database sharding", "caching layer", "incident response", "code review",
+        "infrastructure as code", "load balancer", "message queue", "SLO", "disaster recovery",
+    ],
+    "general": [
+        "code of conduct", "work hours", "reimbursement", "public holidays", "dress code", "well-being",
+        "data privacy", "health and safety", "career growth", "feedback", "attendance", "exit policy",
+    ],
+    "marketing": [
+        "campaign", "customer acquisition cost", "conversion rate", "brand awareness", "retention",
+        "digital marketing", "influencer partnerships", "email retargeting", "market share", "ROI",
+        "lead generation", "social media engagement", "B2B initiatives", "regional expansion",
+    ],
+}
+
+FILLER = [
+    "the team", "this quarter", "our customers", "the company", "leadership", "the region",
+    "compared to last year", "across all business units", "in line with targets", "as planned",
+]
+VERBS = ["improved", "declined", "stabilized", "was reviewed", "increased by", "drove", "affected", "supported"]
+
+FIRST_NAMES = ["Aadhya", "Isha", "Krishna", "Shaurya", "Sara", "Prisha", "Sai", "Vihaan", "Arjun", "Diya", "Kabir", "Meera"]
+LAST_NAMES = ["Patel", "Chowdhury", "Malhotra", "Saxena", "Joshi", "Sharma", "Mehta", "Gupta", "Reddy", "Iyer", "Nair"]
+JOB_ROLES = [
+    ("Sales Manager", "Sales"), ("Credit Officer", "Finance"), ("Business Analyst", "Business"),
+    ("Marketing Manager", "Marketing"), ("Financial Analyst", "Finance"), ("QA Engineer", "Quality Assurance"),
+    ("Customer Support", "Operations"), ("HR Manager", "HR"), ("Software Engineer", "Technology"),
+    ("Data Scientist", "Data"), ("Risk Analyst", "Risk"), ("Compliance Officer", "Compliance"),
+]
+LOCATIONS = ["Ahmedabad", "Pune", "Hyderabad", "Kolkata", "Bangalore", "Chennai", "Delhi", "Mumbai"]
+
+
+def words_for_chunks(chunks: int) -> int:
+    """
+    Word count that chunk_text() splits into exactly `chunks` chunks.
+    """
+    return CHUNK_WORDS + (CHUNK_WORDS - CHUNK_OVERLAP) * (chunks - 1)
+
+
+def paragraph_pool(rng: random.Random, department: str, size: int = 256) -> List[List[str]]:
+    """
+    Pre-rendered paragraphs (as word lists) so generation is mostly joins.
+    """
+    vocab = VOCABULARY.get(department, VOCABULARY["general"])
+    pool = []
+    for _ in range(size):
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            sentences.append(
+                f"{rng.choice(vocab).capitalize()} {rng.choice(VERBS)} {rng.randint(1, 40)}% "
+                f"{rng.choice(FILLER)}, while {rng.choice(vocab)} {rng.choice(VERBS)} {rng.choice(FILLER)}."
+            )
+        pool.append(" ".join(sentences).split())
+    return pool
+
+
+def render_markdown(rng: random.Random, department: str, doc_no: int, chunks: int, pool: List[List[str]]) -> str:
+    target = words_for_chunks(chunks)
+    title = f"# {department} Report {doc_no} - FinSolve Technologies".split()
+    lines = [" ".join(title)]
+    written = len(title)
+    section = 1
+    while written < target:
+        heading = ["##", "Section", str(section)]
+        block = (heading + rng.choice(pool))[: target - written]
+        lines.append(" ".join(block[:3]))
+        if len(block) > 3:
+            lines.append(" ".join(block[3:]))
+        written += len(block)
+        section += 1
+    return "\n\n".join(lines) + "\n"
+
+
+def write_markdown_department(
+    rng: random.Random,
+    folder: Path,
+    department: str,
+    total_chunks: int,
+    chunks_per_doc: int,
+) -> int:
+    pool = paragraph_pool(rng, department)
+    docs = math.ceil(total_chunks / chunks_per_doc) if total_chunks else 0
+    written = 0
+    for doc_no in range(docs):
+        chunks = min(chunks_per_doc, total_chunks - written)
+        text = render_markdown(rng, department, doc_no, chunks, pool)
+        (folder / f"{department.lower()}_report_{doc_no:07d}.md").write_text(text, encoding="utf-8")
+        written += chunks
+    return written
+
+
+def write_hr_csv(rng: random.Random, folder: Path, rows: int, rows_per_file: int) -> int:
+    start = date(2015, 1, 1)
+    file_no = 0
+    for offset in range(0, rows, rows_per_file):
+        path = folder / f"hr_data_{file_no:04d}.csv"
+        with path.open("w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HR_COLUMNS)
+            for n in range(offset, min(offset + rows_per_file, rows)):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                job, dept = rng.choice(JOB_ROLES)
+                writer.writerow([
+                    f"FINEMP{1000 + n}",
+                    f"{first} {last}",
+                    job,
+                    dept,
+                    f"{first.lower()}.{last.lower()}{n}@fintechco.com",
+                    rng.choice(LOCATIONS),
+                    (date(1970, 1, 1) + timedelta(days=rng.randint(0, 12000))).isoformat(),
+                    (start + timedelta(days=rng.randint(0, 3500))).isoformat(),
+                    f"FINEMP{1000 + rng.randint(0, max(rows // 10, 1))}",
+                    round(rng.uniform(300000, 3000000), 2),
+                    rng.randint(0, 30),
+                    rng.randint(0, 25),
+                    round(rng.uniform(70, 100), 2),
+                    rng.randint(1, 5),
+                    (date(2024, 1, 1) + timedelta(days=rng.randint(0, 300))).isoformat(),
+                ])
+        file_no += 1
+    return rows
+
+
+def generate_corpus(
+    out: Path,
+    chunks: int,
+    chunks_per_doc: int = 20,
+    hr_rows_per_file: int = 100000,
+    weights: Dict[str, float] = DEFAULT_WEIGHTS,
+    seed: int = 0,
+) -> Dict[str, int]:
+    rng = random.Random(seed)
+    out.mkdir(parents=True, exist_ok=True)
+
+    total_weight = sum(weights.get(d, 0.0) for d in DEPARTMENTS)
+    counts = {d: int(chunks * weights.get(d, 0.0) / total_weight) for d in DEPARTMENTS}
+    # Put the rounding remainder in the largest department
+    counts[max(counts, key=counts.get)] += chunks - sum(counts.values())
+
+    produced = {}
+    for department in DEPARTMENTS:
+        folder = out / department
+        folder.mkdir(parents=True, exist_ok=True)
+        if department == "HR":
+            produced[department] = write_hr_csv(rng, folder, counts[department], hr_rows_per_file)
+        else:
+            produced[department] = write_markdown_department(
+                rng, folder, department, counts[department], chunks_per_doc
+            )
+    return produced
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", type=Path, required=True, help="Output raw-data directory")
+    parser.add_argument("--chunks", type=int, default=10000, help="Target total chunk count (10k .. 10M)")
+    parser.add_argument("--chunks-per-doc", type=int, default=20, help="Chunks per markdown file")
+    parser.add_argument("--hr-rows-per-file", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    produced = generate_corpus(args.out, args.chunks, args.chunks_per_doc, args.hr_rows_per_file, seed=args.seed)
+    elapsed = time.perf_counter() - t0
+
+    summary = {"out": str(args.out), "chunks": produced, "total_chunks": sum(produced.values()), "seconds": round(elapsed, 2)}
+    (args.out / "corpus_manifest.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
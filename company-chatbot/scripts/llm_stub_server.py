@@ -0,0 +1,144 @@
+"""
+Local OpenAI / Groq compatible chat-completions stub with configurable latency
+and fault injection.
+
+Lets benchmarks exercise the full /rag path (LLMClient -> provider SDK -> HTTP)
+without external calls, rate limits or cost, and lets the resilience scenarios
+(scripts/test_llm_resilience.py) play an unhealthy provider.
+
+    python -m scripts.llm_stub_server --port 9000 --latency-ms 400 --jitter-ms 100
+    python -m scripts.llm_stub_server --port 9000 --error-rate 0.3 --error-status 503
+    python -m scripts.llm_stub_server --port 9000 --slow-rate 0.05 --slow-ms 3000
+
+Behaviour can be changed at runtime with POST /config (same keys as
+create_app's arguments); GET /stats returns request / error counts.
+
+Point the app at it with:
+
+    LLM_PROVIDER=openai  OPENAI_API_KEY=stub  OPENAI_BASE_URL=http://127.0.0.1:9000/v1
+    LLM_PROVIDER=groq    GROQ_API_KEY=stub    GROQ_BASE_URL=http://127.0.0.1:9000
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    answer: str | None = None,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    slow_rate: float = 0.0,
+    slow_ms: float = 0.0,
+) -> FastAPI:
+    app = FastAPI(title="LLM stub")
+    settings = {
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "answer": answer,
+        "error_rate": error_rate,      # share of requests answered with error_status
+        "error_status": error_status,
+        "slow_rate": slow_rate,        # share of requests delayed by slow_ms on top (tail latency)
+        "slow_ms": slow_ms,
+    }
+    stats = {"requests": 0, "errors": 0, "slow": 0}
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+
+        delay = max(0.0, settings["latency_ms"] + random.uniform(-settings["jitter_ms"], settings["jitter_ms"]))
+        if random.random() < settings["slow_rate"]:
+            stats["slow"] += 1
+            delay += settings["slow_ms"]
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        if random.random() < settings["error_rate"]:
+            stats["errors"] += 1
+            return JSONResponse(
+                status_code=settings["error_status"],
+                content={"error": {"message": "Injected failure", "type": "stub_error"}},
+            )
+
+        prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+        content = settings["answer"] or f"Stub answer based on SOURCE 1 ({len(prompt)} prompt chars)."
+        prompt_tokens = len(prompt.split())
+        completion_tokens = len(content.split())
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    # OpenAI SDK posts to {base_url}/chat/completions, Groq SDK to /openai/v1/...
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/openai/v1/chat/completions", chat_completions, methods=["POST"])
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    @app.post("/config")
+    async def update_config(request: Request):
+        updates = await request.json()
+        reset_stats = updates.pop("reset_stats", True)
+        unknown = set(updates) - set(settings)
+        if unknown:
+            return JSONResponse(status_code=400, content={"error": f"Unknown keys: {sorted(unknown)}"})
+        settings.update(updates)
+        if reset_stats:
+            stats.update({"requests": 0, "errors": 0, "slow": 0})
+        return settings
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--answer", help="Fixed answer text")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests with extra delay")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="Extra delay for slow requests")
+    args = parser.parse_args()
+
+    app = create_app(
+        args.latency_ms,
+        args.jitter_ms,
+        args.answer,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
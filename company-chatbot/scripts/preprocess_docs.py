@@ -1,19 +1,44 @@
+import argparse
+import hashlib
 import json
 import re
+import time
 from pathlib import Path
-from typing import List, Dict
+from typing import Any, List, Dict, Optional
 
 import pandas as pd
 
+from app.changeset import ChangeSet, file_sha256, ingest_lock, load_manifest, save_manifest, save_pending_changeset
+from app.chunk_store import ChunkStore, write_chunk_store
+from app.dedupe import dedupe_chunks, raw_chunk
+from app.hr_stats import update_hr_stats
 from app.config import (
     BASE_DIR,
     DATA_RAW_DIR,
     DATA_PROCESSED_DIR,
+    CHANGESET_PATH,
+    CHUNK_STORE_DIR,
+    CHUNKS_JSONL_EXPORT,
+    CHUNKS_JSONL_PATH,
+    DEDUP_BANDS,
+    DEDUP_ENABLED,
+    DEDUP_NUM_PERM,
+    DEDUP_SHINGLE_WORDS,
+    DEDUP_THRESHOLD,
     DEPARTMENTS,
     DEPARTMENT_IDS,
     DEPARTMENT_TO_ROLES,
+    HR_STATS_ENABLED,
 )
 
+# Chunking parameters for markdown files
+CHUNK_MAX_TOKENS = 300
+CHUNK_OVERLAP = 50
+
+# Bump when the chunking / metadata logic changes, so the next incremental run
+# re-chunks every file instead of reusing chunks built by the old code
+PREPROCESS_VERSION = 2
+
 # === Basic text cleaning ===
 
 def clean_text(text: str) -> str:
@@ -87,7 +112,7 @@ def process_markdown_file(
         raw_text = f.read()
 
     cleaned = clean_text(raw_text)
-    chunks = chunk_text(cleaned, max_tokens=300, overlap=50)
+    chunks = chunk_text(cleaned, max_tokens=CHUNK_MAX_TOKENS, overlap=CHUNK_OVERLAP)
 
     dept_id = DEPARTMENT_IDS[department_folder]
     allowed_roles = DEPARTMENT_TO_ROLES.get(department_folder, [])
@@ -179,10 +204,81 @@ def process_hr_csv(
 
 # === Main preprocessing pipeline ===
 
-def preprocess_all_documents() -> None:
+def settings_fingerprint() -> str:
+    """
+    Everything besides the file contents that shapes the chunks. A change
+    invalidates the manifest and forces a full re-chunk.
+    """
+    payload = {
+        "version": PREPROCESS_VERSION,
+        "max_tokens": CHUNK_MAX_TOKENS,
+        "overlap": CHUNK_OVERLAP,
+        "department_ids": DEPARTMENT_IDS,
+        "department_roles": DEPARTMENT_TO_ROLES,
+        "dedup": [DEDUP_ENABLED, DEDUP_THRESHOLD, DEDUP_SHINGLE_WORDS, DEDUP_NUM_PERM, DEDUP_BANDS],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def process_file(file_path: Path, department_folder: str) -> Optional[List[Dict]]:
+    """
+    Chunks for one raw file, or None if the file type is not ingested.
+    """
+    suffix = file_path.suffix.lower()
+    if suffix == ".md":
+        return process_markdown_file(file_path, department_folder)
+    if suffix == ".csv" and department_folder == "HR":
+        return process_hr_csv(file_path, department_folder)
+    return None
+
+
+def load_previous_chunks() -> Optional[Dict[str, Dict]]:
+    """
+    Chunks of the last run by id, or None if there is no chunk store yet.
+    """
+    if not ChunkStore.exists():
+        return None
+    return {c["id"]: c for c in ChunkStore()}
+
+
+def reuse_chunks(entry: Dict[str, Any], previous: Dict[str, Dict]) -> Optional[List[Dict]]:
+    """
+    The chunks an unchanged file produced last time, or None if the chunk
+    store no longer has all of them (e.g. it was rebuilt by hand).
+    Duplicate merging is undone; it is redone over the whole corpus.
+    """
+    try:
+        return [raw_chunk(previous[chunk_id]) for chunk_id in entry["chunk_ids"]]
+    except KeyError:
+        return None
+
+
+def preprocess_all_documents(full: bool = False) -> ChangeSet:
+    """
+    Chunk the raw documents into the chunk store.
+
+    Incremental by default: a manifest of (mtime, size, sha256) per file lets
+    unchanged files reuse their previous chunks, so only new / modified files
+    are re-chunked and chunks of deleted files are dropped. The chunk ids to
+    upsert / remove are merged into the pending change set, which
+    `build_vector_db --incremental` applies to the vector index.
+    `full=True` (or changed chunking settings) re-chunks everything.
+    Returns this run's change set (before merging into the pending one).
+    """
+    started = time.perf_counter()
+    fingerprint = settings_fingerprint()
+    manifest = {} if full else load_manifest()
+    previous = load_previous_chunks() if manifest.get("settings") == fingerprint else None
+    full_rebuild = previous is None
+    old_files: Dict[str, Dict[str, Any]] = {} if full_rebuild else manifest.get("files", {})
+    previous = previous or {}
+
     all_chunks: List[Dict] = []
+    new_files: Dict[str, Dict[str, Any]] = {}
+    file_changes: Dict[str, List[str]] = {"added": [], "modified": [], "deleted": []}
 
     print(f"Raw data dir: {DATA_RAW_DIR}")
+    print("Mode: " + ("full" if full_rebuild else "incremental"))
     print("=" * 80)
 
     for department_folder in DEPARTMENTS:
@@ -200,31 +296,105 @@ def preprocess_all_documents() -> None:
                 continue
 
             suffix = file_path.suffix.lower()
-            print(f"  File: {file_path.name} ({suffix})")
+            rel_path = file_path.relative_to(DATA_RAW_DIR).as_posix()
+            stat = file_path.stat()
+            entry = old_files.get(rel_path)
 
-            if suffix == ".md":
-                chunks = process_markdown_file(file_path, department_folder)
-            elif suffix == ".csv" and department_folder == "HR":
-                chunks = process_hr_csv(file_path, department_folder)
+            # mtime + size unchanged: trust the recorded hash instead of re-reading the file
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                digest = entry["sha256"]
             else:
-                print(f"    Skipping unsupported file type: {suffix}")
-                continue
-
-            print(f"    Generated {len(chunks)} chunks")
+                digest = file_sha256(file_path)
+
+            chunks = reuse_chunks(entry, previous) if entry and entry["sha256"] == digest else None
+            if chunks is None:
+                print(f"  File: {file_path.name} ({suffix})")
+                chunks = process_file(file_path, department_folder)
+                if chunks is None:
+                    print(f"    Skipping unsupported file type: {suffix}")
+                    continue
+                print(f"    Generated {len(chunks)} chunks")
+                file_changes["modified" if entry else "added"].append(rel_path)
+
+            new_files[rel_path] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": digest,
+                "chunk_ids": [c["id"] for c in chunks],
+            }
             all_chunks.extend(chunks)
 
-    # Save all chunks to JSONL for later embedding
-    out_path = DATA_PROCESSED_DIR / "document_chunks.jsonl"
-    with out_path.open("w", encoding="utf-8") as f:
-        for chunk in all_chunks:
-            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+    file_changes["deleted"] = sorted(set(old_files) - set(new_files))
+    for rel_path in file_changes["deleted"]:
+        print(f"  Deleted: {rel_path}")
+
+    if HR_STATS_ENABLED:
+        # Recomputed per CSV only when its hash changed (or on a full rebuild)
+        hr_csvs = {
+            rel_path: (DATA_RAW_DIR / rel_path, entry["sha256"])
+            for rel_path, entry in new_files.items()
+            if rel_path.startswith("HR/") and rel_path.lower().endswith(".csv")
+        }
+        for rel_path in update_hr_stats(hr_csvs, force=full_rebuild):
+            print(f"  HR aggregates recomputed: {rel_path}")
+
+    groups = []
+    if not full_rebuild and not any(file_changes.values()):
+        # Same files as last run: the duplicate groups are unchanged as well
+        all_chunks = [previous[c["id"]] for c in all_chunks]
+    elif DEDUP_ENABLED:
+        # Prose only: HR rows are distinct records even when most of their fields match
+        prose = [i for i, c in enumerate(all_chunks) if c["source_file"].lower().endswith(".md")]
+        groups = dedupe_chunks(all_chunks, prose)
+
+    # Duplicates stay in the chunk store (provenance, reuse) but are not indexed
+    indexed = {c["id"]: c for c in all_chunks if "duplicate_of" not in c}
+    previously_indexed = {i: c for i, c in previous.items() if "duplicate_of" not in c}
+    changes = ChangeSet(
+        # Chunks of a modified file that came out identical need no re-embedding,
+        # while a canonical chunk whose duplicate group changed needs new metadata
+        upserted=[i for i, c in indexed.items() if full_rebuild or previously_indexed.get(i) != c],
+        removed=sorted(set(previously_indexed) - set(indexed)),
+        full_rebuild=full_rebuild,
+        files=file_changes,
+    )
+
+    if changes.is_empty():
+        # Nothing to re-chunk or re-index; only mtimes / hashes may have moved
+        save_manifest({"settings": fingerprint, "files": new_files})
+        print(f"\n=== No changes ({len(all_chunks)} chunks, {time.perf_counter() - started:.2f}s) ===")
+        return changes
+
+    # JSONL export for debugging / diffing; the indexer reads the chunk store
+    if CHUNKS_JSONL_EXPORT:
+        with CHUNKS_JSONL_PATH.open("w", encoding="utf-8") as f:
+            for chunk in all_chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+
+    # Written last: load_chunks() prefers the store only if it is not older than the JSONL
+    write_chunk_store(all_chunks)
+    save_manifest({"settings": fingerprint, "files": new_files})
+    pending = save_pending_changeset(changes)
 
     print("\n=== Preprocessing complete ===")
-    print(f"Total chunks: {len(all_chunks)}")
-    print(f"Saved to: {out_path}")
+    print(f"Total chunks: {len(all_chunks)} ({time.perf_counter() - started:.2f}s)")
+    print(
+        f"Files: {len(file_changes['added'])} added, {len(file_changes['modified'])} modified, "
+        f"{len(file_changes['deleted'])} deleted, "
+        f"{len(new_files) - len(file_changes['added']) - len(file_changes['modified'])} unchanged"
+    )
+    print(f"Chunks: {len(changes.upserted)} to upsert, {len(changes.removed)} to remove")
+    if DEDUP_ENABLED:
+        merged = sum(len(g) - 1 for g in groups)
+        print(f"Near-duplicates: {merged} chunks merged into {len(groups)} canonical chunks, {len(indexed)} to index")
+    print(f"Saved to: {CHUNK_STORE_DIR}")
+    if CHUNKS_JSONL_EXPORT:
+        print(f"JSONL export: {CHUNKS_JSONL_PATH}")
+    print(f"Pending change set: {CHANGESET_PATH} ({pending.summary()})")
 
     # Simple QA summary
-    summarize_chunks(all_chunks)
+    summarize_chunks(list(indexed.values()))
+    return changes
 
 
 def summarize_chunks(chunks: List[Dict]) -> None:
@@ -247,4 +417,8 @@ def summarize_chunks(chunks: List[Dict]) -> None:
 
 
 if __name__ == "__main__":
-    preprocess_all_documents()
+    parser = argparse.ArgumentParser(description="Chunk raw documents into the chunk store.")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-chunk every file")
+    args = parser.parse_args()
+    with ingest_lock():
+        preprocess_all_documents(full=args.full)
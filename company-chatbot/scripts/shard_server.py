@@ -0,0 +1,78 @@
+"""
+Serve index shards for VECTOR_BACKEND=sharded (app/shard_server.py).
+
+Build the shards, start one process per shard, then run the API:
+
+    VECTOR_BACKEND=sharded python -m scripts.build_vector_db
+    python -m scripts.shard_server --all                 # SHARD_COUNT local processes
+    VECTOR_BACKEND=sharded uvicorn app.main:app --workers 4
+
+On several nodes, start single shards where their index lives and list the
+TCP addresses in SHARD_ADDRESSES on the API nodes:
+
+    python -m scripts.shard_server --shard 2 --address tcp:0.0.0.0:7102
+"""
+import argparse
+import asyncio
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+def run_all(threads: int) -> None:
+    """
+    One child process per shard at its SHARD_ADDRESSES entry. A shard that
+    exits is restarted; Ctrl+C / SIGTERM stops them all.
+    """
+    from app.config import SHARD_COUNT
+
+    cmd = [sys.executable, "-m", "scripts.shard_server", "--threads", str(threads), "--shard"]
+    children = [subprocess.Popen(cmd + [str(i)]) for i in range(SHARD_COUNT)]
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        while True:
+            time.sleep(1.0)
+            for i, child in enumerate(children):
+                if child.poll() is not None:
+                    print(f"Shard {i} exited with {child.returncode}, restarting", flush=True)
+                    children[i] = subprocess.Popen(cmd + [str(i)])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for child in children:
+            if child.poll() is None:
+                child.terminate()
+        for child in children:
+            child.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--shard", type=int, help="Shard number to serve")
+    target.add_argument("--all", action="store_true", help="Serve every shard, one process each")
+    parser.add_argument("--address", help="unix:/path.sock or tcp:host:port (default: its SHARD_ADDRESSES entry)")
+    parser.add_argument("--index-dir", type=Path, help="Shard index directory (default: SHARD_INDEX_DIR/shard_<n>)")
+    parser.add_argument("--threads", type=int, help="Concurrent queries (default: SHARD_SERVER_THREADS)")
+    args = parser.parse_args()
+
+    from app import config
+    from app.shard_server import ShardServer
+    from app.shards import shard_dir
+
+    threads = args.threads or config.SHARD_SERVER_THREADS
+    if args.all:
+        run_all(threads)
+        return
+
+    if not 0 <= args.shard < config.SHARD_COUNT:
+        raise SystemExit(f"--shard must be in 0..{config.SHARD_COUNT - 1} (SHARD_COUNT={config.SHARD_COUNT})")
+    address = args.address or config.SHARD_ADDRESSES[args.shard]
+    server = ShardServer(args.shard, args.index_dir or shard_dir(args.shard), threads=threads)
+    asyncio.run(server.serve(address))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Fault-injection scenarios for LLMClient (deadline, retries, hedging, failover,
+circuit breaker, concurrency limiter) against two local fake providers.
+
+Starts two scripts/llm_stub_server.py instances, one playing Groq and one
+playing OpenAI, and reconfigures them per scenario through POST /config.
+Each stub answers with its provider name so the scenarios can tell who
+served a call.
+
+Usage:
+    python -m scripts.test_llm_resilience
+    python -m scripts.test_llm_resilience --only failover hedging
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+GROQ_PORT = 9101
+OPENAI_PORT = 9102
+
+
+def configure(port: int, **settings) -> None:
+    httpx.post(f"http://127.0.0.1:{port}/config", json=settings, timeout=5.0).raise_for_status()
+
+
+def stub_stats(port: int) -> Dict[str, int]:
+    return httpx.get(f"http://127.0.0.1:{port}/stats", timeout=5.0).json()
+
+
+def healthy(port: int, name: str) -> None:
+    configure(port, latency_ms=10, jitter_ms=0, answer=name, error_rate=0.0, slow_rate=0.0, slow_ms=0)
+
+
+async def run_calls(client, n: int) -> Tuple[List[str], List[float], int]:
+    """
+    n sequential generate() calls -> (answers, latencies_ms, failures).
+    """
+    from app.llm_client import LLMUnavailableError
+
+    answers, latencies, failures = [], [], 0
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            answers.append(await client.generate("ping"))
+        except LLMUnavailableError:
+            failures += 1
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return answers, latencies, failures
+
+
+def p99(samples: List[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[int(0.99 * (len(ordered) - 1))]
+
+
+# ---------------------------
+# Scenarios: each returns (passed, detail)
+# ---------------------------
+async def scenario_healthy(make_client) -> Tuple[bool, str]:
+    answers, latencies, failures = await run_calls(make_client(), 20)
+    ok = failures == 0 and set(answers) == {"groq"}
+    return ok, f"answers={sorted(set(answers))} p50={statistics.median(latencies):.0f}ms"
+
+
+async def scenario_transient_errors(make_client) -> Tuple[bool, str]:
+    # Low enough that the breaker (5 consecutive failures) stays closed
+    configure(GROQ_PORT, error_rate=0.2)
+    answers, _, failures = await run_calls(make_client(breaker_failures=5), 30)
+    groq = stub_stats(GROQ_PORT)
+    ok = failures == 0 and groq["errors"] > 0 and answers.count("groq") > len(answers) // 2
+    return ok, f"failures={failures} groq_errors={groq['errors']} served_by_groq={answers.count('groq')}/30"
+
+
+async def scenario_failover(make_client) -> Tuple[bool, str]:
+    configure(GROQ_PORT, error_rate=1.0)
+    client = make_client()
+    answers, _, failures = await run_calls(client, 20)
+    groq = stub_stats(GROQ_PORT)
+    # Once the breaker opens, groq should stop receiving traffic
+    ok = failures == 0 and set(answers) == {"openai"} and groq["requests"] <= client.policy.breaker_failures + 1
+    return ok, f"answers={sorted(set(answers))} groq_requests={groq['requests']}"
+
+
+async def scenario_slow_provider(make_client) -> Tuple[bool, str]:
+    configure(GROQ_PORT, latency_ms=5000)
+    client = make_client()
+    answers, latencies, failures = await run_calls(client, 5)
+    ok = failures == 0 and set(answers) == {"openai"} and max(latencies) < client.policy.deadline_s * 1000
+    return ok, f"answers={sorted(set(answers))} max={max(latencies):.0f}ms deadline={client.policy.deadline_s * 1000:.0f}ms"
+
+
+async def scenario_all_down(make_client) -> Tuple[bool, str]:
+    configure(GROQ_PORT, error_rate=1.0)
+    configure(OPENAI_PORT, error_rate=1.0)
+    client = make_client()
+    _, latencies, failures = await run_calls(client, 5)
+    ok = failures == 5 and max(latencies) < client.policy.deadline_s * 1000
+    return ok, f"failures={failures}/5 max={max(latencies):.0f}ms"
+
+
+async def scenario_breaker_recovery(make_client) -> Tuple[bool, str]:
+    from app.resilience import get_breaker
+
+    client = make_client()
+    configure(GROQ_PORT, error_rate=1.0)
+    await run_calls(client, 3)
+    opened = get_breaker("groq").state
+
+    healthy(GROQ_PORT, "groq")
+    await asyncio.sleep(client.policy.breaker_reset_s + 0.1)
+    answers, _, _ = await run_calls(client, 3)
+    closed = get_breaker("groq").state
+    ok = opened == "open" and closed == "closed" and answers == ["groq"] * 3
+    return ok, f"after_failures={opened} after_reset={closed} answers={answers}"
+
+
+async def scenario_hedging(make_client) -> Tuple[bool, str]:
+    # 5% of calls are slow, so the p90 hedge threshold sits below the tail
+    configure(GROQ_PORT, latency_ms=20, slow_rate=0.05, slow_ms=800)
+    plain = make_client(hedge=False, attempt_timeout_s=3.0)
+    _, plain_latencies, _ = await run_calls(plain, 200)
+
+    configure(GROQ_PORT, latency_ms=20, slow_rate=0.05, slow_ms=800)
+    hedged = make_client(hedge=True, attempt_timeout_s=3.0)
+    _, hedged_latencies, failures = await run_calls(hedged, 200)
+    stats = stub_stats(GROQ_PORT)
+
+    ok = failures == 0 and p99(hedged_latencies) < p99(plain_latencies) / 2
+    return ok, (
+        f"p99 plain={p99(plain_latencies):.0f}ms hedged={p99(hedged_latencies):.0f}ms "
+        f"extra_requests={stats['requests'] - 200}"
+    )
+
+
+async def scenario_saturation(make_client) -> Tuple[bool, str]:
+    from app.ratelimit import ConcurrencyLimiter, OverloadedError, set_limiter
+
+    configure(GROQ_PORT, latency_ms=300)
+    set_limiter("groq", ConcurrencyLimiter("groq", max_concurrency=2, max_queue=2, queue_timeout_s=5.0))
+    client = make_client(failover=[], attempt_timeout_s=2.0)
+
+    async def one() -> Tuple[str, float]:
+        t0 = time.perf_counter()
+        try:
+            await client.generate("ping")
+            outcome = "ok"
+        except OverloadedError as exc:
+            outcome = f"503 retry_after={exc.retry_after_header}"
+        return outcome, (time.perf_counter() - t0) * 1000
+
+    results = await asyncio.gather(*(one() for _ in range(10)))
+    served = [ms for outcome, ms in results if outcome == "ok"]
+    shed = [ms for outcome, ms in results if outcome != "ok"]
+    groq = stub_stats(GROQ_PORT)
+    # 2 in flight + 2 queued get served; the rest are rejected without waiting
+    ok = len(served) == 4 and len(shed) == 6 and max(shed) < 100 and groq["requests"] == 4
+    return ok, (
+        f"served={len(served)} shed={len(shed)} max_shed={max(shed, default=0):.0f}ms "
+        f"max_served={max(served, default=0):.0f}ms ({results[-1][0]})"
+    )
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "healthy": scenario_healthy,
+    "transient_errors": scenario_transient_errors,
+    "failover": scenario_failover,
+    "slow_provider": scenario_slow_provider,
+    "all_down": scenario_all_down,
+    "breaker_recovery": scenario_breaker_recovery,
+    "hedging": scenario_hedging,
+    "saturation": scenario_saturation,
+}
+
+
+async def run(names: List[str]) -> bool:
+    from app.llm_client import LLMClient, ResiliencePolicy, reset_llm_state
+
+    base_policy = ResiliencePolicy(
+        deadline_s=3.0,
+        attempt_timeout_s=0.5,
+        max_retries=1,
+        retry_base_s=0.05,
+        retry_max_s=0.2,
+        hedge=False,
+        hedge_percentile=0.9,
+        hedge_min_samples=10,
+        breaker_failures=3,
+        breaker_reset_s=1.0,
+    )
+
+    def make_client(failover: List[str] = ["openai"], **overrides):
+        return LLMClient("groq", failover=failover, policy=replace(base_policy, **overrides))
+
+    all_ok = True
+    for name in names:
+        reset_llm_state()
+        healthy(GROQ_PORT, "groq")
+        healthy(OPENAI_PORT, "openai")
+
+        ok, detail = await SCENARIOS[name](make_client)
+        all_ok &= ok
+        print(f"[{'PASS' if ok else 'FAIL'}] {name:<18} {detail}", flush=True)
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(SCENARIOS), help="Run a subset of scenarios")
+    args = parser.parse_args()
+
+    # Picked up by the provider SDKs when LLMClient builds them
+    os.environ.update(
+        {
+            "GROQ_API_KEY": "stub",
+            "GROQ_BASE_URL": f"http://127.0.0.1:{GROQ_PORT}",
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{OPENAI_PORT}/v1",
+        }
+    )
+
+    from scripts.benchmark import wait_for_http
+
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "scripts.llm_stub_server", "--port", str(port), "--latency-ms", "10"],
+            cwd=BASE_DIR,
+        )
+        for port in (GROQ_PORT, OPENAI_PORT)
+    ]
+    try:
+        for port in (GROQ_PORT, OPENAI_PORT):
+            wait_for_http(f"http://127.0.0.1:{port}/stats")
+        ok = asyncio.run(run(args.only or list(SCENARIOS)))
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
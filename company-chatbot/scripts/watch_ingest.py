@@ -0,0 +1,188 @@
+"""
+Continuous ingestion: watch DATA_RAW_DIR and keep the vector index fresh.
+
+Runs as its own long-lived process (never inside the API workers). On each
+burst of file changes, after a debounce, it runs incremental preprocessing
+(only new / modified / deleted files) and applies the resulting change set to
+the index (only affected chunks are re-embedded and upserted). The embedding
+model stays loaded between cycles.
+
+With VECTOR_BACKEND=flat the API reopens the index after the atomic swap, so
+chunks are searchable as soon as a cycle ends. Chroma's PersistentClient does
+not reliably see writes from another process; restart the API after changes
+or use the flat backend for continuous ingestion.
+
+Freshness is reported per cycle as the time from the oldest file write in the
+burst (its mtime) to the end of the index update.
+
+Usage:
+    python -m scripts.watch_ingest
+    python -m scripts.watch_ingest --backend poll --poll-interval 5 --debounce 10
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import signal
+import statistics
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.changeset import ingest_lock
+from app.config import (
+    DATA_RAW_DIR,
+    INGEST_WATCH_BACKEND,
+    INGEST_WATCH_DEBOUNCE_S,
+    INGEST_WATCH_MAX_DELAY_S,
+    INGEST_WATCH_POLL_S,
+)
+from app.fs_watch import FileEvent, create_watcher
+from app.vectorstore import index_chunks
+from scripts.preprocess_docs import preprocess_all_documents
+
+
+def wait_for_burst(watcher, debounce_s: float, max_delay_s: float) -> List[FileEvent]:
+    """
+    Block until something changes, then keep collecting events until the
+    directory has been quiet for `debounce_s` (or `max_delay_s` has passed).
+    """
+    events: List[FileEvent] = []
+    while not events:
+        events = watcher.read(timeout_s=None)
+
+    quiet_s = max(debounce_s, watcher.latency_s)
+    deadline = time.monotonic() + max_delay_s
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        more = watcher.read(timeout_s=min(quiet_s, remaining))
+        if not more:
+            break
+        events.extend(more)
+    return events
+
+
+def oldest_write(events: List[FileEvent]) -> float:
+    """
+    Wall-clock time of the earliest change in the burst: the file's mtime when
+    it still exists, otherwise when the watcher saw the event.
+    """
+    times = []
+    for event in events:
+        try:
+            times.append(min(event.path.stat().st_mtime, event.seen_at))
+        except FileNotFoundError:
+            times.append(event.seen_at)
+    return min(times)
+
+
+def run_cycle(verbose: bool) -> Dict[str, Any]:
+    """
+    Incremental preprocess + index update; returns timings and the change set.
+    """
+    log = io.StringIO()
+    t0 = time.perf_counter()
+    try:
+        with ingest_lock(), contextlib.redirect_stdout(log):
+            changes = preprocess_all_documents()
+            t1 = time.perf_counter()
+            # Also picks up a change set left pending by a failed earlier cycle
+            index_chunks(incremental=True)
+    finally:
+        if verbose:
+            print(log.getvalue())
+    t2 = time.perf_counter()
+    return {
+        "preprocess_s": t1 - t0,
+        "index_s": t2 - t1,
+        "upserted": len(changes.upserted),
+        "removed": len(changes.removed),
+        "files": {k: len(v) for k, v in changes.files.items()},
+        "full_rebuild": changes.full_rebuild,
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["auto", "inotify", "poll"], default=INGEST_WATCH_BACKEND)
+    parser.add_argument("--poll-interval", type=float, default=INGEST_WATCH_POLL_S, help="Seconds between polls")
+    parser.add_argument("--debounce", type=float, default=INGEST_WATCH_DEBOUNCE_S, help="Quiet period before ingesting")
+    parser.add_argument("--max-delay", type=float, default=INGEST_WATCH_MAX_DELAY_S, help="Upper bound on debouncing")
+    parser.add_argument("--no-initial-sync", action="store_true", help="Skip the catch-up cycle at startup")
+    parser.add_argument("--nice", type=int, default=10, help="Lower CPU priority so API workers win (0 = off)")
+    parser.add_argument("--stats-json", type=Path, help="Append one JSON line per cycle to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show preprocess / indexing output")
+    args = parser.parse_args()
+
+    # Stop cleanly under process managers (systemd, docker stop) as on Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    if args.nice and hasattr(os, "nice"):
+        os.nice(args.nice)
+
+    # Watch first, so changes made during the initial sync are not missed
+    watcher = create_watcher(DATA_RAW_DIR, args.backend, args.poll_interval)
+    print(f"Watching {DATA_RAW_DIR} ({type(watcher).__name__}, debounce {args.debounce:.1f}s)")
+
+    if not args.no_initial_sync:
+        stats = run_cycle(args.verbose)
+        print(
+            f"Initial sync: {stats['upserted']} upserted, {stats['removed']} removed "
+            f"({stats['preprocess_s'] + stats['index_s']:.2f}s)"
+        )
+
+    freshness: List[float] = []
+    try:
+        while True:
+            events = wait_for_burst(watcher, args.debounce, args.max_delay)
+            written_at = oldest_write(events)
+            detected_at = min(e.seen_at for e in events)
+            try:
+                stats = run_cycle(args.verbose)
+            except Exception:
+                # Keep watching; the pending change set is retried on the next cycle
+                traceback.print_exc()
+                continue
+
+            searchable_at = time.time()
+            stats.update(
+                events=len(events),
+                detect_s=detected_at - written_at,
+                freshness_s=searchable_at - written_at,
+                at=searchable_at,
+            )
+            if stats["upserted"] or stats["removed"]:
+                freshness.append(stats["freshness_s"])
+
+            files = stats["files"]
+            print(
+                f"[{time.strftime('%H:%M:%S')}] {len(events)} events -> "
+                f"{files['added']} added / {files['modified']} modified / {files['deleted']} deleted files, "
+                f"{stats['upserted']} upserted / {stats['removed']} removed chunks | "
+                f"preprocess {stats['preprocess_s']:.2f}s, index {stats['index_s']:.2f}s, "
+                f"freshness {stats['freshness_s']:.2f}s"
+                + (
+                    f" (p50 {statistics.median(freshness):.2f}s, p95 {percentile(freshness, 0.95):.2f}s)"
+                    if freshness
+                    else ""
+                )
+            )
+            if args.stats_json:
+                with args.stats_json.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(stats) + "\n")
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        watcher.close()
+
+
+if __name__ == "__main__":
+    main()
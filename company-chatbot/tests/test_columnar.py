@@ -0,0 +1,91 @@
+from app.columnar import fresh_tmp_dir, swap_into_place
+
+
+def _publish(target, value):
+    tmp = fresh_tmp_dir(target)
+    (tmp / "data.txt").write_text(value)
+    swap_into_place(tmp, target)
+
+
+def test_new_target_is_a_plain_directory(tmp_path):
+    target = tmp_path / "index"
+    _publish(target, "1")
+    assert target.is_dir() and not target.is_symlink()
+    assert (target / "data.txt").read_text() == "1"
+
+
+def test_replacement_flips_a_version_link_and_keeps_the_previous_version(tmp_path):
+    target = tmp_path / "index"
+    for value in "1234":
+        _publish(target, value)
+        assert (target / "data.txt").read_text() == value
+    assert target.is_symlink()
+    versions = sorted(p.name for p in tmp_path.glob("index.v*"))
+    assert len(versions) == 2  # current and previous
+    assert target.resolve().name in versions
+    assert not (tmp_path / "index.tmp").exists() and not (tmp_path / "index.link").exists()
+
+
+def test_resolved_reader_keeps_its_version(tmp_path):
+    target = tmp_path / "index"
+    _publish(target, "1")
+    _publish(target, "2")
+    pinned = target.resolve()
+    _publish(target, "3")
+    assert (pinned / "data.txt").read_text() == "2"
+    assert (target / "data.txt").read_text() == "3"
+
+
+def test_target_exists_after_every_step_of_a_swap(tmp_path, monkeypatch):
+    import os
+    from pathlib import Path
+
+    from app import columnar
+
+    target = tmp_path / "index"
+    _publish(target, "1")
+    _publish(target, "2")
+    seen = []
+    path_rename, os_replace = Path.rename, os.replace
+
+    def rename(self, dest):
+        result = path_rename(self, dest)
+        seen.append(target.exists())
+        return result
+
+    def replace(src, dst):
+        os_replace(src, dst)
+        seen.append(target.exists())
+
+    monkeypatch.setattr(Path, "rename", rename)
+    monkeypatch.setattr(columnar.os, "replace", replace)
+    _publish(target, "3")
+    assert seen and all(seen)
+    assert (target / "data.txt").read_text() == "3"
+
+
+def test_flat_collection_follows_rebuilds_and_survives_a_gap(tmp_path):
+    import numpy as np
+    import pytest
+
+    from app.flat_index import _flat_collections, get_flat_collection, write_flat_index
+
+    index_dir = tmp_path / "flat_index"
+
+    def build(ids):
+        embeddings = np.eye(len(ids), 8, dtype=np.float32)
+        metas = [{"department": "general"} for _ in ids]
+        write_flat_index(ids, embeddings, ids, metas, index_dir=index_dir, quantization="none")
+
+    with pytest.raises(RuntimeError):
+        get_flat_collection(index_dir)
+    build(["a", "b"])
+    first = get_flat_collection(index_dir)
+    build(["a", "b", "c"])
+    second = get_flat_collection(index_dir)
+    assert second is not first and second.index_dir == index_dir.resolve()
+    assert first.index_dir.exists()  # the previous version stays readable
+
+    index_dir.unlink()  # e.g. a rebuild on a filesystem without symlinks
+    assert get_flat_collection(index_dir) is second
+    _flat_collections.pop(index_dir, None)
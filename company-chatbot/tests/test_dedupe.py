@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.dedupe import dedupe_chunks, find_duplicate_groups, merge_group, shingles
+
+TEXTS = [
+    "Quarterly marketing spend rose in Q3 2024 driven by digital campaigns and events",
+    "The leave policy grants twenty days of paid leave per year to all employees",
+    "",
+    "Hi",
+]
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_HASHES_SCRIPT = (
+    "import sys, json; from app.dedupe import shingles; "
+    "h, o = shingles(json.loads(sys.argv[1])); print(h.tolist(), o.tolist())"
+)
+
+
+def test_shingles_offsets_and_short_texts():
+    # 13 and 14 words -> 9 and 10 five-word shingles; empty -> none; one word -> one
+    hashes, offsets = shingles(TEXTS, k=5)
+    assert offsets.tolist() == [0, 9, 19, 19, 20]
+    assert len(hashes) == offsets[-1]
+
+
+def test_shingles_are_stable_across_processes():
+    outputs = set()
+    for seed in ("1", "2"):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        result = subprocess.run(
+            [sys.executable, "-c", _HASHES_SCRIPT, json.dumps(TEXTS)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        outputs.add(result.stdout)
+    assert len(outputs) == 1
+    hashes, offsets = shingles(TEXTS)
+    assert outputs.pop().strip() == f"{hashes.tolist()} {offsets.tolist()}"
+
+
+def test_near_duplicates_are_grouped():
+    base = " ".join(f"word{i}" for i in range(200))
+    texts = [base, base.replace("word100", "changed"), "something else entirely " * 20]
+    assert find_duplicate_groups(texts) == [[0, 1]]
+
+
+def test_merge_group_keeps_smallest_id_with_union_of_access():
+    group = [
+        {"id": "marketing/q3.md::2", "text": "x", "department": "marketing",
+         "source_path": "marketing/q3.md", "allowed_roles": ["marketing", "c_level"]},
+        {"id": "Finance/annual.md::7", "text": "x", "department": "finance",
+         "source_path": "Finance/annual.md", "allowed_roles": ["finance", "c_level"]},
+    ]
+    canonical, duplicate = merge_group(group)
+    assert canonical["id"] == "Finance/annual.md::7"
+    assert set(canonical["allowed_roles"]) == {"finance", "marketing", "c_level"}
+    assert canonical["departments"] == ["Finance", "marketing"]
+    assert canonical["duplicates"] == [{"id": "marketing/q3.md::2", "source_path": "marketing/q3.md"}]
+    assert duplicate["duplicate_of"] == canonical["id"]
+    assert "duplicate_of" not in canonical
+
+
+
+REPORT = " ".join(f"Marketing reached {i} new accounts in region {i % 7}." for i in range(40))
+
+
+def _chunk(chunk_id, text, department, roles):
+    path = chunk_id.split("::")[0]
+    return {"id": chunk_id, "text": text, "department": department, "source_path": path,
+            "source_file": path.split("/")[-1], "allowed_roles": roles}
+
+
+def test_near_duplicates_across_departments_are_not_merged():
+    marketing = _chunk("marketing/q1.md::chunk_0", REPORT, "marketing", ["marketing", "c_level"])
+    leaked = _chunk("Finance/a_copy_q1.md::chunk_0", "Confidential finance note: acquisition target ZETA. " + REPORT,
+                    "finance", ["finance", "c_level"])
+    chunks = [marketing, leaked]
+    assert find_duplicate_groups([c["text"] for c in chunks]) == [[0, 1]]
+    assert dedupe_chunks(chunks) == []
+    assert chunks == [marketing, leaked]
+
+
+def test_exact_copies_merge_across_departments_and_near_duplicates_within_roles():
+    chunks = [
+        _chunk("marketing/q1.md::chunk_0", REPORT, "marketing", ["marketing", "c_level"]),
+        _chunk("marketing/annual.md::chunk_3", REPORT + " Totals follow.", "marketing", ["marketing", "c_level"]),
+        _chunk("Finance/q1_copy.md::chunk_0", "  " + REPORT.upper(), "finance", ["finance", "c_level"]),
+        _chunk("Finance/notes.md::chunk_0", "Board only. " + REPORT, "finance", ["finance", "c_level"]),
+    ]
+    groups = dedupe_chunks(chunks)
+    assert sorted(groups) == [[0, 2]]
+    canonical = chunks[2]  # "Finance/..." sorts first; same text as the marketing copy
+    assert set(canonical["allowed_roles"]) == {"marketing", "finance", "c_level"}
+    assert chunks[0]["duplicate_of"] == canonical["id"]
+    # Near-duplicates whose role set differs from the merged copies' stay as they were
+    assert "duplicate_of" not in chunks[1] and "duplicates" not in chunks[1]
+    assert chunks[3]["allowed_roles"] == ["finance", "c_level"] and "duplicate_of" not in chunks[3]
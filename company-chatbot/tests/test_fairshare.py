@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from app import fairshare
+from app.fairshare import FairScheduler, Principal, QuotaBook, QuotaExceededError
+
+
+@pytest.fixture
+def quotas(monkeypatch):
+    monkeypatch.setitem(fairshare.ROLE_QUOTAS, "tester", {"rate_per_s": 0.001, "burst": 10.0, "weight": 1.0})
+    monkeypatch.setitem(fairshare.ROLE_QUOTAS, "unlimited", {"rate_per_s": 0.0, "burst": 1.0, "weight": 1.0})
+    book = QuotaBook(max_principals=2)
+    monkeypatch.setattr(fairshare, "QUOTAS", book)
+    monkeypatch.setattr(fairshare, "QUOTA_ENABLED", True)
+    monkeypatch.setattr(fairshare, "QUOTA_LLM_COST", 5.0)
+    return book
+
+
+def test_charge_until_the_burst_is_used_up(quotas):
+    alice = Principal("alice", "tester", 1.0)
+    quotas.charge(alice, 4)
+    quotas.charge(alice, 6)
+    with pytest.raises(QuotaExceededError) as exc:
+        quotas.charge(alice, 1)
+    assert exc.value.retry_after_s > 0
+    quotas.charge(Principal("bob", "tester", 1.0), 10)  # buckets are per user
+    for _ in range(100):
+        quotas.charge(Principal("carol", "unlimited", 1.0), 1)  # rate 0 = no quota
+
+
+def test_request_costing_more_than_the_burst_is_rejected_without_charge(quotas):
+    alice = Principal("alice", "tester", 1.0)
+    with pytest.raises(QuotaExceededError, match="burst of 10"):
+        quotas.charge(alice, 11)
+    quotas.charge(alice, 10)  # nothing was taken by the rejected request
+
+
+def test_refund_gives_tokens_back_up_to_the_burst(quotas):
+    alice = Principal("alice", "tester", 1.0)
+    quotas.charge(alice, 10)
+    quotas.refund(alice, 100)
+    quotas.charge(alice, 10)
+    with pytest.raises(QuotaExceededError):
+        quotas.charge(alice, 1)
+
+
+def test_least_recently_seen_bucket_is_dropped(quotas):
+    alice, bob, carol = (Principal(n, "tester", 1.0) for n in ("alice", "bob", "carol"))
+    quotas.charge(alice, 10)
+    quotas.charge(bob, 1)
+    quotas.charge(carol, 1)
+    quotas.charge(alice, 10)  # alice's empty bucket was evicted, she starts full again
+
+
+def test_llm_cost_is_refunded_when_no_llm_call_is_made(quotas):
+    fairshare.admit("alice", "tester", llm=True)  # 5
+    fairshare.refund_llm_cost()  # back to 1
+    fairshare.refund_llm_cost()  # only once
+    fairshare.admit("alice", "tester", llm=True)  # 5 more: 6 of 10 used
+    with pytest.raises(QuotaExceededError):
+        fairshare.admit("alice", "tester", llm=True)
+    fairshare.admit("alice", "tester")  # a plain query still fits
+
+
+def _run_in_order(scheduler, calls):
+    """
+    Hold the only slot, queue `calls` as (name, weight) in order, then let
+    them through one at a time; returns the order they got the slot in.
+    """
+    order = []
+
+    async def one(label, principal):
+        await scheduler.acquire(principal)
+        order.append(label)
+        await asyncio.sleep(0)
+        scheduler.release()
+
+    async def main():
+        holder = Principal("holder", "tester", 1.0)
+        await scheduler.acquire(holder)
+        counts = {}
+        tasks = []
+        for name, weight in calls:
+            label = f"{name}{counts.setdefault(name, 0)}"
+            counts[name] += 1
+            tasks.append(asyncio.create_task(one(label, Principal(name, "tester", weight))))
+            await asyncio.sleep(0)
+        assert scheduler.queued == len(calls)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    return order
+
+
+def test_fair_scheduler_interleaves_a_late_user_with_a_heavy_one():
+    scheduler = FairScheduler("test", max_concurrency=1, max_queue=16, max_queued_per_principal=16)
+    order = _run_in_order(scheduler, [("a", 1.0)] * 4 + [("b", 1.0)])
+    assert order == ["a0", "b0", "a1", "a2", "a3"]
+
+
+def test_fair_scheduler_shares_by_weight():
+    scheduler = FairScheduler("test", max_concurrency=1, max_queue=16, max_queued_per_principal=16)
+    order = _run_in_order(scheduler, [("a", 1.0)] * 3 + [("b", 2.0)] * 4)
+    assert order == ["b0", "a0", "b1", "b2", "a1", "b3", "a2"]
+
+
+def test_fair_scheduler_caps_queued_calls_per_user():
+    scheduler = FairScheduler("test", max_concurrency=1, max_queue=16, max_queued_per_principal=2)
+
+    async def main():
+        user = Principal("a", "tester", 1.0)
+        await scheduler.acquire(user)
+        waiting = [asyncio.create_task(scheduler.acquire(user)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(fairshare.OverloadedError):
+            await scheduler.acquire(user)
+        waiting.append(asyncio.create_task(scheduler.acquire(Principal("b", "tester", 1.0))))
+        await asyncio.sleep(0)
+        assert scheduler.queued == 3  # other users can still queue
+        for _ in range(4):
+            scheduler.release()
+        await asyncio.gather(*waiting)
+
+    asyncio.run(main())
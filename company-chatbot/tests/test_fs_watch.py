@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.fs_watch import InotifyWatcher, PollingWatcher
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_inotify_survives_a_directory_removed_before_its_event_is_read(tmp_path):
+    watcher = InotifyWatcher(tmp_path)
+    try:
+        (tmp_path / "incoming").mkdir()
+        (tmp_path / "incoming").rmdir()
+        (tmp_path / "report.md").write_text("x")
+        events = watcher.read(1.0)
+        assert (tmp_path / "incoming", "changed") in [(e.path, e.kind) for e in events]
+        assert (tmp_path / "report.md", "changed") in [(e.path, e.kind) for e in events]
+    finally:
+        watcher.close()
+
+
+def test_polling_survives_a_directory_removed_while_scanning(tmp_path, monkeypatch):
+    (tmp_path / "report.md").write_text("x")
+    department = tmp_path / "marketing"
+    department.mkdir()
+    (department / "q1.md").write_text("x")
+    watcher = PollingWatcher(tmp_path, interval_s=0.0)
+
+    iterdir = Path.iterdir
+
+    def racing_iterdir(self):
+        yield from iterdir(self)
+        if self == tmp_path and department.exists():
+            # The department disappears between the listing and its own scan
+            (department / "q1.md").unlink()
+            department.rmdir()
+
+    monkeypatch.setattr(Path, "iterdir", racing_iterdir)
+    events = watcher.read(0.0)
+    assert [(e.path, e.kind) for e in events] == [(department / "q1.md", "deleted")]
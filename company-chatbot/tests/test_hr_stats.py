@@ -0,0 +1,35 @@
+import pytest
+
+from app.hr_stats import aggregate_sections
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "What is the marketing budget by department?",
+        "How many vacation days do employees get?",
+        "What is the reimbursement policy per employee?",
+        "Which engineering teams have the highest on-call load?",
+        "What is the leave policy?",
+        "Summarize the 2024 quarterly financial performance.",
+    ],
+)
+def test_non_hr_questions_are_not_aggregates(query):
+    assert aggregate_sections(query) is None
+
+
+@pytest.mark.parametrize(
+    "query, section",
+    [
+        ("Which manager has the most direct reports?", "manager"),
+        ("What is the average performance rating by department?", "performance_rating"),
+        ("Show performance ratings by location", "location"),
+        ("How many employees are in each department?", "department"),
+        ("What is the average leave balance?", "leave_balance"),
+        ("Summarize attendance across offices", "attendance_pct"),
+    ],
+)
+def test_hr_aggregate_questions_select_their_sections(query, section):
+    sections = aggregate_sections(query)
+    assert sections is not None
+    assert section in sections
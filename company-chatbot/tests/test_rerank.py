@@ -0,0 +1,41 @@
+import pytest
+
+from app import rerank
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the number of query words in the text."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        self.calls += 1
+        return [sum(w in text.split() for w in query.split()) for query, text in pairs]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeCrossEncoder()
+    monkeypatch.setattr(rerank, "_cross_encoder", model)
+    monkeypatch.setattr(rerank, "_score_cache", rerank.RerankScoreCache())
+    return model
+
+
+def _hits(*texts):
+    return [{"id": f"doc.md::chunk_{i}", "text": t} for i, t in enumerate(texts)]
+
+
+def test_rerank_orders_by_score_and_caches(model):
+    ranked = rerank.rerank_hits("leave policy", _hits("nothing here", "leave policy"), deadline=float("inf"))
+    assert [h["rerank_score"] for h in ranked] == [2.0, 0.0]
+    rerank.rerank_hits("leave policy", _hits("nothing here", "leave policy"), deadline=float("inf"))
+    assert model.calls == 1
+
+
+def test_edited_chunk_with_the_same_id_is_scored_again(model):
+    rerank.rerank_hits("leave policy", _hits("leave policy", "nothing here"), deadline=float("inf"))
+    # The file was edited: same positional ids, different text
+    ranked = rerank.rerank_hits("leave policy", _hits("nothing here", "leave policy"), deadline=float("inf"))
+    assert model.calls == 2
+    assert [h["id"] for h in ranked] == ["doc.md::chunk_1", "doc.md::chunk_0"]
@@ -0,0 +1,64 @@
+import gzip
+import zlib
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.responses import NDJSON_MEDIA_TYPE, CompressionMiddleware
+
+BIG = b'{"hits": "' + b"leave policy " * 200 + b'"}'
+
+
+def _stream(media_type):
+    async def parts():
+        for i in range(3):
+            yield b'{"event": %d, "text": "%s"}\n' % (i, b"x" * 600)
+
+    return lambda request: StreamingResponse(parts(), media_type=media_type)
+
+
+@pytest.fixture
+def client():
+    app = Starlette(routes=[
+        Route("/big", lambda request: Response(BIG, media_type="application/json")),
+        Route("/small", lambda request: Response(b'{"ok": true}', media_type="application/json")),
+        Route("/encoded", lambda request: Response(gzip.compress(BIG), headers={"Content-Encoding": "gzip"})),
+        Route("/stream", _stream("application/json")),
+        Route("/ndjson", _stream(NDJSON_MEDIA_TYPE)),
+    ])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+def _raw(client, path, accept="gzip"):
+    with client.stream("GET", path, headers={"Accept-Encoding": accept}) as resp:
+        return resp, b"".join(resp.iter_raw())
+
+
+def test_large_body_is_gzipped(client):
+    resp, raw = _raw(client, "/big")
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in resp.headers["vary"].lower()
+    assert int(resp.headers["content-length"]) == len(raw) < len(BIG)
+    assert gzip.decompress(raw) == BIG
+
+
+def test_small_body_unsupported_coding_and_encoded_bodies_pass_through(client):
+    resp, raw = _raw(client, "/small")
+    assert "content-encoding" not in resp.headers and raw == b'{"ok": true}'
+    resp, raw = _raw(client, "/big", accept="identity")
+    assert "content-encoding" not in resp.headers and raw == BIG
+    resp, raw = _raw(client, "/encoded")
+    assert gzip.decompress(raw) == BIG  # compressed once, not twice
+
+
+def test_stream_is_compressed_chunk_by_chunk_but_ndjson_is_not(client):
+    resp, raw = _raw(client, "/stream")
+    assert resp.headers["content-encoding"] == "gzip" and "content-length" not in resp.headers
+    body = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(raw)
+    assert body.count(b"\n") == 3
+    resp, raw = _raw(client, "/ndjson")
+    assert "content-encoding" not in resp.headers and raw.count(b"\n") == 3
@@ -0,0 +1,29 @@
+import pytest
+from pydantic import ValidationError
+
+from app.config import SEARCH_BATCH_MAX_QUERIES, SEARCH_MAX_TOP_K
+from app.schemas import BatchSearchRequest, ChatRequest, RagRequest, SearchRequest
+
+REQUESTS = [
+    (SearchRequest, {"query": "leave policy"}, 5),
+    (BatchSearchRequest, {"queries": ["leave policy"]}, 5),
+    (RagRequest, {"query": "leave policy"}, 4),
+    (ChatRequest, {"query": "leave policy"}, 4),
+]
+
+
+@pytest.mark.parametrize("model,body,default", REQUESTS)
+def test_top_k_default_and_bounds(model, body, default):
+    assert model(**body).top_k == default
+    assert model(**body, top_k=SEARCH_MAX_TOP_K).top_k == SEARCH_MAX_TOP_K
+    for top_k in (0, -1, SEARCH_MAX_TOP_K + 1):
+        with pytest.raises(ValidationError):
+            model(**body, top_k=top_k)
+
+
+def test_batch_query_count_is_bounded():
+    BatchSearchRequest(queries=["q"] * SEARCH_BATCH_MAX_QUERIES)
+    with pytest.raises(ValidationError):
+        BatchSearchRequest(queries=["q"] * (SEARCH_BATCH_MAX_QUERIES + 1))
+    with pytest.raises(ValidationError):
+        BatchSearchRequest(queries=[])
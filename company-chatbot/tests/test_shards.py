@@ -0,0 +1,46 @@
+from app.shards import ShardedCollection, partition, shard_of
+
+# Per shard, one row per query: ids sorted by distance, as shard_server returns them
+SHARD_RESULTS = [
+    {"ids": [["a1", "a2"], ["a3"]], "distances": [[0.1, 0.5], [0.2]]},
+    {"ids": [["b1", "b2"], ["b3", "b4"]], "distances": [[0.3, 0.4], [0.05, 0.9]]},
+]
+
+
+def _collection(responses, fail=()):
+    collection = ShardedCollection(addresses=["127.0.0.1:1"] * len(responses), timeout_s=5.0)
+    for client, response in zip(collection.shards, responses):
+        def request(header, payload=b"", response=response, shard=client.shard):
+            if shard in fail:
+                raise ConnectionRefusedError
+            rows = {k: [list(row) for row in v] for k, v in response.items()}
+            rows["documents"] = [[f"doc {i}" for i in row] for row in response["ids"]]
+            rows["metadatas"] = [[{"shard": shard} for _ in row] for row in response["ids"]]
+            return {"ok": True, **rows}
+
+        client.request = request
+    return collection
+
+
+def test_query_merges_shards_by_distance():
+    result = _collection(SHARD_RESULTS).query([[1.0, 0.0], [0.0, 1.0]], n_results=3, include=["documents", "distances"])
+    assert result["ids"] == [["a1", "b1", "b2"], ["b3", "a3", "b4"]]
+    assert result["distances"] == [[0.1, 0.3, 0.4], [0.05, 0.2, 0.9]]
+    assert result["documents"][0] == ["doc a1", "doc b1", "doc b2"]
+    assert "metadatas" not in result and result["failed_shards"] == []
+
+
+def test_query_returns_partial_results_when_a_shard_fails():
+    result = _collection(SHARD_RESULTS, fail={1}).query([[1.0, 0.0], [0.0, 1.0]], n_results=3)
+    assert result["ids"] == [["a1", "a2"], ["a3"]]
+    assert result["metadatas"][0] == [{"shard": 0}, {"shard": 0}]
+    assert result["failed_shards"] == [1]
+
+
+def test_partition_is_stable_and_complete():
+    chunks = [{"id": f"doc.md::chunk_{i}"} for i in range(50)]
+    parts = partition(chunks, 4)
+    assert sorted(c["id"] for part in parts for c in part) == sorted(c["id"] for c in chunks)
+    for shard, part in enumerate(parts):
+        assert all(shard_of(c["id"], 4) == shard for c in part)
+    assert shard_of("doc.md::chunk_7", 4) == shard_of("doc.md::chunk_7", 4)
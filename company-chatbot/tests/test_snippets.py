@@ -0,0 +1,31 @@
+from app.rag import to_sources
+from app.schemas import SearchRequest
+from app.snippets import compile_query, extract_snippet, query_terms
+
+TEXT = (
+    "## Handbook\n\nWelcome to the company. " + "Filler sentence about nothing in particular. " * 20
+    + "The **leave policy** grants 24 days of paid leave per year. " + "More filler text here. " * 20
+)
+
+
+def test_query_terms_skip_stopwords_and_short_words():
+    assert query_terms("What is the leave policy for Q3 in HR?") == ["leave", "policy", "q3"]
+
+
+def test_snippet_is_centred_on_the_query_terms_without_markup_by_default():
+    snippet = extract_snippet(TEXT, compile_query("leave policy"), 120)
+    assert "leave policy" in snippet
+    assert "**" not in snippet and "#" not in snippet
+    assert snippet.startswith("...") and snippet.endswith("...")
+
+
+def test_highlight_is_opt_in():
+    snippet = extract_snippet(TEXT, compile_query("leave policy"), 120, highlight=True)
+    assert "**leave** **policy**" in snippet
+    assert SearchRequest(query="leave").highlight is False
+
+
+def test_rag_sources_are_not_highlighted():
+    hit = {"id": "c1", "text": TEXT, "score": 0.9, "metadata": {"department": "general", "source_file": "handbook.md"}}
+    (source,) = to_sources("leave policy", [hit])
+    assert "leave policy" in source.snippet and "**" not in source.snippet